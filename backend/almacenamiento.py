@@ -0,0 +1,100 @@
+# backend/almacenamiento.py
+"""
+Almacenamiento de medios subidos (publicaciones, galería, chat, perfiles, reportes)
+sin cargarlos enteros en memoria ni bloquear el event loop.
+
+guardar_upload copia el UploadFile a disco en bloques de TAMANO_BLOQUE, corta en
+cuanto se supera el tamaño máximo y calcula tamaño y hash (xxh3-128) mientras
+escribe. La escritura va a un archivo .parcial que se renombra al terminar, así
+nunca queda un archivo a medias con el nombre final; la E/S de disco corre en
+hilos (aiofiles) y no bloquea el event loop.
+
+guardar_en_carpeta, hash_de_archivo, borrar_archivo y borrar_con_prefijo cubren el
+resto de la E/S de disco que hacen los endpoints de subida.
+"""
+import os
+from typing import NamedTuple, Optional
+
+import aiofiles
+import aiofiles.os
+import xxhash
+from fastapi import HTTPException, UploadFile
+
+TAMANO_BLOQUE = 1024 * 1024  # 1MB
+
+
+class ArchivoGuardado(NamedTuple):
+    ruta: str
+    tamano: int
+    hash_contenido: str
+    nuevo: bool = True  # False si el contenido ya estaba guardado (ver backend/blobs.py)
+
+
+def nuevo_hash():
+    return xxhash.xxh3_128()
+
+
+async def guardar_upload(
+    archivo: UploadFile,
+    destino: str,
+    tamano_maximo: int,
+    mensaje_excedido: str = "Archivo demasiado grande",
+) -> ArchivoGuardado:
+    """Copia el archivo subido a destino por bloques; 400 en cuanto supera tamano_maximo"""
+    parcial = f"{destino}.parcial"
+    digest = nuevo_hash()
+    tamano = 0
+    try:
+        async with aiofiles.open(parcial, "wb") as salida:
+            while True:
+                bloque = await archivo.read(TAMANO_BLOQUE)
+                if not bloque:
+                    break
+                tamano += len(bloque)
+                if tamano > tamano_maximo:
+                    raise HTTPException(status_code=400, detail=mensaje_excedido)
+                digest.update(bloque)
+                await salida.write(bloque)
+        await aiofiles.os.replace(parcial, destino)
+    except BaseException:
+        if await aiofiles.os.path.exists(parcial):
+            await aiofiles.os.remove(parcial)
+        raise
+    return ArchivoGuardado(destino, tamano, digest.hexdigest())
+
+
+async def guardar_en_carpeta(
+    archivo: UploadFile,
+    carpeta: str,
+    nombre: str,
+    tamano_maximo: int,
+    mensaje_excedido: str = "Archivo demasiado grande",
+) -> ArchivoGuardado:
+    await aiofiles.os.makedirs(carpeta, exist_ok=True)
+    return await guardar_upload(archivo, os.path.join(carpeta, nombre), tamano_maximo, mensaje_excedido)
+
+
+async def hash_de_archivo(ruta: str) -> str:
+    """xxh3-128 de un archivo ya escrito (p. ej. armado por partes), leyéndolo por bloques"""
+    digest = nuevo_hash()
+    async with aiofiles.open(ruta, "rb") as entrada:
+        while True:
+            bloque = await entrada.read(TAMANO_BLOQUE)
+            if not bloque:
+                break
+            digest.update(bloque)
+    return digest.hexdigest()
+
+
+async def borrar_archivo(ruta: str) -> None:
+    try:
+        await aiofiles.os.remove(ruta)
+    except FileNotFoundError:
+        pass
+
+
+async def borrar_con_prefijo(carpeta: str, prefijo: str, excepto: Optional[str] = None) -> None:
+    """Borra los archivos de carpeta cuyo nombre empieza con prefijo (menos excepto)"""
+    for nombre in await aiofiles.os.listdir(carpeta):
+        if nombre.startswith(prefijo) and nombre != excepto:
+            await borrar_archivo(os.path.join(carpeta, nombre))
@@ -0,0 +1,115 @@
+# backend/autenticacion.py
+"""
+Tokens JWT de sesión.
+
+create_access_token firma el token en el login y verificar_token lo valida en cada
+petición (firma y expiración) sin ir a la base de datos: el id de usuario sale de
+los claims. La clave (SECRET_KEY) y la duración (ACCESS_TOKEN_EXPIRE_MINUTES) vienen
+de settings; sin clave el servidor no arranca (exigir_clave_secreta). Antes de que
+venza, el cliente pide otro token con renovar_token (POST /token/renovar). Que el usuario siga existiendo se comprueba con usuario_existe, que
+guarda el resultado positivo TTL_USUARIOS segundos (usuario_existe_async para
+endpoints con AsyncSession); al borrar una cuenta se llama a olvidar_usuario.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict
+
+from fastapi import HTTPException
+from jose import ExpiredSignatureError, JWTError, jwt
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from backend import models
+from backend.config import settings
+
+# ------------------ CONFIGURACIÓN JWT ------------------
+SECRET_KEY = settings.SECRET_KEY
+ALGORITHM = "HS256"
+ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
+
+# Segundos que se confía en que un usuario existe sin volver a consultarlo
+TTL_USUARIOS = 60
+
+_usuarios_vistos: Dict[int, float] = {}
+_lock = threading.Lock()
+
+
+def exigir_clave_secreta() -> None:
+    """Con una clave conocida o vacía cualquiera podría firmar tokens: no se arranca sin SECRET_KEY"""
+    if not SECRET_KEY:
+        raise RuntimeError("Falta SECRET_KEY (variable de entorno o backend/.env) para firmar los tokens de sesión")
+
+
+def create_access_token(data: dict):
+    to_encode = data.copy()
+    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode.update({"exp": expire})
+    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return encoded_jwt
+
+
+def _claims(token: str) -> dict:
+    if not token or token in ("null", "undefined"):
+        raise HTTPException(status_code=401, detail="Token requerido o inválido")
+    try:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Token expirado")
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Token requerido o inválido")
+
+    if not isinstance(claims.get("id_usuario"), int):
+        raise HTTPException(status_code=401, detail="Token requerido o inválido")
+    return claims
+
+
+def verificar_token(token: str) -> int:
+    """Valida firma y expiración y devuelve el id_usuario del token"""
+    return _claims(token)["id_usuario"]
+
+
+def renovar_token(token: str) -> str:
+    """Token nuevo con los mismos datos y la expiración corrida; el actual tiene que seguir vigente"""
+    claims = _claims(token)
+    claims.pop("exp", None)
+    return create_access_token(claims)
+
+
+def _en_cache(id_usuario: int) -> bool:
+    with _lock:
+        vence = _usuarios_vistos.get(id_usuario)
+    return vence is not None and vence > time.monotonic()
+
+
+def _recordar(id_usuario: int, existe: bool) -> bool:
+    # Sólo se guardan los positivos: un usuario recién creado no debe esperar al TTL
+    with _lock:
+        if existe:
+            _usuarios_vistos[id_usuario] = time.monotonic() + TTL_USUARIOS
+        else:
+            _usuarios_vistos.pop(id_usuario, None)
+    return existe
+
+
+def _consulta_usuario(id_usuario: int):
+    return select(models.Usuario.id_usuario).where(models.Usuario.id_usuario == id_usuario)
+
+
+def usuario_existe(db: Session, id_usuario: int) -> bool:
+    if _en_cache(id_usuario):
+        return True
+    return _recordar(id_usuario, db.execute(_consulta_usuario(id_usuario)).first() is not None)
+
+
+async def usuario_existe_async(db: AsyncSession, id_usuario: int) -> bool:
+    if _en_cache(id_usuario):
+        return True
+    return _recordar(id_usuario, (await db.execute(_consulta_usuario(id_usuario))).first() is not None)
+
+
+def olvidar_usuario(id_usuario: int) -> None:
+    """Al borrar una cuenta: sus tokens dejan de valer en este proceso de inmediato"""
+    with _lock:
+        _usuarios_vistos.pop(id_usuario, None)
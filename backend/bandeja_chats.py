@@ -0,0 +1,93 @@
+# backend/bandeja_chats.py
+"""
+Bandeja de entrada de chats (/chats) en una sola consulta: por cada chat del usuario
+trae al otro participante con su foto, el último mensaje y la cantidad de no leídos
+(subconsultas correlacionadas que usan los índices de mensajes), ordenado en SQL por
+ultima_actividad y paginable por cursor.
+"""
+from typing import List, Optional, Tuple
+
+from sqlalchemy import case, func, or_, select
+from sqlalchemy.orm import Session
+
+from backend import models
+from backend.paginacion import cortar_pagina, fecha_o_none, fecha_orden, filtro_anteriores
+
+MENSAJE_SIN_CONVERSACION = "Iniciar conversación"
+
+
+def cargar_bandeja(
+    db: Session,
+    id_usuario: int,
+    cursor: Optional[str] = None,
+    limite: Optional[int] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Devuelve (chats, next_cursor). Sin limite devuelve todos los chats y next_cursor None.
+    """
+    es_usuario1 = models.Chat.id_usuario1 == id_usuario
+    id_otro = case((es_usuario1, models.Chat.id_usuario2), else_=models.Chat.id_usuario1)
+    color = case((es_usuario1, models.Chat.color_burbuja_usuario1), else_=models.Chat.color_burbuja_usuario2)
+    actividad = fecha_orden(models.Chat.ultima_actividad, models.Chat.fecha_creacion)
+
+    ultimo_mensaje = (
+        select(models.Mensaje.contenido)
+        .where(models.Mensaje.id_chat == models.Chat.id_chat)
+        .order_by(models.Mensaje.fecha_envio.desc(), models.Mensaje.id_mensaje.desc())
+        .limit(1)
+        .correlate(models.Chat)
+        .scalar_subquery()
+    )
+    no_leidos = (
+        select(func.count(models.Mensaje.id_mensaje))
+        .where(
+            models.Mensaje.id_chat == models.Chat.id_chat,
+            models.Mensaje.leido == False,
+            models.Mensaje.id_emisor != id_usuario
+        )
+        .correlate(models.Chat)
+        .scalar_subquery()
+    )
+
+    query = (
+        db.query(
+            models.Chat.id_chat,
+            actividad.label("ultima_actividad"),
+            color.label("color"),
+            models.Usuario.nombre_usuario,
+            models.Usuario.nombre,
+            models.Usuario.apellido,
+            models.Perfil.foto_perfil,
+            ultimo_mensaje.label("ultimo_mensaje"),
+            no_leidos.label("no_leidos"),
+        )
+        .join(models.Usuario, models.Usuario.id_usuario == id_otro)
+        .outerjoin(models.Perfil, models.Perfil.id_usuario == models.Usuario.id_usuario)
+        .filter(or_(models.Chat.id_usuario1 == id_usuario, models.Chat.id_usuario2 == id_usuario))
+    )
+    if cursor:
+        query = query.filter(filtro_anteriores(actividad, models.Chat.id_chat, cursor))
+    query = query.order_by(actividad.desc(), models.Chat.id_chat.desc())
+
+    if limite is None:
+        filas, next_cursor = query.all(), None
+    else:
+        filas, next_cursor = cortar_pagina(
+            query.limit(limite + 1).all(), limite,
+            lambda f: f.ultima_actividad, lambda f: f.id_chat
+        )
+
+    chats = [
+        {
+            "id": fila.id_chat,
+            "username": fila.nombre_usuario,
+            "nombre_completo": f"{fila.nombre} {fila.apellido}",
+            "foto_perfil": fila.foto_perfil,
+            "lastMessage": fila.ultimo_mensaje if fila.ultimo_mensaje is not None else MENSAJE_SIN_CONVERSACION,
+            "color": fila.color,
+            "ultima_actividad": fecha_o_none(fila.ultima_actividad),
+            "no_leidos": fila.no_leidos or 0,
+        }
+        for fila in filas
+    ]
+    return chats, next_cursor
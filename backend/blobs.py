@@ -0,0 +1,276 @@
+# backend/blobs.py
+"""
+Almacén de contenido deduplicado para los medios subidos.
+
+Publicaciones, adjuntos y fondos de chat, evidencias de reportes y galería guardan
+sus archivos en DIRECTORIO_BLOBS/<ab>/<hash>.<ext>, con el xxh3-128 que calcula
+guardar_upload mientras recibe el archivo. Si ese contenido ya estaba (mismo tamaño
+y mismos bytes, no sólo el mismo hash), la copia recibida se descarta y la fila
+nueva apunta al mismo archivo: volver a subir algo sólo agrega metadatos. Si el hash
+coincide pero el contenido no, el archivo nuevo va a <hash>-<sufijo>.<ext>.
+
+Cada blob cuenta las filas que lo usan (columnas de REFERENCIAS). Listeners del ORM
+ajustan la cuenta al insertar, modificar o borrar esas filas, en la misma
+transacción. Un blob sin referencias se borra (con sus variantes y pósters) cuando
+lleva GRACIA sin usarse:
+
+    python -m backend.blobs
+
+recalcula las referencias (los borrados en cascada de la base no pasan por el ORM),
+borra los blobs sin uso y los archivos que quedaron sin fila. Los archivos subidos
+antes del almacén, fuera de DIRECTORIO_BLOBS, no se cuentan.
+"""
+import json
+import os
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+from urllib.parse import urlparse
+
+import aiofiles
+import aiofiles.os
+from fastapi import UploadFile
+from sqlalchemy import event, insert, inspect, update
+from sqlalchemy.orm import Session
+
+from backend import models
+from backend.almacenamiento import TAMANO_BLOQUE, ArchivoGuardado, borrar_archivo, guardar_upload
+
+DIRECTORIO_BLOBS = "static/blobs"
+# En el mismo disco que static/ (para renombrar) pero fuera de lo que se sirve
+DIRECTORIO_TEMPORAL = "subidas_pendientes"
+GRACIA = timedelta(hours=1)
+
+# (modelo, columna con la URL del medio)
+REFERENCIAS = (
+    (models.Publicacion, "imagen"),
+    (models.Mensaje, "archivo_url"),
+    (models.ConfiguracionChat, "fondo_personalizado"),
+    (models.ReporteUsuario, "evidencia_url"),
+    (models.GaleriaArchivo, "ruta"),
+)
+
+
+def ruta_blob(url: Optional[str]) -> Optional[str]:
+    """static/blobs/... de una URL absoluta o relativa; None si no es un blob"""
+    if not url:
+        return None
+    ruta = urlparse(url).path.lstrip("/")
+    return ruta if ruta.startswith(DIRECTORIO_BLOBS + "/") else None
+
+
+def es_blob(url: Optional[str]) -> bool:
+    return ruta_blob(url) is not None
+
+
+def _rutas(valor: Optional[str]) -> List[str]:
+    """Blobs a los que apunta el valor de una columna (una URL o una lista JSON de URLs)"""
+    if not valor:
+        return []
+    urls = [valor]
+    if valor.startswith("["):
+        try:
+            urls = json.loads(valor)
+        except ValueError:
+            pass
+    return [ruta for ruta in (ruta_blob(url) for url in urls if isinstance(url, str)) if ruta]
+
+
+def _extension(extension: Optional[str]) -> str:
+    limpia = "".join(c for c in (extension or "").lower() if c.isalnum())[:10]
+    return limpia or "bin"
+
+
+def _ruta_final(hash_contenido: str, extension: str, sufijo: str = "") -> str:
+    nombre = f"{hash_contenido}-{sufijo}" if sufijo else hash_contenido
+    return f"{DIRECTORIO_BLOBS}/{hash_contenido[:2]}/{nombre}.{_extension(extension)}"
+
+
+def _registrar(db: Session, ruta: str, hash_contenido: str, tamano: int) -> None:
+    """Crea la fila del blob si no existe y marca su último uso. No hace commit."""
+    ahora = datetime.utcnow()
+    db.execute(
+        insert(models.Blob)
+        .values(
+            ruta=ruta,
+            hash_contenido=hash_contenido,
+            tamano=tamano,
+            referencias=0,
+            fecha_creacion=ahora,
+            fecha_ultimo_uso=ahora
+        )
+        .prefix_with("IGNORE", dialect="mysql")
+        .prefix_with("OR IGNORE", dialect="sqlite")
+    )
+    # Bloquea la fila hasta el commit: limpiar_blobs no puede borrarla mientras tanto
+    db.execute(update(models.Blob).where(models.Blob.ruta == ruta).values(fecha_ultimo_uso=ahora))
+
+
+async def _mismos_bytes(ruta_a: str, ruta_b: str) -> bool:
+    async with aiofiles.open(ruta_a, "rb") as a, aiofiles.open(ruta_b, "rb") as b:
+        while True:
+            bloque = await a.read(TAMANO_BLOQUE)
+            if bloque != await b.read(TAMANO_BLOQUE):
+                return False
+            if not bloque:
+                return True
+
+
+async def adoptar_archivo(
+    db: Session,
+    temporal: str,
+    extension: str,
+    tamano: int,
+    hash_contenido: str,
+) -> ArchivoGuardado:
+    """Pasa al almacén un archivo ya escrito y hasheado; si el contenido ya estaba lo descarta"""
+    destino = _ruta_final(hash_contenido, extension)
+    _registrar(db, destino, hash_contenido, tamano)
+    tamano_existente = db.query(models.Blob.tamano).filter(models.Blob.ruta == destino).scalar()
+    if await aiofiles.os.path.exists(destino):
+        if tamano_existente == tamano and await _mismos_bytes(temporal, destino):
+            await borrar_archivo(temporal)
+            return ArchivoGuardado(destino, tamano, hash_contenido, nuevo=False)
+        colision = True
+    else:
+        colision = tamano_existente != tamano
+    if colision:
+        # Mismo hash, otro contenido: el archivo nuevo no puede ocupar ni servir el nombre del hash
+        destino = _ruta_final(hash_contenido, extension, uuid.uuid4().hex[:12])
+        _registrar(db, destino, hash_contenido, tamano)
+    await aiofiles.os.makedirs(os.path.dirname(destino), exist_ok=True)
+    await aiofiles.os.replace(temporal, destino)
+    return ArchivoGuardado(destino, tamano, hash_contenido)
+
+
+async def guardar_blob(
+    db: Session,
+    archivo: UploadFile,
+    extension: str,
+    tamano_maximo: int,
+    mensaje_excedido: str = "Archivo demasiado grande",
+) -> ArchivoGuardado:
+    """Como guardar_en_carpeta, pero en el almacén deduplicado. No hace commit."""
+    await aiofiles.os.makedirs(DIRECTORIO_TEMPORAL, exist_ok=True)
+    temporal = os.path.join(DIRECTORIO_TEMPORAL, f"{uuid.uuid4()}.blob")
+    guardado = await guardar_upload(archivo, temporal, tamano_maximo, mensaje_excedido)
+    return await adoptar_archivo(db, temporal, extension, guardado.tamano, guardado.hash_contenido)
+
+
+# ------------------ REFERENCIAS ------------------
+def _ajustar(connection, rutas: Iterable[str], delta: int) -> None:
+    for ruta, cantidad in Counter(rutas).items():
+        connection.execute(
+            update(models.Blob)
+            .where(models.Blob.ruta == ruta)
+            .values(referencias=models.Blob.referencias + delta * cantidad)
+        )
+
+
+def _escuchar(modelo, campo: str) -> None:
+    @event.listens_for(getattr(modelo, campo), "set", active_history=True)
+    def _al_asignar(target, valor, anterior, iniciador):
+        # active_history: el valor anterior queda en la historia aunque estuviera expirado
+        pass
+
+    @event.listens_for(modelo, "after_insert")
+    def _al_insertar(mapper, connection, target):
+        _ajustar(connection, _rutas(getattr(target, campo)), 1)
+
+    @event.listens_for(modelo, "before_delete")
+    def _al_borrar(mapper, connection, target):
+        _ajustar(connection, _rutas(getattr(target, campo)), -1)
+
+    @event.listens_for(modelo, "after_update")
+    def _al_modificar(mapper, connection, target):
+        historia = inspect(target).attrs[campo].history
+        if historia.has_changes():
+            _ajustar(connection, [r for valor in historia.deleted for r in _rutas(valor)], -1)
+            _ajustar(connection, [r for valor in historia.added for r in _rutas(valor)], 1)
+
+
+for _modelo, _campo in REFERENCIAS:
+    _escuchar(_modelo, _campo)
+
+
+def reconciliar_referencias(db: Session) -> int:
+    """Recalcula las referencias de todos los blobs. Devuelve cuántos se corrigieron. Hace commit."""
+    cuentas: Counter = Counter()
+    for modelo, campo in REFERENCIAS:
+        columna = getattr(modelo, campo)
+        for (valor,) in db.query(columna).filter(columna.like(f"%{DIRECTORIO_BLOBS}/%")):
+            cuentas.update(_rutas(valor))
+
+    corregidos = 0
+    for blob in db.query(models.Blob):
+        correcto = cuentas.get(blob.ruta, 0)
+        if blob.referencias != correcto:
+            blob.referencias = correcto
+            corregidos += 1
+    db.commit()
+    return corregidos
+
+
+# ------------------ LIMPIEZA ------------------
+def _borrar_derivados(db: Session, ruta: str) -> List[str]:
+    """Borra las filas de variantes y trabajos de video del blob y devuelve sus archivos"""
+    original = f"/{ruta}"
+    archivos = []
+    variantes = db.query(models.VarianteImagen).filter(models.VarianteImagen.ruta_original == original)
+    archivos += [v.ruta.lstrip("/") for v in variantes]
+    variantes.delete(synchronize_session=False)
+    trabajos = db.query(models.TrabajoVideo).filter(models.TrabajoVideo.ruta_original == original)
+    archivos += [t.poster.lstrip("/") for t in trabajos if t.poster]
+    trabajos.delete(synchronize_session=False)
+    return archivos
+
+
+def _quitar(ruta: str) -> None:
+    try:
+        os.remove(ruta)
+    except FileNotFoundError:
+        pass
+
+
+def limpiar_blobs(db: Session) -> int:
+    """Borra los blobs sin referencias ni uso durante GRACIA. Devuelve cuántos. Hace commit."""
+    limite = datetime.utcnow() - GRACIA
+    sin_uso = (
+        models.Blob.referencias <= 0,
+        models.Blob.fecha_ultimo_uso < limite,
+    )
+    borrados = 0
+    for id_blob, ruta in db.query(models.Blob.id_blob, models.Blob.ruta).filter(*sin_uso).all():
+        # Se vuelve a comprobar al borrar: una subida pudo reutilizarlo mientras tanto
+        if not db.query(models.Blob).filter(models.Blob.id_blob == id_blob, *sin_uso).delete(synchronize_session=False):
+            db.rollback()
+            continue
+        # Los archivos se quitan antes del commit, con la fila todavía bloqueada
+        for archivo in [ruta] + _borrar_derivados(db, ruta):
+            _quitar(archivo)
+        db.commit()
+        borrados += 1
+
+    # Archivos sin fila: la transacción que los subió no llegó a confirmarse
+    conocidas = {ruta for (ruta,) in db.query(models.Blob.ruta)}
+    vencimiento = time.time() - GRACIA.total_seconds()
+    for raiz, _, nombres in os.walk(DIRECTORIO_BLOBS):
+        for nombre in nombres:
+            ruta = os.path.join(raiz, nombre).replace(os.sep, "/")
+            if ruta not in conocidas and os.path.getmtime(ruta) < vencimiento:
+                _quitar(ruta)
+                borrados += 1
+    return borrados
+
+
+if __name__ == "__main__":
+    from backend.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        print(f"Referencias corregidas: {reconciliar_referencias(db)}")
+        print(f"Archivos borrados: {limpiar_blobs(db)}")
+    finally:
+        db.close()
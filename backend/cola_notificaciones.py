@@ -0,0 +1,207 @@
+# backend/cola_notificaciones.py
+"""
+Cola de notificaciones fuera del camino de la petición.
+
+Los endpoints llaman a encolar_notificacion y responden sin esperar: un hilo de
+fondo junta lo encolado durante INTERVALO_LOTE segundos (hasta LOTE_MAXIMO),
+resuelve los nombres de los actores en una consulta y lo guarda con un solo commit.
+
+Los tipos de PLANTILLAS_AGRUPADAS se agrupan por (destinatario, tipo, referencia):
+si ya hay una notificación agrupada sin leer se actualiza ("A ana y 41 personas más
+les gusta tu publicación") en lugar de insertar una fila por evento. Los actores se
+guardan en notificaciones_actores, así total_actores cuenta usuarios distintos y no
+eventos (un me gusta quitado y vuelto a dar no suma otra persona).
+
+Si el hilo no está corriendo (scripts, pruebas sin startup) se procesa en el momento.
+"""
+import queue
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from backend import models
+from backend.notificaciones import publicar_al_confirmar
+
+INTERVALO_LOTE = 1.0
+LOTE_MAXIMO = 500
+
+# tipo -> mensaje cuando hay más de un actor
+PLANTILLAS_AGRUPADAS = {
+    "me_gusta": "A {actor} y {otros} les gusta tu publicación",
+}
+
+
+class NotificacionPendiente(NamedTuple):
+    id_usuario: int
+    tipo: str
+    plantilla: str  # mensaje con {actor} en lugar del nombre de usuario
+    id_actor: int
+    id_referencia: Optional[int]
+
+
+_cola: "queue.Queue[Optional[NotificacionPendiente]]" = queue.Queue()
+_hilo: Optional[threading.Thread] = None
+
+
+def _otros(cantidad: int) -> str:
+    return f"{cantidad} persona más" if cantidad == 1 else f"{cantidad} personas más"
+
+
+def procesar_lote(db: Session, lote: List[NotificacionPendiente]) -> None:
+    """Guarda un lote de notificaciones agrupando las repetidas. Hace commit."""
+    ids_actores = {p.id_actor for p in lote}
+    nombres = dict(
+        db.query(models.Usuario.id_usuario, models.Usuario.nombre_usuario)
+        .filter(models.Usuario.id_usuario.in_(ids_actores))
+        .all()
+    )
+
+    grupos: Dict[tuple, List[NotificacionPendiente]] = defaultdict(list)
+    sueltas = []
+    for pendiente in lote:
+        if pendiente.id_actor not in nombres:
+            continue  # el actor borró su cuenta mientras tanto
+        if pendiente.tipo in PLANTILLAS_AGRUPADAS and pendiente.id_referencia is not None:
+            grupos[(pendiente.id_usuario, pendiente.tipo, pendiente.id_referencia)].append(pendiente)
+        else:
+            sueltas.append(pendiente)
+
+    existentes = {}
+    if grupos:
+        filas = db.query(models.Notificacion).filter(
+            models.Notificacion.leido == False,
+            or_(*[
+                and_(
+                    models.Notificacion.id_usuario == id_usuario,
+                    models.Notificacion.tipo == tipo,
+                    models.Notificacion.id_referencia == id_referencia
+                )
+                for id_usuario, tipo, id_referencia in grupos
+            ])
+        ).order_by(models.Notificacion.id_notificacion).all()
+        # Si hubiera más de una sin leer, se actualiza la más reciente
+        existentes = {(n.id_usuario, n.tipo, n.id_referencia): n for n in filas}
+
+    actores_previos: Dict[int, set] = defaultdict(set)
+    if existentes:
+        for id_notificacion, id_actor in db.query(
+            models.NotificacionActor.id_notificacion, models.NotificacionActor.id_actor
+        ).filter(
+            models.NotificacionActor.id_notificacion.in_([n.id_notificacion for n in existentes.values()])
+        ):
+            actores_previos[id_notificacion].add(id_actor)
+
+    ahora = datetime.utcnow()
+    for clave, eventos in grupos.items():
+        ultimo = eventos[-1]
+        actor = nombres[ultimo.id_actor]
+        existente = existentes.get(clave)
+        previos = actores_previos[existente.id_notificacion] if existente else set()
+        nuevos = {e.id_actor for e in eventos} - previos
+        total = len(previos) + len(nuevos)
+        if total == 1:
+            mensaje = ultimo.plantilla.replace("{actor}", actor)
+        else:
+            mensaje = PLANTILLAS_AGRUPADAS[ultimo.tipo].format(actor=actor, otros=_otros(total - 1))
+
+        if existente:
+            existente.mensaje = mensaje
+            existente.total_actores = total
+            existente.fecha = ahora
+            db.add_all([
+                models.NotificacionActor(id_notificacion=existente.id_notificacion, id_actor=id_actor)
+                for id_actor in nuevos
+            ])
+            # Ya contaba como no leída: sólo se vuelve a empujar al cliente
+            publicar_al_confirmar(db, existente)
+        else:
+            db.add(models.Notificacion(
+                id_usuario=ultimo.id_usuario,
+                tipo=ultimo.tipo,
+                mensaje=mensaje,
+                id_referencia=ultimo.id_referencia,
+                total_actores=total,
+                fecha=ahora,
+                actores=[models.NotificacionActor(id_actor=id_actor) for id_actor in nuevos]
+            ))
+
+    for pendiente in sueltas:
+        db.add(models.Notificacion(
+            id_usuario=pendiente.id_usuario,
+            tipo=pendiente.tipo,
+            mensaje=pendiente.plantilla.replace("{actor}", nombres[pendiente.id_actor]),
+            id_referencia=pendiente.id_referencia,
+            fecha=ahora
+        ))
+    db.commit()
+
+
+def _procesar(lote: List[NotificacionPendiente]) -> None:
+    from backend.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        procesar_lote(db, lote)
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ Lote de {len(lote)} notificaciones descartado: {e}")
+    finally:
+        db.close()
+
+
+def encolar_notificacion(
+    id_usuario: int,
+    tipo: str,
+    plantilla: str,
+    id_actor: int,
+    id_referencia: Optional[int] = None,
+) -> None:
+    pendiente = NotificacionPendiente(id_usuario, tipo, plantilla, id_actor, id_referencia)
+    if _hilo is None:
+        _procesar([pendiente])
+    else:
+        _cola.put(pendiente)
+
+
+def _trabajar() -> None:
+    terminar = False
+    while not terminar:
+        primero = _cola.get()
+        if primero is None:
+            break
+        lote = [primero]
+        vence = time.monotonic() + INTERVALO_LOTE
+        while len(lote) < LOTE_MAXIMO:
+            restante = vence - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                pendiente = _cola.get(timeout=restante)
+            except queue.Empty:
+                break
+            if pendiente is None:
+                terminar = True
+                break
+            lote.append(pendiente)
+        _procesar(lote)
+
+
+def iniciar() -> None:
+    global _hilo
+    if _hilo is None:
+        _hilo = threading.Thread(target=_trabajar, name="cola-notificaciones", daemon=True)
+        _hilo.start()
+
+
+def detener(espera: float = 5.0) -> None:
+    """Procesa lo pendiente y detiene el hilo"""
+    global _hilo
+    if _hilo is not None:
+        _cola.put(None)
+        _hilo.join(espera)
+        _hilo = None
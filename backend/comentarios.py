@@ -0,0 +1,114 @@
+# backend/comentarios.py
+"""
+Carga del árbol de comentarios de una publicación en un número fijo de consultas:
+una para todos los comentarios (con usuario, perfil y su contador total_me_gusta)
+y otra para los me gusta del usuario actual. El árbol se arma en memoria.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session, joinedload
+
+from backend import models, schemas
+from backend.paginacion import codificar_cursor, decodificar_cursor
+
+# Niveles de respuestas que se devuelven por defecto bajo cada comentario principal
+PROFUNDIDAD_POR_DEFECTO = 10
+
+
+def _clave_orden(comentario: models.Comentario) -> Tuple[datetime, int]:
+    return (comentario.fecha or datetime.min, comentario.id_comentario)
+
+
+def _usuario_perfil(usuario: models.Usuario) -> schemas.UsuarioPerfil:
+    perfil = usuario.perfil
+    return schemas.UsuarioPerfil(
+        id_usuario=usuario.id_usuario,
+        nombre=usuario.nombre,
+        nombre_usuario=usuario.nombre_usuario,
+        perfil=schemas.PerfilResponse(
+            id_perfil=perfil.id_perfil,
+            id_usuario=perfil.id_usuario,
+            descripcion=perfil.descripcion,
+            biografia=perfil.biografia,
+            foto_perfil=perfil.foto_perfil
+        ) if perfil else None
+    )
+
+
+def _me_gusta_dados(db: Session, id_publicacion: int, id_usuario: int) -> set:
+    """Comentarios de la publicación que el usuario ya marcó con me gusta"""
+    return {
+        id_comentario for (id_comentario,) in
+        db.query(models.MeGustaComentario.id_comentario)
+        .join(models.Comentario, models.Comentario.id_comentario == models.MeGustaComentario.id_comentario)
+        .filter(
+            models.Comentario.id_publicacion == id_publicacion,
+            models.MeGustaComentario.id_usuario == id_usuario
+        )
+        .all()
+    }
+
+
+def cargar_arbol_comentarios(
+    db: Session,
+    id_publicacion: int,
+    id_usuario: int,
+    cursor: Optional[str] = None,
+    limite: Optional[int] = None,
+    profundidad_maxima: int = PROFUNDIDAD_POR_DEFECTO,
+) -> schemas.ComentarioConRespuestasResponse:
+    """
+    Devuelve los comentarios principales (paginados si se pasa cursor o limite) con
+    sus respuestas anidadas hasta profundidad_maxima niveles. Las respuestas que
+    quedan fuera del límite se reflejan en total_respuestas del último nivel.
+    """
+    comentarios = (
+        db.query(models.Comentario)
+        .options(joinedload(models.Comentario.usuario).joinedload(models.Usuario.perfil))
+        .filter(models.Comentario.id_publicacion == id_publicacion)
+        .all()
+    )
+
+    hijos: Dict[Optional[int], List[models.Comentario]] = defaultdict(list)
+    ids = {c.id_comentario for c in comentarios}
+    for comentario in comentarios:
+        padre = comentario.id_comentario_padre
+        # Respuestas cuyo padre no pertenece a la publicación se tratan como principales
+        hijos[padre if padre in ids else None].append(comentario)
+    for lista in hijos.values():
+        lista.sort(key=_clave_orden)
+
+    principales = hijos[None]
+    next_cursor = None
+    if cursor:
+        desde = decodificar_cursor(cursor)
+        principales = [c for c in principales if _clave_orden(c) > desde]
+    if limite is not None and len(principales) > limite:
+        principales = principales[:limite]
+        next_cursor = codificar_cursor(*_clave_orden(principales[-1]))
+
+    dados = _me_gusta_dados(db, id_publicacion, id_usuario)
+
+    def construir(comentario: models.Comentario, profundidad: int) -> schemas.ComentarioResponse:
+        respuestas = hijos.get(comentario.id_comentario, [])
+        return schemas.ComentarioResponse(
+            id_comentario=comentario.id_comentario,
+            id_usuario=comentario.id_usuario,
+            id_publicacion=comentario.id_publicacion,
+            id_comentario_padre=comentario.id_comentario_padre,
+            contenido=comentario.contenido,
+            fecha=comentario.fecha,
+            usuario=_usuario_perfil(comentario.usuario),
+            respuestas=[construir(r, profundidad + 1) for r in respuestas] if profundidad < profundidad_maxima else [],
+            total_respuestas=len(respuestas),
+            total_me_gusta=comentario.total_me_gusta or 0,
+            me_gusta_dado=comentario.id_comentario in dados
+        )
+
+    return schemas.ComentarioConRespuestasResponse(
+        comentarios=[construir(c, 0) for c in principales],
+        total=len(comentarios),
+        next_cursor=next_cursor
+    )
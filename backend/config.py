@@ -15,6 +15,36 @@ class Settings(BaseSettings):
     USE_CREDENTIALS: bool = True
     VALIDATE_CERTS: bool = True
     MAIL_USE_OAUTH2: bool = False  
+
+    # Clave con la que se firman los JWT de sesión (obligatoria) y su duración
+    SECRET_KEY: Optional[str] = None
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+
+    # Tiempo real: con REDIS_URL los eventos se difunden entre workers por Redis pub/sub
+    REDIS_URL: Optional[str] = None
+
+    # Base de datos. ASYNC_DATABASE_URL se deriva de DATABASE_URL si no se define
+    # (mysql+pymysql -> mysql+aiomysql, sqlite -> sqlite+aiosqlite)
+    DATABASE_URL: str = "mysql+pymysql://root:@localhost:3306/artenity"
+    ASYNC_DATABASE_URL: Optional[str] = None
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30
+    # MySQL corta conexiones inactivas (wait_timeout); se reciclan antes
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+
+    # Réplicas de lectura, separadas por coma (ver backend/replicas.py)
+    DATABASE_REPLICA_URLS: str = ""
+    REPLICA_RETRASO_MAXIMO: int = 5
+    REPLICA_INTERVALO_REVISION: int = 10
+
+    # Procesos para generar las variantes de las imágenes subidas (ver backend/variantes_imagen.py)
+    PROCESOS_IMAGENES: int = 2
+    # Hilos que corren ffprobe/ffmpeg sobre los videos subidos (ver backend/trabajos_video.py)
+    TRABAJADORES_VIDEO: int = 2
+    # Prefijo de la location "internal" de nginx que sirve static/ con sendfile (ver backend/medios.py)
+    MEDIOS_X_ACCEL_REDIRECT: str = ""
     
     class Config:
         env_file = os.path.join(os.path.dirname(__file__), ".env")
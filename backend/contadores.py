@@ -0,0 +1,147 @@
+# backend/contadores.py
+"""
+Contadores desnormalizados de interacción: me gusta, comentarios, guardados y
+compartidos en publicaciones, y me gusta en comentarios.
+
+Los endpoints los ajustan con UPDATE col = col + n dentro de la misma transacción
+que inserta o borra la fila de origen, así que leerlos es O(1). Si alguna vez se
+desvían (cargas manuales, borrados fuera de la API) se recalculan con:
+    python -m backend.contadores
+"""
+from typing import Dict, List
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from backend import models
+
+# Columna de publicaciones -> (tabla de origen, columna que apunta a la publicación)
+CONTADORES_PUBLICACION = {
+    "total_me_gusta": (models.MeGusta, models.MeGusta.id_publicacion),
+    "total_comentarios": (models.Comentario, models.Comentario.id_publicacion),
+    "total_guardados": (models.Guardado, models.Guardado.id_publicacion),
+    "total_compartidos": (models.Compartido, models.Compartido.id_publicacion),
+}
+
+
+def ajustar_publicacion(db: Session, id_publicacion: int, campo: str, delta: int = 1) -> None:
+    """Suma delta a un contador de la publicación. No hace commit."""
+    columna = getattr(models.Publicacion, campo)
+    db.execute(
+        update(models.Publicacion)
+        .where(models.Publicacion.id_publicacion == id_publicacion)
+        .values({campo: columna + delta})
+    )
+
+
+def ajustar_comentario(db: Session, id_comentario: int, delta: int = 1) -> None:
+    """Suma delta al contador de me gusta del comentario. No hace commit."""
+    db.execute(
+        update(models.Comentario)
+        .where(models.Comentario.id_comentario == id_comentario)
+        .values(total_me_gusta=models.Comentario.total_me_gusta + delta)
+    )
+
+
+def descontar_usuario(db: Session, id_usuario: int) -> None:
+    """
+    Antes de borrar una cuenta: resta de los contadores de otras publicaciones y
+    comentarios las filas del usuario que el borrado en cascada va a eliminar.
+    No hace commit.
+    """
+    for campo, (modelo, columna) in CONTADORES_PUBLICACION.items():
+        filas = (
+            db.query(columna, func.count())
+            .filter(modelo.id_usuario == id_usuario)
+            .group_by(columna)
+            .all()
+        )
+        for id_publicacion, cantidad in filas:
+            ajustar_publicacion(db, id_publicacion, campo, -cantidad)
+
+    filas = (
+        db.query(models.MeGustaComentario.id_comentario, func.count())
+        .filter(models.MeGustaComentario.id_usuario == id_usuario)
+        .group_by(models.MeGustaComentario.id_comentario)
+        .all()
+    )
+    for id_comentario, cantidad in filas:
+        ajustar_comentario(db, id_comentario, -cantidad)
+
+
+def estadisticas_publicaciones(db: Session, ids_publicaciones: List[int], id_usuario: int) -> Dict[int, dict]:
+    """
+    Totales y flags del usuario (me_gusta_dado, guardado) para varias publicaciones
+    con tres consultas, sin importar cuántas sean. Los ids inexistentes se omiten.
+    """
+    ids = set(ids_publicaciones)
+    if not ids:
+        return {}
+
+    totales = db.query(
+        models.Publicacion.id_publicacion,
+        models.Publicacion.total_me_gusta,
+        models.Publicacion.total_comentarios,
+        models.Publicacion.total_guardados,
+        models.Publicacion.total_compartidos,
+    ).filter(models.Publicacion.id_publicacion.in_(ids)).all()
+
+    me_gusta = {
+        id_pub for (id_pub,) in db.query(models.MeGusta.id_publicacion).filter(
+            models.MeGusta.id_usuario == id_usuario,
+            models.MeGusta.id_publicacion.in_(ids)
+        )
+    }
+    guardados = {
+        id_pub for (id_pub,) in db.query(models.Guardado.id_publicacion).filter(
+            models.Guardado.id_usuario == id_usuario,
+            models.Guardado.id_publicacion.in_(ids)
+        )
+    }
+
+    return {
+        fila.id_publicacion: {
+            "id_publicacion": fila.id_publicacion,
+            "total_me_gusta": fila.total_me_gusta,
+            "total_comentarios": fila.total_comentarios,
+            "total_guardados": fila.total_guardados,
+            "total_compartidos": fila.total_compartidos,
+            "me_gusta_dado": fila.id_publicacion in me_gusta,
+            "guardado": fila.id_publicacion in guardados,
+        }
+        for fila in totales
+    }
+
+
+def reconciliar_contadores(db: Session) -> None:
+    """Recalcula todos los contadores desde las tablas de origen"""
+    valores = {}
+    for campo, (modelo, columna) in CONTADORES_PUBLICACION.items():
+        valores[campo] = (
+            select(func.count())
+            .select_from(modelo)
+            .where(columna == models.Publicacion.id_publicacion)
+            .scalar_subquery()
+        )
+    db.execute(update(models.Publicacion).values(valores))
+
+    db.execute(
+        update(models.Comentario).values(
+            total_me_gusta=select(func.count())
+            .select_from(models.MeGustaComentario)
+            .where(models.MeGustaComentario.id_comentario == models.Comentario.id_comentario)
+            .scalar_subquery()
+        )
+    )
+    db.commit()
+
+
+if __name__ == "__main__":
+    from backend.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        reconciliar_contadores(db)
+        print(">>> Contadores de interacción reconciliados.")
+    finally:
+        db.close()
@@ -1,16 +1,104 @@
-from sqlalchemy import create_engine
+from fastapi import HTTPException
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.schema import CreateColumn
 
-DATABASE_URL = "mysql+pymysql://root:@localhost:3306/artenity"
+from backend.config import settings
 
-engine = create_engine(DATABASE_URL)
+DATABASE_URL = settings.DATABASE_URL
+
+# Driver síncrono -> driver async equivalente
+DRIVERS_ASYNC = {
+    "mysql+pymysql": "mysql+aiomysql",
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def opciones_pool(url: str) -> dict:
+    """Parámetros del pool según settings (SQLite no usa QueuePool)"""
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+def url_async(url: str) -> str:
+    url = make_url(url)
+    driver = DRIVERS_ASYNC.get(url.drivername, url.drivername)
+    return url.set(drivername=driver).render_as_string(hide_password=False)
+
+engine = create_engine(DATABASE_URL, **opciones_pool(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+def crear_async_engine(url: str):
+    """Motor async; None si el driver (aiomysql/aiosqlite) no está instalado"""
+    try:
+        return create_async_engine(url, **opciones_pool(url))
+    except ImportError as e:
+        print(f"⚠️ Motor async deshabilitado: {e}")
+        return None
+
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or url_async(DATABASE_URL)
+async_engine = crear_async_engine(ASYNC_DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 # Dependency
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    """Sesión async para endpoints async def (no bloquea un hilo del threadpool)"""
+    if AsyncSessionLocal.kw.get("bind") is None:
+        raise HTTPException(status_code=503, detail="Base de datos async no disponible")
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def asegurar_indices(metadata, bind):
+    """create_all no agrega índices nuevos a tablas que ya existen; crea los que falten."""
+    inspector = inspect(bind)
+    for table in metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existentes = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existentes:
+                index.create(bind=bind)
+
+def crear_tablas(metadata, bind):
+    """create_all que devuelve los nombres de las tablas que no existían"""
+    existentes = set(inspect(bind).get_table_names())
+    metadata.create_all(bind=bind)
+    return [table.name for table in metadata.sorted_tables if table.name not in existentes]
+
+
+def asegurar_columnas(metadata, bind):
+    """
+    create_all tampoco agrega columnas nuevas a tablas existentes; agrega las que
+    se pueden crear sin datos (nullable o con server_default) y devuelve sus nombres.
+    """
+    inspector = inspect(bind)
+    agregadas = []
+    with bind.begin() as conn:
+        for table in metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existentes = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existentes:
+                    continue
+                if column.nullable or column.server_default is not None:
+                    ddl = CreateColumn(column).compile(dialect=bind.dialect)
+                    conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+                    agregadas.append(f"{table.name}.{column.name}")
+    return agregadas
@@ -0,0 +1,306 @@
+# backend/etiquetas.py
+"""
+Índice normalizado de etiquetas de publicaciones (tabla publicacion_etiquetas).
+
+Publicacion.etiquetas sigue guardando el JSON original para las respuestas; esta
+tabla tiene una fila por (publicación, etiqueta normalizada) para que los filtros
+por categoría recorran un índice en lugar de hacer json.loads fila por fila.
+
+También mantiene los contadores de popularidad (conteo_etiquetas y los buckets por
+hora de conteo_etiquetas_hora) que usa /categorias/populares.
+
+Cuando el servidor crea la tabla, al arrancar indexa las publicaciones existentes y
+reconstruye los contadores. Para repetirlo (p. ej. si se cortó a mitad):
+    python -m backend.etiquetas
+"""
+import json
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+from sqlalchemy import exists, false, func, insert, or_, select
+from sqlalchemy.orm import Session
+
+from backend import models
+from backend.paginacion import FECHA_SIN_FECHA, filtro_anteriores
+
+LONGITUD_MAXIMA_ETIQUETA = 100
+
+# Ventanas de /categorias/populares en horas (None = desde siempre)
+VENTANAS_POPULARES = {"24h": 24, "7d": 7 * 24, "all": None}
+# Los buckets por hora sólo se necesitan para la ventana más larga
+HORAS_RETENCION_BUCKETS = 8 * 24
+
+
+def normalizar_etiqueta(etiqueta) -> str:
+    """Minúsculas y sin espacios extremos, igual que la comparación que hacían los endpoints"""
+    return str(etiqueta).lower().strip()[:LONGITUD_MAXIMA_ETIQUETA]
+
+
+def parsear_etiquetas(etiquetas) -> List[str]:
+    """Convierte el valor guardado en Publicacion.etiquetas en una lista de etiquetas normalizadas sin repetir"""
+    if not etiquetas:
+        return []
+    if isinstance(etiquetas, str):
+        try:
+            lista = json.loads(etiquetas)
+        except ValueError:
+            lista = [etiquetas]
+    else:
+        lista = etiquetas
+    if not isinstance(lista, list):
+        lista = [lista]
+
+    resultado = []
+    for etiqueta in lista:
+        normalizada = normalizar_etiqueta(etiqueta)
+        if normalizada and normalizada not in resultado:
+            resultado.append(normalizada)
+    return resultado
+
+
+def indexar_etiquetas(db: Session, publicacion: models.Publicacion) -> List[str]:
+    """
+    Agrega a la sesión las filas de publicacion_etiquetas de una publicación ya persistida.
+    Las publicaciones sin fecha se indexan con FECHA_SIN_FECHA, la misma clave con la que
+    paginar_publicaciones las ordena. No hace commit; el llamador decide la transacción.
+    """
+    etiquetas = parsear_etiquetas(publicacion.etiquetas)
+    for etiqueta in etiquetas:
+        db.add(models.PublicacionEtiqueta(
+            id_publicacion=publicacion.id_publicacion,
+            etiqueta=etiqueta,
+            fecha_creacion=publicacion.fecha_creacion or FECHA_SIN_FECHA,
+        ))
+    return etiquetas
+
+
+def registrar_etiquetas(db: Session, publicacion: models.Publicacion) -> List[str]:
+    """Indexa las etiquetas de una publicación nueva y suma sus contadores. No hace commit."""
+    etiquetas = indexar_etiquetas(db, publicacion)
+    sumar_conteos(db, etiquetas, publicacion.fecha_creacion)
+    return etiquetas
+
+
+def filtro_categorias(categorias: Iterable[str], cursor: Optional[str] = None):
+    """
+    Condición sobre Publicacion: tiene alguna etiqueta que contiene una de las categorías
+    (p. ej. "danza" encuentra "danza contemporánea" y "tango danza"), igual que el
+    filtro original sobre el JSON.
+
+    Se resuelve como semi-join sobre publicacion_etiquetas: el LIKE '%categoria%' no
+    puede buscar por rango, pero recorre el índice (etiqueta, fecha_creacion,
+    id_publicacion), que cubre la subconsulta, en lugar de decodificar el JSON de cada
+    publicación. Con cursor, el keyset también se aplica dentro de la subconsulta sobre
+    las columnas copiadas de la publicación. El orden final sigue siendo el de
+    publicaciones (fecha_creacion, id_publicacion).
+    """
+    condiciones = []
+    for categoria in categorias:
+        categoria = normalizar_etiqueta(categoria)
+        if categoria:
+            condiciones.append(models.PublicacionEtiqueta.etiqueta.contains(categoria, autoescape=True))
+    if not condiciones:
+        return false()
+
+    subconsulta = select(models.PublicacionEtiqueta.id_publicacion).where(or_(*condiciones))
+    if cursor:
+        subconsulta = subconsulta.where(filtro_anteriores(
+            models.PublicacionEtiqueta.fecha_creacion, models.PublicacionEtiqueta.id_publicacion, cursor
+        ))
+    return models.Publicacion.id_publicacion.in_(subconsulta)
+
+
+def backfill_etiquetas(db: Session, lote: int = 500) -> int:
+    """Indexa las publicaciones con etiquetas que todavía no tienen filas en el índice. Devuelve cuántas procesó."""
+    procesadas = 0
+    ultimo_id = 0
+    while True:
+        publicaciones = (
+            db.query(models.Publicacion)
+            .filter(
+                models.Publicacion.id_publicacion > ultimo_id,
+                models.Publicacion.etiquetas.isnot(None),
+                ~exists().where(models.PublicacionEtiqueta.id_publicacion == models.Publicacion.id_publicacion)
+            )
+            .order_by(models.Publicacion.id_publicacion)
+            .limit(lote)
+            .all()
+        )
+        if not publicaciones:
+            break
+
+        for publicacion in publicaciones:
+            indexar_etiquetas(db, publicacion)
+        db.commit()
+
+        procesadas += len(publicaciones)
+        ultimo_id = publicaciones[-1].id_publicacion
+        db.expunge_all()
+    return procesadas
+
+
+def _truncar_hora(fecha: datetime) -> datetime:
+    return fecha.replace(minute=0, second=0, microsecond=0)
+
+
+def _insertar_o_sumar(db: Session, modelo, filas: List[dict], claves: List[str]) -> None:
+    """INSERT ... ON DUPLICATE KEY / ON CONFLICT que suma la cantidad a la fila existente"""
+    dialecto = db.get_bind().dialect.name
+    if dialecto == "mysql":
+        from sqlalchemy.dialects.mysql import insert as insert_dialecto
+        stmt = insert_dialecto(modelo).values(filas)
+        stmt = stmt.on_duplicate_key_update(cantidad=modelo.cantidad + stmt.inserted.cantidad)
+    else:
+        if dialecto == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as insert_dialecto
+        else:
+            from sqlalchemy.dialects.sqlite import insert as insert_dialecto
+        stmt = insert_dialecto(modelo).values(filas)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=claves,
+            set_={"cantidad": modelo.cantidad + stmt.excluded.cantidad}
+        )
+    db.execute(stmt)
+
+
+_ultima_poda = 0.0
+
+
+def _podar_buckets(db: Session) -> None:
+    """Borra buckets por hora fuera de la ventana más larga, como máximo una vez por hora por proceso"""
+    global _ultima_poda
+    ahora = time.monotonic()
+    if ahora - _ultima_poda < 3600:
+        return
+    _ultima_poda = ahora
+    limite = datetime.utcnow() - timedelta(hours=HORAS_RETENCION_BUCKETS)
+    db.query(models.ConteoEtiquetaHora).filter(models.ConteoEtiquetaHora.hora < limite).delete(synchronize_session=False)
+
+
+def sumar_conteos(db: Session, etiquetas: List[str], fecha: datetime) -> None:
+    """Suma 1 a cada etiqueta en el total y en el bucket de la hora de la publicación. No hace commit."""
+    if not etiquetas:
+        return
+    hora = _truncar_hora(fecha)
+    _insertar_o_sumar(db, models.ConteoEtiqueta, [{"etiqueta": e, "cantidad": 1} for e in etiquetas], ["etiqueta"])
+    _insertar_o_sumar(
+        db, models.ConteoEtiquetaHora,
+        [{"etiqueta": e, "hora": hora, "cantidad": 1} for e in etiquetas],
+        ["etiqueta", "hora"]
+    )
+    _podar_buckets(db)
+
+
+def restar_conteos(db: Session, etiquetas: List[str], fecha: Optional[datetime], veces: int = 1) -> None:
+    """Resta de los contadores las etiquetas de publicaciones eliminadas. No hace commit."""
+    if not etiquetas:
+        return
+    db.query(models.ConteoEtiqueta).filter(
+        models.ConteoEtiqueta.etiqueta.in_(etiquetas)
+    ).update({"cantidad": models.ConteoEtiqueta.cantidad - veces}, synchronize_session=False)
+    if fecha is not None:
+        db.query(models.ConteoEtiquetaHora).filter(
+            models.ConteoEtiquetaHora.etiqueta.in_(etiquetas),
+            models.ConteoEtiquetaHora.hora == _truncar_hora(fecha)
+        ).update({"cantidad": models.ConteoEtiquetaHora.cantidad - veces}, synchronize_session=False)
+
+
+def restar_conteos_publicacion(db: Session, publicacion: models.Publicacion) -> None:
+    """Descuenta las etiquetas indexadas de una publicación que se va a eliminar"""
+    etiquetas = [e.etiqueta for e in publicacion.etiquetas_normalizadas]
+    restar_conteos(db, etiquetas, publicacion.fecha_creacion)
+
+
+def restar_conteos_usuario(db: Session, id_usuario: int) -> None:
+    """Descuenta las etiquetas de todas las publicaciones de un usuario que se va a eliminar"""
+    filas = (
+        db.query(
+            models.PublicacionEtiqueta.etiqueta,
+            models.PublicacionEtiqueta.fecha_creacion,
+        )
+        .join(models.Publicacion, models.Publicacion.id_publicacion == models.PublicacionEtiqueta.id_publicacion)
+        .filter(models.Publicacion.id_usuario == id_usuario)
+        .all()
+    )
+    totales = Counter(etiqueta for etiqueta, _ in filas)
+    for etiqueta, veces in totales.items():
+        restar_conteos(db, [etiqueta], None, veces)
+
+    limite = datetime.utcnow() - timedelta(hours=HORAS_RETENCION_BUCKETS)
+    por_hora = Counter(
+        (etiqueta, _truncar_hora(fecha)) for etiqueta, fecha in filas if fecha and fecha >= limite
+    )
+    for (etiqueta, hora), veces in por_hora.items():
+        db.query(models.ConteoEtiquetaHora).filter(
+            models.ConteoEtiquetaHora.etiqueta == etiqueta,
+            models.ConteoEtiquetaHora.hora == hora
+        ).update({"cantidad": models.ConteoEtiquetaHora.cantidad - veces}, synchronize_session=False)
+
+
+def etiquetas_populares(db: Session, ventana: str = "all", limite: int = 10) -> List[dict]:
+    """Top-N de etiquetas leyendo los contadores; las ventanas suman buckets por hora"""
+    horas = VENTANAS_POPULARES[ventana]
+    if horas is None:
+        filas = (
+            db.query(models.ConteoEtiqueta.etiqueta, models.ConteoEtiqueta.cantidad)
+            .filter(models.ConteoEtiqueta.cantidad > 0)
+            .order_by(models.ConteoEtiqueta.cantidad.desc(), models.ConteoEtiqueta.etiqueta)
+            .limit(limite)
+            .all()
+        )
+    else:
+        desde = _truncar_hora(datetime.utcnow() - timedelta(hours=horas))
+        total = func.sum(models.ConteoEtiquetaHora.cantidad).label("cantidad")
+        filas = (
+            db.query(models.ConteoEtiquetaHora.etiqueta, total)
+            .filter(models.ConteoEtiquetaHora.hora >= desde)
+            .group_by(models.ConteoEtiquetaHora.etiqueta)
+            .having(total > 0)
+            .order_by(total.desc(), models.ConteoEtiquetaHora.etiqueta)
+            .limit(limite)
+            .all()
+        )
+
+    return [{"nombre": etiqueta.title(), "cantidad": int(cantidad)} for etiqueta, cantidad in filas]
+
+
+def reconstruir_conteos(db: Session) -> None:
+    """Recalcula los contadores desde publicacion_etiquetas (para corregir desvíos)"""
+    db.query(models.ConteoEtiqueta).delete(synchronize_session=False)
+    db.query(models.ConteoEtiquetaHora).delete(synchronize_session=False)
+
+    db.execute(
+        insert(models.ConteoEtiqueta).from_select(
+            ["etiqueta", "cantidad"],
+            select(models.PublicacionEtiqueta.etiqueta, func.count())
+            .group_by(models.PublicacionEtiqueta.etiqueta)
+        )
+    )
+
+    desde = datetime.utcnow() - timedelta(hours=HORAS_RETENCION_BUCKETS)
+    recientes = db.query(
+        models.PublicacionEtiqueta.etiqueta,
+        models.PublicacionEtiqueta.fecha_creacion,
+    ).filter(models.PublicacionEtiqueta.fecha_creacion >= desde)
+    buckets = Counter((etiqueta, _truncar_hora(fecha)) for etiqueta, fecha in recientes)
+    if buckets:
+        db.execute(insert(models.ConteoEtiquetaHora), [
+            {"etiqueta": etiqueta, "hora": hora, "cantidad": cantidad}
+            for (etiqueta, hora), cantidad in buckets.items()
+        ])
+    db.commit()
+
+
+if __name__ == "__main__":
+    from backend.database import SessionLocal, engine
+
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        print(f">>> Publicaciones indexadas: {backfill_etiquetas(db)}")
+        reconstruir_conteos(db)
+        print(">>> Contadores de etiquetas reconstruidos.")
+    finally:
+        db.close()
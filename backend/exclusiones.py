@@ -0,0 +1,41 @@
+# backend/exclusiones.py
+"""
+Exclusiones por usuario (bloqueados, quienes me bloquearon y publicaciones marcadas
+como "No me interesa") usadas por el feed, las categorías y las sugerencias.
+
+Se aplican siempre en SQL como anti-joins (NOT EXISTS) sobre las tablas vivas, que
+los índices compuestos de bloqueos_usuarios y no_me_interesa resuelven por clave.
+No hay caché en memoria: un bloqueo rige en la siguiente consulta, en cualquier worker.
+"""
+from sqlalchemy import exists
+
+from backend import models
+
+
+def _anti_join_usuario(columna_id_usuario, id_usuario: int):
+    return [
+        ~exists().where(
+            models.BloqueoUsuario.id_bloqueador == id_usuario,
+            models.BloqueoUsuario.id_bloqueado == columna_id_usuario
+        ),
+        ~exists().where(
+            models.BloqueoUsuario.id_bloqueado == id_usuario,
+            models.BloqueoUsuario.id_bloqueador == columna_id_usuario
+        ),
+    ]
+
+
+def filtrar_publicaciones(query, id_usuario: int):
+    """Excluye publicaciones de usuarios bloqueados (en ambos sentidos) y las marcadas como 'No me interesa'"""
+    return query.filter(
+        *_anti_join_usuario(models.Publicacion.id_usuario, id_usuario),
+        ~exists().where(
+            models.NoMeInteresa.id_usuario == id_usuario,
+            models.NoMeInteresa.id_publicacion == models.Publicacion.id_publicacion
+        )
+    )
+
+
+def filtrar_usuarios(query, columna_id_usuario, id_usuario: int):
+    """Excluye usuarios bloqueados por el usuario actual o que lo bloquearon"""
+    return query.filter(*_anti_join_usuario(columna_id_usuario, id_usuario))
@@ -0,0 +1,114 @@
+# backend/historial_chat.py
+"""
+Historial de mensajes de un chat paginado por cursor sobre (fecha_envio, id_mensaje).
+
+- before: mensajes anteriores al cursor (para scroll hacia arriba).
+- after: mensajes posteriores al cursor (para traer los nuevos).
+- sin cursores: los últimos `limite` mensajes.
+
+Las páginas se devuelven siempre en orden cronológico. El emisor se carga con
+joinedload y los mensajes eliminados "para mí" se excluyen con NOT EXISTS; el índice
+mensajes(id_chat, fecha_envio, id_mensaje) hace que cada página cueste lo mismo sin
+importar el largo del chat.
+"""
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import exists
+from sqlalchemy.orm import Session, joinedload
+
+from backend import models
+from backend.paginacion import codificar_cursor, cortar_pagina, filtro_anteriores, filtro_posteriores
+
+
+def formatear_mensaje(msg: models.Mensaje, id_usuario: int) -> dict:
+    return {
+        "id": msg.id_mensaje,
+        "sender": "yo" if msg.id_emisor == id_usuario else "otro",
+        "sender_id": msg.id_emisor,
+        "sender_username": msg.emisor.nombre_usuario,
+        "text": msg.contenido,
+        "tipo": msg.tipo,
+        "archivo_url": msg.archivo_url,
+        "fecha": msg.fecha_envio,
+        "leido": msg.leido
+    }
+
+
+def _cursor_de(msg: models.Mensaje) -> str:
+    return codificar_cursor(msg.fecha_envio, msg.id_mensaje)
+
+
+def marcar_chat_leido(db: Session, id_chat: int, id_usuario: int) -> int:
+    """Marca como leídos los mensajes recibidos en el chat; devuelve cuántos cambiaron"""
+    actualizados = db.query(models.Mensaje).filter(
+        models.Mensaje.id_chat == id_chat,
+        models.Mensaje.id_emisor != id_usuario,
+        models.Mensaje.leido == False
+    ).update({"leido": True}, synchronize_session=False)
+    db.commit()
+    return actualizados
+
+
+def consulta_mensajes(db: Session, id_chat: int, id_usuario: int):
+    """Mensajes del chat visibles para el usuario, con el emisor ya cargado"""
+    return (
+        db.query(models.Mensaje)
+        .options(joinedload(models.Mensaje.emisor))
+        .filter(
+            models.Mensaje.id_chat == id_chat,
+            ~exists().where(
+                models.MensajeEliminado.id_mensaje == models.Mensaje.id_mensaje,
+                models.MensajeEliminado.id_usuario == id_usuario
+            )
+        )
+    )
+
+
+def cargar_pagina_mensajes(
+    db: Session,
+    id_chat: int,
+    id_usuario: int,
+    limite: int,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+) -> dict:
+    """
+    Devuelve {"mensajes", "before", "after", "hay_mas_recientes"}:
+    before es el cursor para pedir mensajes más antiguos (None si no hay), after el
+    del mensaje más reciente de la página (para pedir los nuevos).
+    """
+    if before and after:
+        raise HTTPException(status_code=400, detail="Usa before o after, no ambos")
+
+    query = consulta_mensajes(db, id_chat, id_usuario)
+    fecha, id_mensaje = models.Mensaje.fecha_envio, models.Mensaje.id_mensaje
+
+    if after:
+        filas = (
+            query.filter(filtro_posteriores(fecha, id_mensaje, after))
+            .order_by(fecha.asc(), id_mensaje.asc())
+            .limit(limite + 1)
+            .all()
+        )
+        pagina = filas[:limite]
+        return {
+            "mensajes": [formatear_mensaje(m, id_usuario) for m in pagina],
+            "before": None,
+            "after": _cursor_de(pagina[-1]) if pagina else after,
+            "hay_mas_recientes": len(filas) > limite,
+        }
+
+    if before:
+        query = query.filter(filtro_anteriores(fecha, id_mensaje, before))
+    filas = query.order_by(fecha.desc(), id_mensaje.desc()).limit(limite + 1).all()
+    pagina, cursor_anterior = cortar_pagina(
+        filas, limite, lambda m: m.fecha_envio, lambda m: m.id_mensaje
+    )
+    pagina.reverse()
+    return {
+        "mensajes": [formatear_mensaje(m, id_usuario) for m in pagina],
+        "before": cursor_anterior,
+        "after": _cursor_de(pagina[-1]) if pagina else None,
+        "hay_mas_recientes": False,
+    }
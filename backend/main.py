@@ -1,32 +1,99 @@
 #main.py
-from sqlalchemy import func  
+from sqlalchemy import func
 import os
-import shutil
 import secrets
 import string
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import List, Optional, Union
 from uuid import uuid4
 import json 
+import asyncio
 import uuid
 from backend.chat import router as chat_router
-from fastapi import Depends, FastAPI, Request, File, Form, Header, HTTPException, UploadFile
+from fastapi import BackgroundTasks, Depends, FastAPI, Request, File, Form, Header, HTTPException, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
 from fastapi_mail import ConnectionConfig, FastMail, MessageSchema
 from pydantic import BaseModel, EmailStr
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import ClientDisconnect
 from sqlalchemy.orm import Session, joinedload
-from jose import jwt
 from backend import database, models, schemas
+from backend.paginacion import LIMITE_MAXIMO, normalizar_limite, FECHA_SIN_FECHA, fecha_orden, filtro_anteriores, cortar_pagina
+from backend.contadores import (
+    ajustar_comentario,
+    ajustar_publicacion,
+    descontar_usuario,
+    estadisticas_publicaciones,
+    reconciliar_contadores,
+)
+from backend.bandeja_chats import cargar_bandeja
+from backend.historial_chat import cargar_pagina_mensajes, consulta_mensajes, formatear_mensaje, marcar_chat_leido
+from backend import tiempo_real
+from backend.tiempo_real import TIPOS_CHAT, TIPOS_NOTIFICACION, ReceptorCola, ReceptorWebSocket, crear_evento, difusion, registro
+from backend.notificaciones import (
+    cargar_notificaciones,
+    contar_no_leidas,
+    contar_no_leidas_async,
+    formatear_notificacion,
+    marcar_leidas,
+    reconciliar_no_leidas,
+)
+from backend import cola_notificaciones
+from backend.cola_notificaciones import encolar_notificacion
+from backend.comentarios import PROFUNDIDAD_POR_DEFECTO, cargar_arbol_comentarios
+from backend import sugerencias
+from backend.sugerencias import sugerir_por_amigos, sugerir_populares
+from backend.etiquetas import (
+    VENTANAS_POPULARES,
+    backfill_etiquetas,
+    etiquetas_populares,
+    filtro_categorias,
+    reconstruir_conteos,
+    registrar_etiquetas,
+    restar_conteos_publicacion,
+    restar_conteos_usuario,
+)
+from backend.exclusiones import filtrar_publicaciones
 from backend.config import settings
-from backend.database import get_db
+from backend.almacenamiento import borrar_archivo, borrar_con_prefijo, guardar_en_carpeta
+from backend.medios import ArchivosMedia
+from backend.resolucion_imagen import resolucion_imagen
+from backend.blobs import DIRECTORIO_TEMPORAL, adoptar_archivo, es_blob, guardar_blob
+from backend import variantes_imagen
+from backend.variantes_imagen import encolar_variantes, reutilizar_variantes, variantes_por_original
+from backend import trabajos_video
+from backend.trabajos_video import encolar_video, posters_por_original
+from backend.subidas_reanudables import (
+    TAMANO_MAXIMO_PARTE,
+    completar_subida,
+    crear_subida,
+    descartar_subida,
+    escribir_parte,
+    limpiar_vencidas,
+    obtener_subida,
+    respuesta_subida,
+)
+from backend.autenticacion import (
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    create_access_token,
+    exigir_clave_secreta,
+    olvidar_usuario,
+    renovar_token,
+    usuario_existe,
+    usuario_existe_async,
+    verificar_token,
+)
+from backend.database import get_async_db, get_db
+from backend import replicas
+from backend.replicas import enrutador, get_db_lectura, id_de_token
 from backend.schemas import ForgotPasswordRequest, ResetPasswordRequest, ConfiguracionChatUpdate
-import subprocess
-import struct
 app = FastAPI()
 app = FastAPI()
 
+exigir_clave_secreta()
+
 # ------------------ CORS ------------------
 app.add_middleware(
     CORSMiddleware,
@@ -36,18 +103,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# ------------------ CONFIGURACIÓN JWT ------------------
-SECRET_KEY = "tu-secreto-aqui"  # Cambia esto por una clave segura
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
-
-def create_access_token(data: dict):
-    to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
-
 # ------------------ CONFIGURACIÓN DE CORREO ------------------
 conf = None
 if settings.MAIL_USERNAME and settings.MAIL_PASSWORD and settings.MAIL_FROM:
@@ -72,38 +127,113 @@ os.makedirs("static/chat_files/videos", exist_ok=True)
 os.makedirs("static/chat_fondos", exist_ok=True)
 
 # ------------------ STATIC FILES ------------------
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", ArchivosMedia(directory="static"), name="static")
 
 # ------------------ CREAR TABLAS ------------------
-models.Base.metadata.create_all(bind=database.engine)
+_tablas_nuevas = database.crear_tablas(models.Base.metadata, database.engine)
+database.asegurar_indices(models.Base.metadata, database.engine)
+_columnas_nuevas = database.asegurar_columnas(models.Base.metadata, database.engine)
+if any(".total_" in col for col in _columnas_nuevas):
+    # Columnas de contadores recién creadas: llenarlas desde las tablas de origen
+    with database.SessionLocal() as _db:
+        reconciliar_contadores(_db)
+if "usuarios.notificaciones_no_leidas" in _columnas_nuevas:
+    with database.SessionLocal() as _db:
+        reconciliar_no_leidas(_db)
+if "publicacion_etiquetas" in _tablas_nuevas:
+    # Índice de etiquetas recién creado: indexar las publicaciones existentes y sus contadores
+    with database.SessionLocal() as _db:
+        backfill_etiquetas(_db)
+        reconstruir_conteos(_db)
+
+# ------------------ RÉPLICAS DE LECTURA ------------------
+async def registrar_escrituras(request: Request, call_next):
+    """Tras una escritura exitosa el usuario lee del primario mientras las réplicas se ponen al día"""
+    response = await call_next(request)
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        id_usuario = id_de_token(request.headers.get("token"))
+        if id_usuario is not None:
+            enrutador.registrar_escritura(id_usuario)
+    return response
+
+if enrutador.replicas:
+    app.middleware("http")(registrar_escrituras)
+
+@app.on_event("startup")
+def iniciar_replicas():
+    replicas.iniciar()
+
+@app.on_event("shutdown")
+def detener_replicas():
+    replicas.detener()
+
+@app.on_event("startup")
+def iniciar_sugerencias():
+    sugerencias.iniciar()
+
+@app.on_event("shutdown")
+def detener_sugerencias():
+    sugerencias.detener()
+
+@app.on_event("startup")
+def iniciar_variantes_imagen():
+    variantes_imagen.iniciar()
+
+@app.on_event("shutdown")
+async def detener_variantes_imagen():
+    await run_in_threadpool(variantes_imagen.detener)
+
+@app.on_event("startup")
+def iniciar_trabajos_video():
+    trabajos_video.iniciar()
+
+@app.on_event("shutdown")
+async def detener_trabajos_video():
+    await run_in_threadpool(trabajos_video.detener)
 
 # ------------------ AUTENTICACIÓN SIMPLIFICADA ------------------
+def _id_de_headers(token: Optional[str], user_id: Optional[str]) -> int:
+    id_token = verificar_token(token)
+    if user_id and user_id not in ("null", "undefined"):
+        try:
+            user_id_int = int(user_id)
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="ID de usuario inválido")
+        if user_id_int != id_token:
+            raise HTTPException(status_code=401, detail="El token no corresponde al usuario")
+    return id_token
+
 def get_current_user_id(
     token: str = Header(None, alias="token"),
     user_id: str = Header(None, alias="id_usuario"),
     db: Session = Depends(get_db)
 ) -> int:
-    if not token or token == "" or token == "null" or token == "undefined":
-        raise HTTPException(status_code=401, detail="Token requerido o inválido")
-    
-    if not user_id or user_id == "" or user_id == "null" or user_id == "undefined":
-        raise HTTPException(status_code=400, detail="ID de usuario no proporcionado")
-    
-    try:
-        user_id_int = int(user_id)
-    except (ValueError, TypeError):
-        raise HTTPException(status_code=400, detail="ID de usuario inválido")
-    
-    usuario = db.query(models.Usuario).filter(models.Usuario.id_usuario == user_id_int).first()
-    if not usuario:
+    """
+    El id sale del JWT (firma y expiración verificadas localmente, ver backend/autenticacion.py).
+    El header id_usuario es opcional; si viene tiene que coincidir con el token.
+    """
+    id_token = _id_de_headers(token, user_id)
+    if not usuario_existe(db, id_token):
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
-    
-    return usuario.id_usuario
+    return id_token
+
+async def get_current_user_id_async(
+    token: str = Header(None, alias="token"),
+    user_id: str = Header(None, alias="id_usuario"),
+    db: AsyncSession = Depends(get_async_db)
+) -> int:
+    """Igual que get_current_user_id, para endpoints async def"""
+    id_token = _id_de_headers(token, user_id)
+    if not await usuario_existe_async(db, id_token):
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    return id_token
 
 # ------------------ FUNCIONES AUXILIARES PARA ARCHIVOS ------------------
 ALLOWED_IMAGE_EXTENSIONS = {"jpg", "jpeg", "png", "gif", "bmp", "webp"}
 ALLOWED_VIDEO_EXTENSIONS = {"mp4", "avi", "mov", "wmv", "flv", "webm"}
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+MAX_PUBLICACION_FILE_SIZE = 100 * 1024 * 1024  # 100MB
+MAX_IMAGEN_FILE_SIZE = 10 * 1024 * 1024  # 10MB: fotos de perfil, fondos de chat y evidencias
 
 def allowed_file(filename: str, file_type: str) -> bool:
     """Verifica si el archivo tiene una extensión permitida"""
@@ -118,25 +248,18 @@ def allowed_file(filename: str, file_type: str) -> bool:
         return ext in ALLOWED_VIDEO_EXTENSIONS
     return False
 
-def save_chat_file(file: UploadFile, file_type: str) -> str:
-    """Guarda un archivo de chat y retorna la ruta relativa"""
+async def save_chat_file(db: Session, file: UploadFile, file_type: str) -> str:
+    """Guarda un archivo de chat (máximo MAX_FILE_SIZE) en el almacén de blobs y retorna la ruta relativa"""
     if not allowed_file(file.filename, file_type):
         raise HTTPException(status_code=400, detail=f"Tipo de archivo no permitido para {file_type}")
     
-    # Generar nombre único para el archivo
     file_extension = file.filename.rsplit('.', 1)[1].lower()
-    unique_filename = f"{uuid.uuid4()}.{file_extension}"
-    
-    if file_type == "imagen":
-        file_path = f"static/chat_files/images/{unique_filename}"
-    else:  # video
-        file_path = f"static/chat_files/videos/{unique_filename}"
-    
-    # Guardar el archivo
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
     
-    return f"/{file_path}"
+    # Guardar el archivo por bloques (si el contenido ya estaba, se reutiliza)
+    guardado = await guardar_blob(
+        db, file, file_extension, MAX_FILE_SIZE, "El archivo es demasiado grande. Máximo 50MB"
+    )
+    return f"/{guardado.ruta}"
 
 # ------------------ USUARIOS ------------------
 @app.post("/usuarios", response_model=schemas.UsuarioResponse)
@@ -164,8 +287,11 @@ def delete_usuario(usuario_id: int, db: Session = Depends(get_db)):
     perfil = db.query(models.Perfil).filter(models.Perfil.id_usuario == usuario_id).first()
     if perfil:
         db.delete(perfil)
+    restar_conteos_usuario(db, usuario_id)
+    descontar_usuario(db, usuario_id)
     db.delete(usuario)
     db.commit()
+    olvidar_usuario(usuario_id)
     return usuario
 
 # ------------------ LOGIN  ------------------
@@ -290,6 +416,18 @@ def login(data: LoginRequest, db: Session = Depends(get_db)):
 
     return response_data
 
+@app.post("/token/renovar")
+def renovar_sesion(
+    token: str = Header(None, alias="token"),
+    user_id: int = Depends(get_current_user_id)
+):
+    """Token nuevo con la expiración corrida; se pide antes de que venza el actual"""
+    return {
+        "token": renovar_token(token),
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,  # en segundos
+    }
+
 # ------------------ PERFILES ------------------
 @app.get("/perfiles/{id_usuario}")
 def obtener_perfil(
@@ -346,19 +484,14 @@ async def actualizar_perfil(
         perfil.biografia = biografia
 
     if file and file.filename:
-        os.makedirs("static/perfiles", exist_ok=True)
-    
         timestamp = int(datetime.now().timestamp())
         filename = f"perfil_{id_usuario}_{timestamp}.jpg"
-        file_path = os.path.join("static/perfiles", filename)
 
-        for archivo in os.listdir("static/perfiles"):
-            if archivo.startswith(f"perfil_{id_usuario}_"):
-                os.remove(os.path.join("static/perfiles", archivo))
-
-
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        await guardar_en_carpeta(
+            file, "static/perfiles", filename, MAX_IMAGEN_FILE_SIZE, "La imagen es demasiado grande. Máximo 10MB"
+        )
+        # Quitar fotos anteriores una vez guardada la nueva
+        await borrar_con_prefijo("static/perfiles", f"perfil_{id_usuario}_", excepto=filename)
 
         perfil.foto_perfil = f"http://localhost:8000/static/perfiles/{filename}"
 
@@ -378,6 +511,8 @@ async def crear_publicacion(
 ):
     try:
         medios_urls = []
+        imagenes_guardadas = []  # (ruta en disco, url) para generar sus variantes
+        videos_guardados = []  # rutas /static/... para analizarlos en segundo plano
         tipo_medio = "texto"  # Valor por defecto
         
         # Procesar múltiples archivos
@@ -395,31 +530,25 @@ async def crear_publicacion(
                             detail=f"Tipo de archivo no soportado: {file.filename}"
                         )
                     
-                    # Determinar carpeta y tipo
-                    if is_video:
-                        folder = "static/videos"
-                        file_tipo_medio = "video"
-                    else:
-                        folder = "static/posts" 
-                        file_tipo_medio = "imagen"
+                    # Determinar tipo
+                    file_tipo_medio = "video" if is_video else "imagen"
                     
                     # Actualizar tipo_medio principal
                     if len(medios_urls) == 0:  # Primer archivo determina el tipo principal
                         tipo_medio = file_tipo_medio
                     
-                    os.makedirs(folder, exist_ok=True)
-                    
-                    # Generar nombre único
-                    unique_filename = f"{uuid.uuid4()}_{file.filename}"
-                    ruta = os.path.join(folder, unique_filename)
-                    
-                    # Guardar archivo
-                    with open(ruta, "wb") as f:
-                        content = await file.read()
-                        f.write(content)
+                    # Guardar archivo por bloques en el almacén de blobs
+                    guardado = await guardar_blob(
+                        db, file, file_extension, MAX_PUBLICACION_FILE_SIZE,
+                        f"Archivo demasiado grande: {file.filename}. Máximo 100MB"
+                    )
                     
-                    url_medio = f"http://localhost:8000/{folder}/{unique_filename}"
+                    url_medio = f"http://localhost:8000/{guardado.ruta}"
                     medios_urls.append(url_medio)
+                    if is_image:
+                        imagenes_guardadas.append((guardado.ruta, url_medio))
+                    else:
+                        videos_guardados.append(f"/{guardado.ruta}")
         
         # Parsear etiquetas si existen (nuevo)
         lista_etiquetas = []
@@ -441,9 +570,17 @@ async def crear_publicacion(
         )
         
         db.add(nueva_pub)
+        db.flush()
+        registrar_etiquetas(db, nueva_pub)
         db.commit()
         db.refresh(nueva_pub)
         
+        for ruta_disco, url_medio in imagenes_guardadas:
+            if not reutilizar_variantes(db, url_medio):
+                encolar_variantes(ruta_disco, url_medio)
+        for ruta_video in videos_guardados:
+            encolar_video(db, id_usuario, ruta_video)
+        
         # Si hay múltiples medios, guardarlos en una tabla separada (si existe)
         if len(medios_urls) > 1:
             # Aquí puedes guardar los medios adicionales en otra tabla
@@ -457,121 +594,111 @@ async def crear_publicacion(
         
         return nueva_pub
         
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error creando publicación: {str(e)}")
 
-@app.get("/publicaciones", response_model=List[schemas.PublicacionResponse])
-def obtener_publicaciones(
-    db: Session = Depends(get_db),
-    user_id: int = Depends(get_current_user_id)
-):
-    # ... (mantener tu código existente de filtros)
-    
-    usuarios_bloqueados = db.query(models.BloqueoUsuario.id_bloqueado).filter(
-        models.BloqueoUsuario.id_bloqueador == user_id
-    ).all()
-    ids_usuarios_bloqueados = [ub[0] for ub in usuarios_bloqueados]
+def paginar_publicaciones(query, cursor: Optional[str], limite: Optional[int]):
+    """
+    Sin cursor ni limite devuelve la lista completa (compatibilidad con clientes antiguos).
+    Con cursor y/o limite devuelve una página ordenada por (fecha_creacion, id_publicacion)
+    y el next_cursor para pedir la siguiente.
+    """
+    if cursor is None and limite is None:
+        return query.order_by(models.Publicacion.fecha_creacion.desc()).all()
 
-    usuarios_que_me_bloquearon = db.query(models.BloqueoUsuario.id_bloqueador).filter(
-        models.BloqueoUsuario.id_bloqueado == user_id
-    ).all()
-    ids_usuarios_que_me_bloquearon = [ub[0] for ub in usuarios_que_me_bloquearon]
-
-    no_me_interesa = db.query(models.NoMeInteresa.id_publicacion).filter(
-        models.NoMeInteresa.id_usuario == user_id
-    ).all()
-    ids_no_me_interesa = [nmi[0] for nmi in no_me_interesa]
+    limite = normalizar_limite(limite)
+    # fecha_creacion puede ser NULL en publicaciones antiguas: esas van al final
+    fecha = fecha_orden(models.Publicacion.fecha_creacion)
+    if cursor:
+        query = query.filter(filtro_anteriores(fecha, models.Publicacion.id_publicacion, cursor))
 
     publicaciones = (
-        db.query(models.Publicacion)
-        .options(joinedload(models.Publicacion.usuario).joinedload(models.Usuario.perfil))
-        .filter(
-            ~models.Publicacion.id_usuario.in_(ids_usuarios_bloqueados),
-            ~models.Publicacion.id_usuario.in_(ids_usuarios_que_me_bloquearon),
-            ~models.Publicacion.id_publicacion.in_(ids_no_me_interesa)
-        )
-        .order_by(models.Publicacion.fecha_creacion.desc())
+        query
+        .order_by(fecha.desc(), models.Publicacion.id_publicacion.desc())
+        .limit(limite + 1)
         .all()
     )
+    pagina, next_cursor = cortar_pagina(
+        publicaciones, limite,
+        lambda p: p.fecha_creacion or FECHA_SIN_FECHA, lambda p: p.id_publicacion
+    )
 
-    return publicaciones
+    return {"publicaciones": pagina, "next_cursor": next_cursor}
+
+def adjuntar_estadisticas(db: Session, resultado, user_id: int):
+    """Agrega a cada publicación del resultado de paginar_publicaciones sus estadísticas (3 consultas en total)"""
+    publicaciones = resultado["publicaciones"] if isinstance(resultado, dict) else resultado
+    estadisticas = estadisticas_publicaciones(db, [p.id_publicacion for p in publicaciones], user_id)
+    for publicacion in publicaciones:
+        publicacion.estadisticas = estadisticas.get(publicacion.id_publicacion)
+    return resultado
+
+def adjuntar_medios(db: Session, resultado):
+    """
+    Agrega a cada publicación del resultado de paginar_publicaciones las variantes de su
+    imagen o el póster de su video (2 consultas en total)
+    """
+    publicaciones = resultado["publicaciones"] if isinstance(resultado, dict) else resultado
+    principales = {p.id_publicacion: p.medios[0] for p in publicaciones if p.medios}
+    variantes = variantes_por_original(
+        db, [principales[p.id_publicacion] for p in publicaciones if p.tipo_medio == "imagen" and p.medios]
+    )
+    posters = posters_por_original(
+        db, [principales[p.id_publicacion] for p in publicaciones if p.tipo_medio == "video" and p.medios]
+    )
+    for publicacion in publicaciones:
+        principal = principales.get(publicacion.id_publicacion)
+        publicacion.variantes = variantes.get(principal)
+        publicacion.poster = posters.get(principal)
+    return resultado
 
-@app.get("/publicaciones/categoria/{categoria_nombre}", response_model=List[schemas.PublicacionResponse])
+@app.get("/publicaciones", response_model=Union[List[schemas.PublicacionResponse], schemas.PublicacionesPaginadasResponse])
+def obtener_publicaciones(
+    cursor: Optional[str] = None,
+    limite: Optional[int] = None,
+    incluir_estadisticas: bool = False,
+    db: Session = Depends(get_db_lectura),
+    user_id: int = Depends(get_current_user_id)
+):
+    """Feed principal (ver paginar_publicaciones para el modo por cursor)"""
+    query = filtrar_publicaciones(
+        db.query(models.Publicacion)
+        .options(joinedload(models.Publicacion.usuario).joinedload(models.Usuario.perfil)),
+        user_id
+    )
+
+    resultado = adjuntar_medios(db, paginar_publicaciones(query, cursor, limite))
+    return adjuntar_estadisticas(db, resultado, user_id) if incluir_estadisticas else resultado
+
+@app.get("/publicaciones/categoria/{categoria_nombre}", response_model=Union[List[schemas.PublicacionResponse], schemas.PublicacionesPaginadasResponse])
 def obtener_publicaciones_por_categoria(
     categoria_nombre: str,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    limite: Optional[int] = None,
+    incluir_estadisticas: bool = False,
+    db: Session = Depends(get_db_lectura),
     user_id: int = Depends(get_current_user_id)
 ):
     """
     Obtiene publicaciones filtradas por categoría (etiqueta).
+    Coincide con etiquetas que contienen la categoría.
     """
     try:
-        # Normalizar nombre de categoría
-        categoria_normalizada = categoria_nombre.lower().strip()
-        
-        # Obtener filtros de bloqueo y "no me interesa"
-        usuarios_bloqueados = db.query(models.BloqueoUsuario.id_bloqueado).filter(
-            models.BloqueoUsuario.id_bloqueador == user_id
-        ).all()
-        ids_usuarios_bloqueados = [ub[0] for ub in usuarios_bloqueados]
-
-        usuarios_que_me_bloquearon = db.query(models.BloqueoUsuario.id_bloqueador).filter(
-            models.BloqueoUsuario.id_bloqueado == user_id
-        ).all()
-        ids_usuarios_que_me_bloquearon = [ub[0] for ub in usuarios_que_me_bloquearon]
-
-        no_me_interesa = db.query(models.NoMeInteresa.id_publicacion).filter(
-            models.NoMeInteresa.id_usuario == user_id
-        ).all()
-        ids_no_me_interesa = [nmi[0] for nmi in no_me_interesa]
-
-        # Obtener todas las publicaciones con filtros aplicados
-        todas_publicaciones = (
+        query = filtrar_publicaciones(
             db.query(models.Publicacion)
             .options(joinedload(models.Publicacion.usuario).joinedload(models.Usuario.perfil))
-            .filter(
-                ~models.Publicacion.id_usuario.in_(ids_usuarios_bloqueados),
-                ~models.Publicacion.id_usuario.in_(ids_usuarios_que_me_bloquearon),
-                ~models.Publicacion.id_publicacion.in_(ids_no_me_interesa)
-            )
-            .order_by(models.Publicacion.fecha_creacion.desc())
-            .all()
+            .filter(filtro_categorias([categoria_nombre], cursor)),
+            user_id
         )
+
+        resultado = adjuntar_medios(db, paginar_publicaciones(query, cursor, limite))
+        return adjuntar_estadisticas(db, resultado, user_id) if incluir_estadisticas else resultado
         
-        # Filtrar por etiqueta
-        publicaciones_filtradas = []
-        for pub in todas_publicaciones:
-            if pub.etiquetas:
-                try:
-                    # Parsear etiquetas JSON
-                    etiquetas_lista = json.loads(pub.etiquetas) if isinstance(pub.etiquetas, str) else pub.etiquetas
-                    
-                    # Verificar si alguna etiqueta coincide con la categoría buscada
-                    if etiquetas_lista:
-                        # Normalizar etiquetas para comparación
-                        etiquetas_normalizadas = [str(tag).lower().strip() for tag in etiquetas_lista]
-                        
-                        # Buscar coincidencia exacta o parcial
-                        if (categoria_normalizada in etiquetas_normalizadas or
-                            any(categoria_normalizada in tag for tag in etiquetas_normalizadas)):
-                            publicaciones_filtradas.append(pub)
-                except Exception as e:
-                    print(f"Error al parsear etiquetas para publicación {pub.id_publicacion}: {e}")
-                    # Si hay error al parsear, verificar si el string contiene la categoría
-                    if (pub.etiquetas and 
-                        isinstance(pub.etiquetas, str) and 
-                        categoria_normalizada in pub.etiquetas.lower()):
-                        publicaciones_filtradas.append(pub)
-        
-        print(f"📊 Encontradas {len(publicaciones_filtradas)} publicaciones para categoría '{categoria_nombre}'")
-        
-        if not publicaciones_filtradas:
-            # Si no hay publicaciones, devolver lista vacía
-            return []
-        
-        return publicaciones_filtradas
-        
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Error obteniendo publicaciones por categoría: {str(e)}")
         raise HTTPException(
@@ -579,10 +706,13 @@ def obtener_publicaciones_por_categoria(
             detail=f"Error interno del servidor: {str(e)}"
         )
     
-@app.get("/publicaciones/categorias/{categorias}")
+@app.get("/publicaciones/categorias/{categorias}", response_model=Union[List[schemas.PublicacionResponse], schemas.PublicacionesPaginadasResponse])
 def obtener_publicaciones_por_categorias(
     categorias: str,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    limite: Optional[int] = None,
+    incluir_estadisticas: bool = False,
+    db: Session = Depends(get_db_lectura),
     user_id: int = Depends(get_current_user_id)
 ):
     """
@@ -599,63 +729,18 @@ def obtener_publicaciones_por_categorias(
                 detail="Debe proporcionar al menos una categoría"
             )
         
-        # Obtener filtros de bloqueo y "no me interesa"
-        usuarios_bloqueados = db.query(models.BloqueoUsuario.id_bloqueado).filter(
-            models.BloqueoUsuario.id_bloqueador == user_id
-        ).all()
-        ids_usuarios_bloqueados = [ub[0] for ub in usuarios_bloqueados]
-
-        usuarios_que_me_bloquearon = db.query(models.BloqueoUsuario.id_bloqueador).filter(
-            models.BloqueoUsuario.id_bloqueado == user_id
-        ).all()
-        ids_usuarios_que_me_bloquearon = [ub[0] for ub in usuarios_que_me_bloquearon]
-
-        no_me_interesa = db.query(models.NoMeInteresa.id_publicacion).filter(
-            models.NoMeInteresa.id_usuario == user_id
-        ).all()
-        ids_no_me_interesa = [nmi[0] for nmi in no_me_interesa]
-
-        # Obtener todas las publicaciones con filtros aplicados
-        todas_publicaciones = (
+        query = filtrar_publicaciones(
             db.query(models.Publicacion)
             .options(joinedload(models.Publicacion.usuario).joinedload(models.Usuario.perfil))
-            .filter(
-                ~models.Publicacion.id_usuario.in_(ids_usuarios_bloqueados),
-                ~models.Publicacion.id_usuario.in_(ids_usuarios_que_me_bloquearon),
-                ~models.Publicacion.id_publicacion.in_(ids_no_me_interesa)
-            )
-            .order_by(models.Publicacion.fecha_creacion.desc())
-            .all()
+            .filter(filtro_categorias(categorias_lista, cursor)),
+            user_id
         )
+
+        resultado = adjuntar_medios(db, paginar_publicaciones(query, cursor, limite))
+        return adjuntar_estadisticas(db, resultado, user_id) if incluir_estadisticas else resultado
         
-        # Filtrar por múltiples categorías
-        publicaciones_filtradas = []
-        for pub in todas_publicaciones:
-            if pub.etiquetas:
-                try:
-                    etiquetas_lista = json.loads(pub.etiquetas) if isinstance(pub.etiquetas, str) else pub.etiquetas
-                    
-                    if etiquetas_lista:
-                        etiquetas_normalizadas = [str(tag).lower().strip() for tag in etiquetas_lista]
-                        
-                        # Verificar si alguna etiqueta coincide con alguna categoría buscada
-                        for categoria in categorias_lista:
-                            if (categoria in etiquetas_normalizadas or
-                                any(categoria in tag for tag in etiquetas_normalizadas)):
-                                publicaciones_filtradas.append(pub)
-                                break  # Si coincide con alguna categoría, agregar y pasar a siguiente publicación
-                except:
-                    if pub.etiquetas and isinstance(pub.etiquetas, str):
-                        etiquetas_str = pub.etiquetas.lower()
-                        for categoria in categorias_lista:
-                            if categoria in etiquetas_str:
-                                publicaciones_filtradas.append(pub)
-                                break
-        
-        print(f"📊 Encontradas {len(publicaciones_filtradas)} publicaciones para categorías: {categorias_lista}")
-        
-        return publicaciones_filtradas
-        
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error obteniendo publicaciones por múltiples categorías: {str(e)}")
         raise HTTPException(
@@ -954,42 +1039,103 @@ def eliminar_amigo(
     return {"mensaje": f"Has eliminado a {id_amigo} de tu lista de amigos"}
 
 # ------------------ NOTIFICACIONES ------------------
-@app.get("/notificaciones", response_model=List[schemas.NotificacionResponse])
-def obtener_notificaciones(db: Session = Depends(get_db), user_id: int = Depends(get_current_user_id)):
+@app.get("/notificaciones", response_model=Union[List[schemas.NotificacionResponse], schemas.NotificacionesPaginadasResponse])
+def obtener_notificaciones(
+    cursor: Optional[str] = None,
+    limite: Optional[int] = None,
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    """
+    Sin cursor ni limite devuelve la lista completa (compatibilidad con clientes antiguos).
+    Con cursor y/o limite devuelve {"notificaciones", "next_cursor", "cursor_reciente"}.
+    """
+    if cursor is not None or limite is not None:
+        return cargar_notificaciones(db, user_id, cursor, normalizar_limite(limite))
+
     notificaciones = (
         db.query(models.Notificacion)
         .filter(models.Notificacion.id_usuario == user_id)
-        .order_by(models.Notificacion.fecha.desc())
+        .order_by(models.Notificacion.fecha.desc(), models.Notificacion.id_notificacion.desc())
         .all()
     )
-
-    return [
-        {
-            "id_notificacion": n.id_notificacion,
-            "tipo": n.tipo,
-            "mensaje": n.mensaje,
-            "fecha_creacion": n.fecha,
-            "leida": n.leido,
-            "id_referencia": n.id_referencia if n.id_referencia is not None else None
-        }
-        for n in notificaciones
-    ]
+    return [formatear_notificacion(n) for n in notificaciones]
     
 @app.put("/notificaciones/leidas")
 def marcar_notificaciones_leidas(
+    hasta: Optional[str] = None,
     db: Session = Depends(get_db),
     user_id: int = Depends(get_current_user_id)
 ):
-    notificaciones = db.query(models.Notificacion).filter(
-        models.Notificacion.id_usuario == user_id,
-        models.Notificacion.leido == False
-    ).all()
+    """Marca todas como leídas, o con hasta=<cursor_reciente> sólo las que el cliente ya vio"""
+    actualizadas = marcar_leidas(db, user_id, hasta)
+    return {"mensaje": f"{actualizadas} notificaciones marcadas como leídas"}
+
+@app.get("/notificaciones/no-leidas")
+async def obtener_notificaciones_no_leidas(
+    db: AsyncSession = Depends(get_async_db),
+    user_id: int = Depends(get_current_user_id_async)
+):
+    """Cantidad de notificaciones sin leer, leída del contador en usuarios (sin COUNT)"""
+    return {"no_leidas": await contar_no_leidas_async(db, user_id)}
 
-    for n in notificaciones:
-        n.leido = True
+# Cada cuánto se manda un comentario SSE para que proxies y navegador no corten la conexión
+INTERVALO_LATIDO_SSE = 25
 
-    db.commit()
-    return {"mensaje": f"{len(notificaciones)} notificaciones marcadas como leídas"}
+def _formatear_sse(evento: dict) -> str:
+    return f"event: {evento['tipo']}\ndata: {json.dumps(evento)}\n\n"
+
+def _contar_no_leidas_hilo(id_usuario: int) -> Optional[int]:
+    db = database.SessionLocal()
+    try:
+        if not usuario_existe(db, id_usuario):
+            return None
+        return contar_no_leidas(db, id_usuario)
+    finally:
+        db.close()
+
+def _id_de_token_en_query(token: str, id_usuario: int) -> Optional[int]:
+    """Para EventSource/WebSocket (sin headers): el id de la query tiene que coincidir con el token"""
+    try:
+        id_token = verificar_token(token)
+    except HTTPException:
+        return None
+    return id_token if id_token == id_usuario else None
+
+@app.get("/notificaciones/stream")
+async def stream_notificaciones(request: Request, id_usuario: int, token: str = ""):
+    """
+    Server-Sent Events con las notificaciones nuevas del usuario (evento "notificacion")
+    y los cambios de estado ("notificaciones_leidas"). Al conectar se envía "no_leidas".
+    EventSource no permite headers, así que token e id_usuario van en la query.
+    """
+    no_leidas = None
+    if _id_de_token_en_query(token, id_usuario) is not None:
+        no_leidas = await run_in_threadpool(_contar_no_leidas_hilo, id_usuario)
+    if no_leidas is None:
+        raise HTTPException(status_code=401, detail="Token inválido")
+
+    receptor = ReceptorCola(TIPOS_NOTIFICACION)
+    registro.agregar(id_usuario, receptor)
+
+    async def eventos():
+        try:
+            yield _formatear_sse(crear_evento("no_leidas", no_leidas=no_leidas))
+            while not await request.is_disconnected():
+                try:
+                    evento = await asyncio.wait_for(receptor.cola.get(), timeout=INTERVALO_LATIDO_SSE)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield _formatear_sse(evento)
+        finally:
+            registro.quitar(id_usuario, receptor)
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 
@@ -1015,7 +1161,7 @@ def obtener_siguiendo(db: Session = Depends(get_db), user_id: int = Depends(get_
 
 # ------------------ OBTENER ESTADÍSTICAS DEL PERFIL ------------------
 @app.get("/estadisticas-perfil/{id_usuario}")
-def obtener_estadisticas_perfil(id_usuario: int, db: Session = Depends(get_db)):
+def obtener_estadisticas_perfil(id_usuario: int, db: Session = Depends(get_db_lectura)):
     # Contar seguidores
     seguidores = db.query(models.SeguirUsuario).filter(
         models.SeguirUsuario.id_seguido == id_usuario
@@ -1036,24 +1182,20 @@ def obtener_estadisticas_perfil(id_usuario: int, db: Session = Depends(get_db)):
         models.MeGusta.id_usuario == id_usuario
     ).count()
 
-    # Me gusta QUE RECIBE el usuario (en sus publicaciones) - optimizado con join
-    me_gusta_recibe = db.query(models.MeGusta).join(
-        models.Publicacion, models.MeGusta.id_publicacion == models.Publicacion.id_publicacion
-    ).filter(
+    # Me gusta QUE RECIBE el usuario (suma de los contadores de sus publicaciones)
+    me_gusta_recibe = db.query(func.coalesce(func.sum(models.Publicacion.total_me_gusta), 0)).filter(
         models.Publicacion.id_usuario == id_usuario
-    ).count()
+    ).scalar()
 
     # Me gusta QUE DA en comentarios
     me_gusta_comentarios_da = db.query(models.MeGustaComentario).filter(
         models.MeGustaComentario.id_usuario == id_usuario
     ).count()
 
-    # Me gusta QUE RECIBE en sus comentarios - optimizado con join
-    me_gusta_comentarios_recibe = db.query(models.MeGustaComentario).join(
-        models.Comentario, models.MeGustaComentario.id_comentario == models.Comentario.id_comentario
-    ).filter(
+    # Me gusta QUE RECIBE en sus comentarios (suma de los contadores de sus comentarios)
+    me_gusta_comentarios_recibe = db.query(func.coalesce(func.sum(models.Comentario.total_me_gusta), 0)).filter(
         models.Comentario.id_usuario == id_usuario
-    ).count()
+    ).scalar()
 
     return {
         "seguidores": seguidores,
@@ -1069,7 +1211,7 @@ def obtener_estadisticas_perfil(id_usuario: int, db: Session = Depends(get_db)):
 
 # ------------------ OBTENER PUBLICACIONES DE USUARIO ESPECÍFICO ------------------
 @app.get("/publicaciones-usuario/{id_usuario}")
-def obtener_publicaciones_usuario(id_usuario: int, db: Session = Depends(get_db)):
+def obtener_publicaciones_usuario(id_usuario: int, db: Session = Depends(get_db_lectura)):
     publicaciones = db.query(models.Publicacion)\
         .options(joinedload(models.Publicacion.usuario).joinedload(models.Usuario.perfil))\
         .filter(models.Publicacion.id_usuario == id_usuario)\
@@ -1098,12 +1240,10 @@ async def reportar_usuario(
     # Guardar evidencia si se adjunta
     evidencia_url = None
     if evidencia:
-        os.makedirs("static/reportes", exist_ok=True)
-        filename = f"reporte_{user_id}_{id_reportado}_{int(datetime.now().timestamp())}.jpg"
-        path = os.path.join("static/reportes", filename)
-        with open(path, "wb") as f:
-            f.write(await evidencia.read())
-        evidencia_url = f"http://localhost:8000/static/reportes/{filename}"
+        guardado = await guardar_blob(
+            db, evidencia, "jpg", MAX_IMAGEN_FILE_SIZE, "La evidencia es demasiado grande. Máximo 10MB"
+        )
+        evidencia_url = f"http://localhost:8000/{guardado.ruta}"
 
     # Crear reporte
     nuevo_reporte = models.ReporteUsuario(
@@ -1126,7 +1266,7 @@ async def reportar_usuario(
 
 # ------------------ RELACIONES SEGUIR / SEGUIDORES ------------------
 @app.get("/seguidores/{id_usuario}")
-def obtener_seguidores(id_usuario: int, db: Session = Depends(get_db)):
+def obtener_seguidores(id_usuario: int, db: Session = Depends(get_db_lectura)):
     seguidores = (
         db.query(models.SeguirUsuario)
         .filter(models.SeguirUsuario.id_seguido == id_usuario)
@@ -1150,7 +1290,7 @@ def obtener_seguidores(id_usuario: int, db: Session = Depends(get_db)):
 
 
 @app.get("/siguiendo/{id_usuario}")
-def obtener_siguiendo(id_usuario: int, db: Session = Depends(get_db)):
+def obtener_siguiendo(id_usuario: int, db: Session = Depends(get_db_lectura)):
     siguiendo = (
         db.query(models.SeguirUsuario)
         .filter(models.SeguirUsuario.id_seguidor == id_usuario)
@@ -1354,6 +1494,7 @@ def eliminar_publicacion(
     if publicacion.id_usuario != user_id:
         raise HTTPException(status_code=403, detail="No tienes permiso para eliminar esta publicación")
 
+    restar_conteos_publicacion(db, publicacion)
     db.delete(publicacion)
     db.commit()
 
@@ -1546,20 +1687,16 @@ def dar_me_gusta(
         id_publicacion=id_publicacion
     )
     db.add(nuevo_me_gusta)
+    ajustar_publicacion(db, id_publicacion, "total_me_gusta", 1)
     db.commit()
     db.refresh(nuevo_me_gusta)
 
-    # Crear notificación si no es el propio usuario
+    # Notificar al autor (se agrupa con otros me gusta sin leer de la misma publicación)
     if publicacion.id_usuario != user_id:
-        usuario_actual = db.query(models.Usuario).filter(models.Usuario.id_usuario == user_id).first()
-        noti = models.Notificacion(
-            id_usuario=publicacion.id_usuario,
-            tipo="me_gusta",
-            mensaje=f"A {usuario_actual.nombre_usuario} le gusta tu publicación",
-            id_referencia=id_publicacion
+        encolar_notificacion(
+            publicacion.id_usuario, "me_gusta", "A {actor} le gusta tu publicación",
+            id_actor=user_id, id_referencia=id_publicacion
         )
-        db.add(noti)
-        db.commit()
 
     return {"mensaje": "Me gusta agregado", "id_megusta": nuevo_me_gusta.id_megusta}
 
@@ -1579,6 +1716,7 @@ def quitar_me_gusta(
         raise HTTPException(status_code=404, detail="No has dado me gusta a esta publicación")
 
     db.delete(me_gusta)
+    ajustar_publicacion(db, id_publicacion, "total_me_gusta", -1)
     db.commit()
 
     return {"mensaje": "Me gusta eliminado"}
@@ -1614,6 +1752,7 @@ def guardar_publicacion(
         id_publicacion=id_publicacion
     )
     db.add(nuevo_guardado)
+    ajustar_publicacion(db, id_publicacion, "total_guardados", 1)
     db.commit()
     db.refresh(nuevo_guardado)
 
@@ -1635,6 +1774,7 @@ def quitar_guardado(
         raise HTTPException(status_code=404, detail="No tienes guardada esta publicación")
 
     db.delete(guardado)
+    ajustar_publicacion(db, id_publicacion, "total_guardados", -1)
     db.commit()
 
     return {"mensaje": "Publicación eliminada de guardados"}
@@ -1670,23 +1810,18 @@ def crear_comentario(
         contenido=comentario.contenido
     )
     db.add(nuevo_comentario)
+    ajustar_publicacion(db, comentario.id_publicacion, "total_comentarios", 1)
     db.commit()
     db.refresh(nuevo_comentario)
 
-    # Crear notificación si no es el propio usuario
+    # Notificar al autor si no es el propio usuario
     if publicacion.id_usuario != user_id:
-        usuario_actual = db.query(models.Usuario).filter(models.Usuario.id_usuario == user_id).first()
         tipo_noti = "comentario_respuesta" if comentario.id_comentario_padre else "comentario"
-        mensaje = f"{usuario_actual.nombre_usuario} {'respondió a tu comentario' if comentario.id_comentario_padre else 'comentó tu publicación'}"
-        
-        noti = models.Notificacion(
-            id_usuario=publicacion.id_usuario,
-            tipo=tipo_noti,
-            mensaje=mensaje,
-            id_referencia=nuevo_comentario.id_comentario
+        plantilla = "{actor} respondió a tu comentario" if comentario.id_comentario_padre else "{actor} comentó tu publicación"
+        encolar_notificacion(
+            publicacion.id_usuario, tipo_noti, plantilla,
+            id_actor=user_id, id_referencia=nuevo_comentario.id_comentario
         )
-        db.add(noti)
-        db.commit()
 
     # Cargar relaciones para la respuesta
     db.refresh(nuevo_comentario)
@@ -1695,10 +1830,17 @@ def crear_comentario(
 @app.get("/comentarios/publicacion/{id_publicacion}", response_model=schemas.ComentarioConRespuestasResponse)
 def obtener_comentarios_publicacion(
     id_publicacion: int,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    limite: Optional[int] = None,
+    profundidad: int = PROFUNDIDAD_POR_DEFECTO,
+    db: Session = Depends(get_db_lectura),
     user_id: int = Depends(get_current_user_id)
 ):
-    """Obtener todos los comentarios de una publicación (con respuestas anidadas)"""
+    """
+    Obtener los comentarios de una publicación (con respuestas anidadas).
+    Con cursor o limite se paginan los comentarios principales; profundidad
+    limita los niveles de respuestas devueltos.
+    """
     # Verificar que la publicación existe
     publicacion = db.query(models.Publicacion).filter(
         models.Publicacion.id_publicacion == id_publicacion
@@ -1707,108 +1849,14 @@ def obtener_comentarios_publicacion(
     if not publicacion:
         raise HTTPException(status_code=404, detail="Publicación no encontrada")
 
-    # Obtener comentarios principales (sin padre)
-    comentarios_principales = db.query(models.Comentario)\
-        .options(joinedload(models.Comentario.usuario).joinedload(models.Usuario.perfil))\
-        .filter(
-            models.Comentario.id_publicacion == id_publicacion,
-            models.Comentario.id_comentario_padre.is_(None)
-        )\
-        .order_by(models.Comentario.fecha.asc())\
-        .all()
-
-    def cargar_respuestas(comentario, usuario_actual_id):
-        # Cargar respuestas recursivamente
-        respuestas = db.query(models.Comentario)\
-            .options(joinedload(models.Comentario.usuario).joinedload(models.Usuario.perfil))\
-            .filter(models.Comentario.id_comentario_padre == comentario.id_comentario)\
-            .order_by(models.Comentario.fecha.asc())\
-            .all()
-        
-        resultado_respuestas = []
-        for respuesta in respuestas:
-            # Verificar si el usuario actual dio me gusta a este comentario
-            me_gusta_dado = db.query(models.MeGustaComentario).filter(
-                models.MeGustaComentario.id_usuario == usuario_actual_id,
-                models.MeGustaComentario.id_comentario == respuesta.id_comentario
-            ).first() is not None
-
-            # Contar total de me gusta
-            total_me_gusta = db.query(models.MeGustaComentario).filter(
-                models.MeGustaComentario.id_comentario == respuesta.id_comentario
-            ).count()
+    if cursor is not None or limite is not None:
+        limite = normalizar_limite(limite)
 
-            resultado_respuestas.append(schemas.ComentarioResponse(
-                id_comentario=respuesta.id_comentario,
-                id_usuario=respuesta.id_usuario,
-                id_publicacion=respuesta.id_publicacion,
-                id_comentario_padre=respuesta.id_comentario_padre,
-                contenido=respuesta.contenido,
-                fecha=respuesta.fecha,
-                usuario=schemas.UsuarioPerfil(
-                    id_usuario=respuesta.usuario.id_usuario,
-                    nombre=respuesta.usuario.nombre,
-                    nombre_usuario=respuesta.usuario.nombre_usuario,
-                    perfil=schemas.PerfilResponse(
-                        id_perfil=respuesta.usuario.perfil.id_perfil,
-                        id_usuario=respuesta.usuario.perfil.id_usuario,
-                        descripcion=respuesta.usuario.perfil.descripcion,
-                        biografia=respuesta.usuario.perfil.biografia,
-                        foto_perfil=respuesta.usuario.perfil.foto_perfil
-                    ) if respuesta.usuario.perfil else None
-                ),
-                respuestas=cargar_respuestas(respuesta, usuario_actual_id),
-                total_me_gusta=total_me_gusta,
-                me_gusta_dado=me_gusta_dado
-            ))
-        
-        return resultado_respuestas
-
-    # Construir respuesta con comentarios anidados
-    comentarios_con_respuestas = []
-    for comentario in comentarios_principales:
-        # Verificar si el usuario actual dio me gusta a este comentario
-        me_gusta_dado = db.query(models.MeGustaComentario).filter(
-            models.MeGustaComentario.id_usuario == user_id,
-            models.MeGustaComentario.id_comentario == comentario.id_comentario
-        ).first() is not None
-
-        # Contar total de me gusta
-        total_me_gusta = db.query(models.MeGustaComentario).filter(
-            models.MeGustaComentario.id_comentario == comentario.id_comentario
-        ).count()
-
-        comentarios_con_respuestas.append(schemas.ComentarioResponse(
-            id_comentario=comentario.id_comentario,
-            id_usuario=comentario.id_usuario,
-            id_publicacion=comentario.id_publicacion,
-            id_comentario_padre=comentario.id_comentario_padre,
-            contenido=comentario.contenido,
-            fecha=comentario.fecha,
-            usuario=schemas.UsuarioPerfil(
-                id_usuario=comentario.usuario.id_usuario,
-                nombre=comentario.usuario.nombre,
-                nombre_usuario=comentario.usuario.nombre_usuario,
-                perfil=schemas.PerfilResponse(
-                    id_perfil=comentario.usuario.perfil.id_perfil,
-                    id_usuario=comentario.usuario.perfil.id_usuario,
-                    descripcion=comentario.usuario.perfil.descripcion,
-                    biografia=comentario.usuario.perfil.biografia,
-                    foto_perfil=comentario.usuario.perfil.foto_perfil
-                ) if comentario.usuario.perfil else None
-            ),
-            respuestas=cargar_respuestas(comentario, user_id),
-            total_me_gusta=total_me_gusta,
-            me_gusta_dado=me_gusta_dado
-        ))
-
-    total_comentarios = db.query(models.Comentario).filter(
-        models.Comentario.id_publicacion == id_publicacion
-    ).count()
-
-    return schemas.ComentarioConRespuestasResponse(
-        comentarios=comentarios_con_respuestas,
-        total=total_comentarios
+    return cargar_arbol_comentarios(
+        db, id_publicacion, user_id,
+        cursor=cursor,
+        limite=limite,
+        profundidad_maxima=max(0, min(profundidad, PROFUNDIDAD_POR_DEFECTO))
     )
 
 @app.get("/comentarios/{id_comentario}/publicacion")
@@ -1845,6 +1893,7 @@ def eliminar_comentario(
         raise HTTPException(status_code=403, detail="No tienes permiso para eliminar este comentario")
 
     # Eliminar comentario y sus respuestas (en cascada por la relación)
+    ajustar_publicacion(db, comentario.id_publicacion, "total_comentarios", -1)
     db.delete(comentario)
     db.commit()
 
@@ -1878,6 +1927,7 @@ def dar_me_gusta_comentario(
         id_comentario=id_comentario
     )
     db.add(nuevo_me_gusta)
+    ajustar_comentario(db, id_comentario, 1)
     db.commit()
 
     return {"mensaje": "Me gusta agregado al comentario"}
@@ -1898,6 +1948,7 @@ def quitar_me_gusta_comentario(
         raise HTTPException(status_code=404, detail="No has dado me gusta a este comentario")
 
     db.delete(me_gusta)
+    ajustar_comentario(db, id_comentario, -1)
     db.commit()
 
     return {"mensaje": "Me gusta eliminado del comentario"}
@@ -1906,7 +1957,7 @@ def quitar_me_gusta_comentario(
 @app.get("/publicaciones/{id_publicacion}/estadisticas", response_model=schemas.EstadisticasPublicacionResponse)
 def obtener_estadisticas_publicacion(
     id_publicacion: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_lectura),
     user_id: int = Depends(get_current_user_id)
 ):
     """Obtener estadísticas de una publicación (me gusta, comentarios, guardados)"""
@@ -1917,18 +1968,6 @@ def obtener_estadisticas_publicacion(
     if not publicacion:
         raise HTTPException(status_code=404, detail="Publicación no encontrada")
 
-    total_me_gusta = db.query(models.MeGusta).filter(
-        models.MeGusta.id_publicacion == id_publicacion
-    ).count()
-
-    total_comentarios = db.query(models.Comentario).filter(
-        models.Comentario.id_publicacion == id_publicacion
-    ).count()
-
-    total_guardados = db.query(models.Guardado).filter(
-        models.Guardado.id_publicacion == id_publicacion
-    ).count()
-
     me_gusta_dado = db.query(models.MeGusta).filter(
         models.MeGusta.id_usuario == user_id,
         models.MeGusta.id_publicacion == id_publicacion
@@ -1940,13 +1979,27 @@ def obtener_estadisticas_publicacion(
     ).first() is not None
 
     return {
-        "total_me_gusta": total_me_gusta,
-        "total_comentarios": total_comentarios,
-        "total_guardados": total_guardados,
+        "total_me_gusta": publicacion.total_me_gusta,
+        "total_comentarios": publicacion.total_comentarios,
+        "total_guardados": publicacion.total_guardados,
+        "total_compartidos": publicacion.total_compartidos,
         "me_gusta_dado": me_gusta_dado,
         "guardado": guardado
     }
 
+@app.post("/publicaciones/estadisticas", response_model=List[schemas.EstadisticasPublicacionLoteResponse])
+def obtener_estadisticas_publicaciones(
+    datos: schemas.EstadisticasLoteRequest,
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    """Estadísticas de varias publicaciones a la vez (máximo 100), en el orden pedido"""
+    ids = list(dict.fromkeys(datos.ids_publicaciones))
+    if len(ids) > LIMITE_MAXIMO:
+        raise HTTPException(status_code=400, detail=f"Máximo {LIMITE_MAXIMO} publicaciones por consulta")
+
+    estadisticas = estadisticas_publicaciones(db, ids, user_id)
+    return [estadisticas[id_pub] for id_pub in ids if id_pub in estadisticas]
 
 # ------------------ PUBLICACIONES GUARDADAS ------------------
 @app.get("/guardados", response_model=List[schemas.PublicacionResponse])
@@ -1974,7 +2027,7 @@ def obtener_publicaciones_guardadas(
 @app.get("/usuarios/{id_usuario}/megusta-dados")
 def obtener_megusta_dados(
     id_usuario: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db_lectura)
 ):
     """Obtener todas las publicaciones a las que el usuario ha dado me gusta"""
     me_gustas = db.query(models.MeGusta)\
@@ -2017,12 +2070,11 @@ def obtener_megusta_dados(
 
 # ------------------ OBTENER ESTADÍSTICAS DE ME GUSTAS ------------------
 @app.get("/estadisticas-me-gustas/{id_usuario}")
-def obtener_estadisticas_me_gustas(id_usuario: int, db: Session = Depends(get_db)):
-    # Me gustas RECIBIDOS (en las publicaciones del usuario)
-    me_gustas_recibidos = db.query(models.MeGusta)\
-        .join(models.Publicacion, models.MeGusta.id_publicacion == models.Publicacion.id_publicacion)\
+def obtener_estadisticas_me_gustas(id_usuario: int, db: Session = Depends(get_db_lectura)):
+    # Me gustas RECIBIDOS (suma de los contadores de las publicaciones del usuario)
+    me_gustas_recibidos = db.query(func.coalesce(func.sum(models.Publicacion.total_me_gusta), 0))\
         .filter(models.Publicacion.id_usuario == id_usuario)\
-        .count()
+        .scalar()
 
     # Me gustas DADOS (que el usuario ha dado a otras publicaciones)
     me_gustas_dados = db.query(models.MeGusta)\
@@ -2070,27 +2122,21 @@ def compartir_publicacion(
         )
         
         db.add(nuevo_compartido)
+        ajustar_publicacion(db, id_publicacion, "total_compartidos", 1)
         db.commit()
         db.refresh(nuevo_compartido)
         
         print(f"✅ Compartido creado: ID {nuevo_compartido.id_compartido}")
         
-        # Obtener usuario actual
-        usuario_actual = db.query(models.Usuario).filter(models.Usuario.id_usuario == user_id).first()
-        
-        # 🔥 CREAR NOTIFICACIONES MEJORADAS
+        # 🔥 CREAR NOTIFICACIONES (se guardan en segundo plano, ver backend/cola_notificaciones.py)
         notificaciones_creadas = 0
         
         # 1. Notificación para el dueño de la publicación (si no es el mismo usuario)
         if publicacion.id_usuario != user_id:
-            notificacion_propietario = models.Notificacion(
-                id_usuario=publicacion.id_usuario,
-                tipo="compartido",
-                mensaje=f"@{usuario_actual.nombre_usuario} compartió tu publicación",
-                leido=False,
-                id_referencia=nuevo_compartido.id_compartido
+            encolar_notificacion(
+                publicacion.id_usuario, "compartido", "@{actor} compartió tu publicación",
+                id_actor=user_id, id_referencia=nuevo_compartido.id_compartido
             )
-            db.add(notificacion_propietario)
             notificaciones_creadas += 1
             print(f"📤 Notificación creada para propietario: usuario {publicacion.id_usuario}")
         
@@ -2108,20 +2154,15 @@ def compartir_publicacion(
                 ).first()
                 
                 if amistad:
-                    notificacion_amigo = models.Notificacion(
-                        id_usuario=amigo_id,
-                        tipo="compartido_amigo", 
-                        mensaje=f"@{usuario_actual.nombre_usuario} te compartió una publicación",
-                        leido=False,
-                        id_referencia=nuevo_compartido.id_compartido
+                    encolar_notificacion(
+                        amigo_id, "compartido_amigo", "@{actor} te compartió una publicación",
+                        id_actor=user_id, id_referencia=nuevo_compartido.id_compartido
                     )
-                    db.add(notificacion_amigo)
                     notificaciones_creadas += 1
                     print(f"📤 Notificación creada para amigo: usuario {amigo_id}")
                 else:
                     print(f"⚠️  Usuario {amigo_id} no es amigo o amistad no aceptada")
         
-        db.commit()
         print(f"✅ Total notificaciones creadas: {notificaciones_creadas}")
         
         return {
@@ -2350,6 +2391,7 @@ def eliminar_compartido(
         if not compartido:
             raise HTTPException(status_code=404, detail="Compartido no encontrado")
         
+        ajustar_publicacion(db, compartido.id_publicacion, "total_compartidos", -1)
         db.delete(compartido)
         db.commit()
         
@@ -2363,7 +2405,7 @@ def eliminar_compartido(
 @app.get("/buscar")
 def buscar(
     query: str,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_lectura),
     user_id: int = Depends(get_current_user_id)
 ):
     """
@@ -2421,52 +2463,107 @@ class ConfiguracionChat(BaseModel):
     fondo_chat: str
     color_burbuja: str
 
+# ------------------ CHAT EN TIEMPO REAL ------------------
+def participantes_chat(chat: models.Chat) -> List[int]:
+    return [chat.id_usuario1, chat.id_usuario2]
+
+def publicar_mensaje_nuevo(background_tasks: BackgroundTasks, chat: models.Chat, mensaje: models.Mensaje):
+    """Empuja el mensaje recién creado a las conexiones de ambos participantes"""
+    datos = formatear_mensaje(mensaje, mensaje.id_emisor)
+    datos.pop("sender")  # "yo"/"otro" depende de quién lo recibe; el cliente usa sender_id
+    background_tasks.add_task(
+        difusion.publicar, participantes_chat(chat),
+        crear_evento("mensaje_nuevo", id_chat=chat.id_chat, mensaje=datos)
+    )
+
+def _leer_chat_ws(id_chat: int, id_usuario: int) -> Optional[List[int]]:
+    """Marca el chat como leído desde el WebSocket; devuelve los participantes si algo cambió"""
+    db = database.SessionLocal()
+    try:
+        chat = db.query(models.Chat).filter(
+            models.Chat.id_chat == id_chat,
+            (models.Chat.id_usuario1 == id_usuario) | (models.Chat.id_usuario2 == id_usuario)
+        ).first()
+        if chat and marcar_chat_leido(db, id_chat, id_usuario):
+            return participantes_chat(chat)
+        return None
+    finally:
+        db.close()
+
+def _usuario_existe(id_usuario: int) -> bool:
+    db = database.SessionLocal()
+    try:
+        return usuario_existe(db, id_usuario)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+async def iniciar_tiempo_real():
+    await tiempo_real.iniciar()
+    cola_notificaciones.iniciar()
+
+@app.on_event("shutdown")
+async def detener_tiempo_real():
+    # Primero vaciar la cola: sus commits todavía publican eventos
+    await run_in_threadpool(cola_notificaciones.detener)
+    await tiempo_real.detener()
+
+@app.websocket("/ws/chat")
+async def websocket_chat(websocket: WebSocket, id_usuario: int, token: str = ""):
+    """
+    Canal de eventos del chat: mensaje_nuevo, mensajes_leidos y mensaje_eliminado.
+    El cliente puede enviar {"tipo": "leer", "id_chat": N} o {"tipo": "ping"}.
+    Como el navegador no permite headers en WebSocket, token e id_usuario van en la query.
+    """
+    if _id_de_token_en_query(token, id_usuario) is None or not await run_in_threadpool(_usuario_existe, id_usuario):
+        await websocket.close(code=4401)
+        return
+
+    await websocket.accept()
+    receptor = ReceptorWebSocket(websocket, TIPOS_CHAT)
+    registro.agregar(id_usuario, receptor)
+    try:
+        while True:
+            try:
+                datos = json.loads(await websocket.receive_text())
+            except ValueError:
+                continue
+            tipo = datos.get("tipo") if isinstance(datos, dict) else None
+            if tipo == "ping":
+                await websocket.send_json({"tipo": "pong"})
+            elif tipo == "leer" and isinstance(datos.get("id_chat"), int):
+                participantes = await run_in_threadpool(_leer_chat_ws, datos["id_chat"], id_usuario)
+                if participantes:
+                    await difusion.publicar(participantes, crear_evento(
+                        "mensajes_leidos", id_chat=datos["id_chat"], id_lector=id_usuario, fecha=datetime.utcnow()
+                    ))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        registro.quitar(id_usuario, receptor)
+
 # Obtener chats del usuario
 @app.get("/chats")
 def obtener_chats(
+    cursor: Optional[str] = None,
+    limite: Optional[int] = None,
     id_usuario: int = Header(..., alias="id_usuario"),
     db: Session = Depends(get_db)
 ):
+    """
+    Bandeja de chats ordenada por última actividad (ver backend/bandeja_chats.py).
+    Con cursor o limite devuelve {"chats": [...], "next_cursor": ...}.
+    """
     try:
-        # Buscar chats donde el usuario sea participante
-        chats = db.query(models.Chat).filter(
-            (models.Chat.id_usuario1 == id_usuario) | 
-            (models.Chat.id_usuario2 == id_usuario)
-        ).all()
-        
-        resultado = []
-        for chat in chats:
-            # Determinar quién es el otro usuario
-            otro_usuario = chat.usuario1 if chat.id_usuario2 == id_usuario else chat.usuario2
-            
-            # Obtener último mensaje
-            ultimo_mensaje = db.query(models.Mensaje).filter(
-                models.Mensaje.id_chat == chat.id_chat
-            ).order_by(models.Mensaje.fecha_envio.desc()).first()
-            
-            # Obtener configuración del chat para este usuario
-            es_usuario1 = chat.id_usuario1 == id_usuario
-            color_chat = chat.color_burbuja_usuario1 if es_usuario1 else chat.color_burbuja_usuario2
-            
-            resultado.append({
-                "id": chat.id_chat,
-                "username": otro_usuario.nombre_usuario,
-                "nombre_completo": f"{otro_usuario.nombre} {otro_usuario.apellido}",
-                "foto_perfil": otro_usuario.perfil.foto_perfil if otro_usuario.perfil else None,
-                "lastMessage": ultimo_mensaje.contenido if ultimo_mensaje else "Iniciar conversación",
-                "color": color_chat,
-                "ultima_actividad": chat.ultima_actividad,
-                "no_leidos": db.query(models.Mensaje).filter(
-                    models.Mensaje.id_chat == chat.id_chat,
-                    models.Mensaje.id_emisor != id_usuario,
-                    models.Mensaje.leido == False
-                ).count()
-            })
-        
-        # Ordenar por última actividad
-        resultado.sort(key=lambda x: x["ultima_actividad"], reverse=True)
-        return resultado
+        if cursor is None and limite is None:
+            chats, _ = cargar_bandeja(db, id_usuario)
+            return chats
+
+        chats, next_cursor = cargar_bandeja(db, id_usuario, cursor, normalizar_limite(limite))
+        return {"chats": chats, "next_cursor": next_cursor}
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener chats: {str(e)}")
 
@@ -2474,9 +2571,17 @@ def obtener_chats(
 @app.get("/chats/{id_chat}/mensajes")
 def obtener_mensajes_chat(
     id_chat: int,
+    background_tasks: BackgroundTasks,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    limite: Optional[int] = None,
     id_usuario: int = Header(..., alias="id_usuario"),
     db: Session = Depends(get_db)
 ):
+    """
+    Mensajes del chat. Con before, after o limite devuelve una página
+    (ver backend/historial_chat.py); sin ellos, el historial completo.
+    """
     try:
         # Verificar que el usuario pertenece al chat
         chat = db.query(models.Chat).filter(
@@ -2487,36 +2592,24 @@ def obtener_mensajes_chat(
         if not chat:
             raise HTTPException(status_code=404, detail="Chat no encontrado")
         
-        # Marcar mensajes como leídos
-        db.query(models.Mensaje).filter(
-            models.Mensaje.id_chat == id_chat,
-            models.Mensaje.id_emisor != id_usuario,
-            models.Mensaje.leido == False
-        ).update({"leido": True})
-        db.commit()
-        
-        # Subquery para obtener IDs de mensajes eliminados por este usuario
-        mensajes_eliminados_subquery = db.query(models.MensajeEliminado.id_mensaje).filter(
-            models.MensajeEliminado.id_usuario == id_usuario
-        ).subquery()
+        # Marcar mensajes como leídos y avisar al otro participante
+        if marcar_chat_leido(db, id_chat, id_usuario):
+            background_tasks.add_task(
+                difusion.publicar, participantes_chat(chat),
+                crear_evento("mensajes_leidos", id_chat=id_chat, id_lector=id_usuario, fecha=datetime.utcnow())
+            )
+
+        if before is not None or after is not None or limite is not None:
+            return cargar_pagina_mensajes(
+                db, id_chat, id_usuario, normalizar_limite(limite, por_defecto=50), before, after
+            )
         
         # Obtener mensajes que NO han sido eliminados por este usuario
-        mensajes = db.query(models.Mensaje).filter(
-            models.Mensaje.id_chat == id_chat,
-            ~models.Mensaje.id_mensaje.in_(mensajes_eliminados_subquery)
-        ).order_by(models.Mensaje.fecha_envio.asc()).all()
-        
-        return [{
-            "id": msg.id_mensaje,
-            "sender": "yo" if msg.id_emisor == id_usuario else "otro",
-            "sender_id": msg.id_emisor,
-            "sender_username": msg.emisor.nombre_usuario,
-            "text": msg.contenido,
-            "tipo": msg.tipo,
-            "archivo_url": msg.archivo_url,
-            "fecha": msg.fecha_envio,
-            "leido": msg.leido
-        } for msg in mensajes]
+        mensajes = consulta_mensajes(db, id_chat, id_usuario).order_by(
+            models.Mensaje.fecha_envio.asc(), models.Mensaje.id_mensaje.asc()
+        ).all()
+        
+        return [formatear_mensaje(msg, id_usuario) for msg in mensajes]
         
     except HTTPException:
         raise
@@ -2528,6 +2621,7 @@ def obtener_mensajes_chat(
 def enviar_mensaje(
     id_chat: int,
     mensaje: MensajeCreate,
+    background_tasks: BackgroundTasks,
     id_usuario: int = Header(..., alias="id_usuario"),
     db: Session = Depends(get_db)
 ):
@@ -2567,6 +2661,8 @@ def enviar_mensaje(
         )
         db.add(notificacion)
         db.commit()
+
+        publicar_mensaje_nuevo(background_tasks, chat, nuevo_mensaje)
         
         return {
             "id": nuevo_mensaje.id_mensaje,
@@ -2588,6 +2684,7 @@ def enviar_mensaje(
 @app.post("/chats/{id_chat}/mensajes/archivo")
 async def enviar_mensaje_archivo(
     id_chat: int,
+    background_tasks: BackgroundTasks,
     archivo: UploadFile = File(...),
     tipo: str = Form(...),
     id_usuario: int = Header(..., alias="id_usuario"),
@@ -2610,15 +2707,8 @@ async def enviar_mensaje_archivo(
         if tipo not in ["imagen", "video"]:
             raise HTTPException(status_code=400, detail="Tipo de archivo no válido")
         
-        # Validar tamaño del archivo
-        contenido = await archivo.read()
-        if len(contenido) > MAX_FILE_SIZE:
-            raise HTTPException(status_code=400, detail="El archivo es demasiado grande. Máximo 50MB")
-        
-        await archivo.seek(0)
-        
-        # Guardar archivo
-        archivo_url = save_chat_file(archivo, tipo)
+        # Guardar archivo (valida el tamaño mientras copia)
+        archivo_url = await save_chat_file(db, archivo, tipo)
         
         # Crear mensaje
         contenido_texto = f"📎 {archivo.filename}"
@@ -2634,8 +2724,10 @@ async def enviar_mensaje_archivo(
         chat.ultima_actividad = datetime.utcnow()
         db.commit()
         db.refresh(nuevo_mensaje)
+
+        publicar_mensaje_nuevo(background_tasks, chat, nuevo_mensaje)
         
-        return {
+        respuesta = {
             "id": nuevo_mensaje.id_mensaje,
             "sender": "yo",
             "text": nuevo_mensaje.contenido,
@@ -2643,6 +2735,9 @@ async def enviar_mensaje_archivo(
             "archivo_url": nuevo_mensaje.archivo_url,
             "fecha": nuevo_mensaje.fecha_envio.isoformat()
         }
+        if tipo == "video":
+            respuesta["id_trabajo"] = encolar_video(db, id_usuario, archivo_url).id_trabajo
+        return respuesta
         
     except HTTPException:
         raise
@@ -2689,6 +2784,7 @@ def crear_o_obtener_chat(
 def eliminar_mensaje(
     id_chat: int,
     id_mensaje: int,
+    background_tasks: BackgroundTasks,
     id_usuario: int = Header(..., alias="id_usuario"),
     db: Session = Depends(get_db)
 ):
@@ -2729,6 +2825,12 @@ def eliminar_mensaje(
         
         db.add(mensaje_eliminado)
         db.commit()
+
+        # Sólo las otras conexiones del mismo usuario
+        background_tasks.add_task(
+            difusion.publicar, [id_usuario],
+            crear_evento("mensaje_eliminado", id_chat=id_chat, id_mensaje=id_mensaje, para_todos=False)
+        )
         
         return {"message": "Mensaje eliminado correctamente para ti"}
         
@@ -2793,6 +2895,7 @@ def eliminar_chat(
 @app.delete("/mensajes/{id_mensaje}/para-todos")
 def eliminar_mensaje_para_todos(
     id_mensaje: int,
+    background_tasks: BackgroundTasks,
     id_usuario: int = Header(..., alias="id_usuario"),
     db: Session = Depends(get_db)
 ):
@@ -2811,8 +2914,14 @@ def eliminar_mensaje_para_todos(
             models.MensajeEliminado.id_mensaje == id_mensaje
         ).delete()
         
+        chat = mensaje.chat
         db.delete(mensaje)
         db.commit()
+
+        background_tasks.add_task(
+            difusion.publicar, participantes_chat(chat),
+            crear_evento("mensaje_eliminado", id_chat=chat.id_chat, id_mensaje=id_mensaje, para_todos=True)
+        )
         
         return {"message": "Mensaje eliminado para todos correctamente"}
         
@@ -2976,24 +3085,15 @@ async def subir_fondo_personalizado(
         if not fondo.content_type.startswith('image/'):
             raise HTTPException(status_code=400, detail="Solo se permiten imágenes")
         
-        # Validar tamaño (máximo 10MB)
-        contenido = await fondo.read()
-        if len(contenido) > 10 * 1024 * 1024:
-            raise HTTPException(status_code=400, detail="La imagen es demasiado grande. Máximo 10MB")
-        
-        # Reiniciar la posición del archivo
-        await fondo.seek(0)
-        
-        # Generar nombre único
         file_extension = fondo.filename.split('.')[-1]
-        unique_filename = f"fondo_chat_{id_chat}_{id_usuario}_{uuid.uuid4()}.{file_extension}"
-        file_path = f"static/chat_fondos/{unique_filename}"
         
-        # Guardar archivo
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(fondo.file, buffer)
+        # Guardar archivo por bloques en el almacén de blobs (máximo 10MB)
+        guardado = await guardar_blob(
+            db, fondo, file_extension, MAX_IMAGEN_FILE_SIZE,
+            "La imagen es demasiado grande. Máximo 10MB"
+        )
         
-        fondo_url = f"/{file_path}"
+        fondo_url = f"/{guardado.ruta}"
         
         # Buscar configuración existente
         config_existente = db.query(models.ConfiguracionChat).filter(
@@ -3002,11 +3102,10 @@ async def subir_fondo_personalizado(
         ).first()
         
         if config_existente:
-            # Eliminar fondo anterior si existe
-            if config_existente.fondo_personalizado:
+            # Eliminar fondo anterior si existe (los blobs se liberan por referencias)
+            if config_existente.fondo_personalizado and not es_blob(config_existente.fondo_personalizado):
                 fondo_anterior = config_existente.fondo_personalizado.replace('/', '', 1)
-                if os.path.exists(fondo_anterior):
-                    os.remove(fondo_anterior)
+                await borrar_archivo(fondo_anterior)
             
             # Actualizar configuración
             config_existente.fondo_chat = "personalizado"
@@ -3053,9 +3152,9 @@ def eliminar_fondo_personalizado(
         if not config or not config.fondo_personalizado:
             raise HTTPException(status_code=404, detail="No hay fondo personalizado para eliminar")
         
-        # Eliminar archivo físico
+        # Eliminar archivo físico (los blobs se liberan por referencias)
         fondo_path = config.fondo_personalizado.replace('/', '', 1)
-        if os.path.exists(fondo_path):
+        if not es_blob(config.fondo_personalizado) and os.path.exists(fondo_path):
             os.remove(fondo_path)
         
         # Actualizar configuración
@@ -3128,42 +3227,23 @@ def obtener_categorias(
         )
 @app.get("/categorias/populares")
 def obtener_categorias_populares(
-    db: Session = Depends(get_db),
+    ventana: str = "all",
+    limite: int = 10,
+    db: Session = Depends(get_db_lectura),
     user_id: int = Depends(get_current_user_id)
 ):
     """
-    Obtiene las categorías más populares basadas en las etiquetas de las publicaciones.
+    Obtiene las categorías más populares a partir de los contadores de etiquetas.
+    ventana: 24h, 7d o all.
     """
     try:
-        # Obtener todas las publicaciones
-        publicaciones = db.query(models.Publicacion).all()
-        
-        categorias_count = {}
-        
-        for pub in publicaciones:
-            if pub.etiquetas:
-                try:
-                    etiquetas = json.loads(pub.etiquetas) if isinstance(pub.etiquetas, str) else pub.etiquetas
-                    
-                    if etiquetas and isinstance(etiquetas, list):
-                        for etiqueta in etiquetas:
-                            etiqueta_limpia = str(etiqueta).strip().title()
-                            if etiqueta_limpia:
-                                categorias_count[etiqueta_limpia] = categorias_count.get(etiqueta_limpia, 0) + 1
-                except:
-                    pass
-        
-        # Ordenar por popularidad
-        categorias_ordenadas = sorted(categorias_count.items(), key=lambda x: x[1], reverse=True)
-        
-        # Limitar a las 10 más populares
-        categorias_populares = [
-            {"nombre": cat, "cantidad": count} 
-            for cat, count in categorias_ordenadas[:10]
-        ]
-        
-        return categorias_populares
-        
+        if ventana not in VENTANAS_POPULARES:
+            raise HTTPException(status_code=400, detail="Ventana inválida (usa 24h, 7d o all)")
+
+        return etiquetas_populares(db, ventana, normalizar_limite(limite, por_defecto=10, maximo=50))
+
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error obteniendo categorías populares: {str(e)}")
         raise HTTPException(
@@ -3183,48 +3263,22 @@ def obtener_categorias_publicas(db: Session = Depends(get_db)):
 @app.get("/public/categoria/{categoria_nombre}")
 def obtener_publicaciones_categoria_publica(
     categoria_nombre: str,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db_lectura)
 ):
     """
     Obtener publicaciones por categoría SIN autenticación
     Solo muestra publicaciones públicas
     """
     try:
-        # Normalizar nombre de categoría
-        categoria_normalizada = categoria_nombre.lower().strip()
-        
-        # Obtener TODAS las publicaciones
-        todas_publicaciones = (
+        publicaciones_filtradas = (
             db.query(models.Publicacion)
             .options(joinedload(models.Publicacion.usuario).joinedload(models.Usuario.perfil))
-            .order_by(models.Publicacion.fecha_creacion.desc())
+            .filter(filtro_categorias([categoria_nombre]))
+            .order_by(models.Publicacion.fecha_creacion.desc(), models.Publicacion.id_publicacion.desc())
             .limit(100)  # Limitar para no sobrecargar
             .all()
         )
         
-        # Filtrar por etiqueta/categoría
-        publicaciones_filtradas = []
-        for pub in todas_publicaciones:
-            if pub.etiquetas:
-                try:
-                    # Parsear etiquetas JSON
-                    etiquetas_lista = json.loads(pub.etiquetas) if isinstance(pub.etiquetas, str) else pub.etiquetas
-                    
-                    if etiquetas_lista:
-                        # Normalizar etiquetas para comparación
-                        etiquetas_normalizadas = [str(tag).lower().strip() for tag in etiquetas_lista]
-                        
-                        # Buscar coincidencia
-                        if (categoria_normalizada in etiquetas_normalizadas or
-                            any(categoria_normalizada in tag for tag in etiquetas_normalizadas)):
-                            publicaciones_filtradas.append(pub)
-                except Exception as e:
-                    # Si hay error al parsear, verificar si el string contiene la categoría
-                    if (pub.etiquetas and 
-                        isinstance(pub.etiquetas, str) and 
-                        categoria_normalizada in pub.etiquetas.lower()):
-                        publicaciones_filtradas.append(pub)
-        
         print(f"📊 Encontradas {len(publicaciones_filtradas)} publicaciones públicas para categoría '{categoria_nombre}'")
         
         return {
@@ -3243,7 +3297,7 @@ def obtener_publicaciones_categoria_publica(
 @app.get("/public/buscar")
 def buscar_publico(
     query: str,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db_lectura)
 ):
     """
     Búsqueda pública SIN autenticación
@@ -3317,7 +3371,7 @@ def buscar_publico(
     }
 
 @app.get("/public/usuarios/{id_usuario}/basico")
-def obtener_usuario_basico(id_usuario: int, db: Session = Depends(get_db)):
+def obtener_usuario_basico(id_usuario: int, db: Session = Depends(get_db_lectura)):
     """Obtener información básica de un usuario (PÚBLICO)"""
     usuario = (
         db.query(models.Usuario)
@@ -3353,129 +3407,11 @@ def obtener_sugerencias_usuarios(
     3. Usuarios con intereses similares
     """
     try:
-        # Obtener usuarios que el usuario actual YA sigue
-        usuarios_seguidos = db.query(models.SeguirUsuario.id_seguido).filter(
-            models.SeguirUsuario.id_seguidor == user_id
-        ).all()
-        ids_usuarios_seguidos = [us[0] for us in usuarios_seguidos]
-        
-        # Obtener usuarios bloqueados
-        usuarios_bloqueados = db.query(models.BloqueoUsuario.id_bloqueado).filter(
-            models.BloqueoUsuario.id_bloqueador == user_id
-        ).all()
-        ids_usuarios_bloqueados = [ub[0] for ub in usuarios_bloqueados]
-        
-        usuarios_que_me_bloquearon = db.query(models.BloqueoUsuario.id_bloqueador).filter(
-            models.BloqueoUsuario.id_bloqueado == user_id
-        ).all()
-        ids_usuarios_que_me_bloquearon = [ub[0] for ub in usuarios_que_me_bloquearon]
-
-        # Excluir al usuario actual, usuarios seguidos, bloqueados, y que me bloquearon
-        usuarios_excluidos = set(
-            [user_id] + 
-            ids_usuarios_seguidos + 
-            ids_usuarios_bloqueados + 
-            ids_usuarios_que_me_bloquearon
-        )
+        # ALGORITMO 1: Usuarios populares basados en likes recibidos (tabla materializada)
+        usuarios_populares = sugerir_populares(db, user_id, 8)
 
-        # ALGORITMO 1: Usuarios populares basados en likes recibidos
-        usuarios_populares = []
-        
-        # Obtener todos los usuarios excepto los excluidos
-        candidatos = db.query(models.Usuario).filter(
-            ~models.Usuario.id_usuario.in_(list(usuarios_excluidos))
-        ).all()
-        
-        for usuario in candidatos:
-            # Calcular puntuación basada en likes recibidos
-            total_likes = 0
-            
-            # Obtener publicaciones del usuario
-            publicaciones = db.query(models.Publicacion).filter(
-                models.Publicacion.id_usuario == usuario.id_usuario
-            ).all()
-            
-            for pub in publicaciones:
-                # Contar likes de cada publicación
-                likes_pub = db.query(models.MeGusta).filter(
-                    models.MeGusta.id_publicacion == pub.id_publicacion
-                ).count()
-                total_likes += likes_pub
-            
-            # Obtener información del perfil
-            perfil = db.query(models.Perfil).filter(
-                models.Perfil.id_usuario == usuario.id_usuario
-            ).first()
-            
-            # Obtener estadísticas adicionales
-            seguidores_count = db.query(models.SeguirUsuario).filter(
-                models.SeguirUsuario.id_seguido == usuario.id_usuario
-            ).count()
-            
-            publicaciones_count = len(publicaciones)
-            
-            # Solo incluir usuarios con al menos alguna actividad
-            if total_likes > 0 or publicaciones_count > 0:
-                usuarios_populares.append({
-                    "id_usuario": usuario.id_usuario,
-                    "nombre_usuario": usuario.nombre_usuario,
-                    "nombre": usuario.nombre,
-                    "foto_perfil": perfil.foto_perfil if perfil else None,
-                    "puntuacion": total_likes,  # Puntuación basada en likes
-                    "estadisticas": {
-                        "likes_totales": total_likes,
-                        "seguidores": seguidores_count,
-                        "publicaciones": publicaciones_count
-                    }
-                })
-        
-        # Ordenar por puntuación (likes) descendente
-        usuarios_populares.sort(key=lambda x: x["puntuacion"], reverse=True)
-        
-        # ALGORITMO 2: Usuarios que siguen mis amigos (si tiene amigos)
-        sugerencias_amigos = []
-        
-        # Obtener amigos del usuario
-        amistades = db.query(models.Amistad).filter(
-            ((models.Amistad.id_usuario1 == user_id) | (models.Amistad.id_usuario2 == user_id)),
-            models.Amistad.estado == "aceptada"
-        ).all()
-        
-        amigos_ids = []
-        for amistad in amistades:
-            if amistad.id_usuario1 == user_id:
-                amigos_ids.append(amistad.id_usuario2)
-            else:
-                amigos_ids.append(amistad.id_usuario1)
-        
-        if amigos_ids:
-            # Obtener usuarios que mis amigos siguen
-            for amigo_id in amigos_ids[:10]:  # Limitar a los primeros 10 amigos
-                seguidos_por_amigo = db.query(models.SeguirUsuario).filter(
-                    models.SeguirUsuario.id_seguidor == amigo_id,
-                    ~models.SeguirUsuario.id_seguido.in_(list(usuarios_excluidos))
-                ).limit(3).all()
-                
-                for seguido in seguidos_por_amigo:
-                    usuario_seguido = db.query(models.Usuario).filter(
-                        models.Usuario.id_usuario == seguido.id_seguido
-                    ).first()
-                    
-                    if usuario_seguido:
-                        perfil_seguido = db.query(models.Perfil).filter(
-                            models.Perfil.id_usuario == usuario_seguido.id_usuario
-                        ).first()
-                        
-                        # Verificar si ya está en la lista
-                        if not any(u["id_usuario"] == usuario_seguido.id_usuario for u in sugerencias_amigos):
-                            sugerencias_amigos.append({
-                                "id_usuario": usuario_seguido.id_usuario,
-                                "nombre_usuario": usuario_seguido.nombre_usuario,
-                                "nombre": usuario_seguido.nombre,
-                                "foto_perfil": perfil_seguido.foto_perfil if perfil_seguido else None,
-                                "recomendado_por": "amigos",
-                                "fecha_seguimiento": seguido.fecha_seguimiento
-                            })
+        # ALGORITMO 2: Usuarios que siguen mis amigos, por cantidad de amigos en común
+        sugerencias_amigos = sugerir_por_amigos(db, user_id, 10)
         
         # Combinar resultados (priorizando usuarios populares)
         resultados = []
@@ -3666,8 +3602,11 @@ def eliminar_cuenta(
             raise HTTPException(status_code=404, detail="Usuario no encontrado")
         
         # Eliminar usuario (esto eliminará en cascada todos los registros relacionados)
+        restar_conteos_usuario(db, id_usuario)
+        descontar_usuario(db, id_usuario)
         db.delete(usuario)
         db.commit()
+        olvidar_usuario(id_usuario)
         
         return {"mensaje": "Cuenta eliminada permanentemente"}
         
@@ -3752,6 +3691,20 @@ ALLOWED_GALERIA_EXTENSIONS = {
 }
 
 MAX_GALERIA_FILE_SIZE = 100 * 1024 * 1024  # 100MB
+# Margen para los otros campos y los separadores del multipart
+MARGEN_MULTIPART = 1024 * 1024
+
+@app.middleware("http")
+async def rechazar_subidas_grandes(request: Request, call_next):
+    """Rechaza por Content-Length antes de recibir el cuerpo (FastAPI lo lee entero al parsear el form)"""
+    if request.method == "POST" and request.url.path == "/galeria/archivos/subir":
+        try:
+            largo = int(request.headers.get("content-length", "0"))
+        except ValueError:
+            largo = 0
+        if largo > MAX_GALERIA_FILE_SIZE + MARGEN_MULTIPART:
+            return JSONResponse(status_code=413, content={"detail": "Archivo demasiado grande. Máximo 100MB"})
+    return await call_next(request)
 
 def determinar_tipo_archivo(extension: str) -> str:
     """Determina el tipo de archivo basado en la extensión"""
@@ -3761,69 +3714,6 @@ def determinar_tipo_archivo(extension: str) -> str:
             return tipo
     return "documento"
 
-def obtener_resolucion_imagen_simple(imagen_path: str) -> Optional[str]:
-    """Obtiene resolución de imagen sin PIL (solo para JPEG y PNG)"""
-    try:
-        with open(imagen_path, 'rb') as f:
-            # Para JPEG
-            f.seek(0)
-            if f.read(2) == b'\xff\xd8':
-                # Es JPEG
-                f.seek(0)
-                while True:
-                    marker, = struct.unpack('>H', f.read(2))
-                    if marker == 0xFFC0 or marker == 0xFFC1 or marker == 0xFFC2:
-                        # SOF marker encontrado
-                        f.read(3)  # Precisión y altura/anchura
-                        height, = struct.unpack('>H', f.read(2))
-                        width, = struct.unpack('>H', f.read(2))
-                        return f"{width}x{height}"
-                    elif marker == 0xFFDA:
-                        # Inicio de datos de imagen, salir
-                        break
-                    else:
-                        # Saltar este segmento
-                        length, = struct.unpack('>H', f.read(2))
-                        f.read(length - 2)
-            
-            # Para PNG
-            f.seek(0)
-            if f.read(8) == b'\x89PNG\r\n\x1a\n':
-                f.read(8)  # Saltar chunk IHDR
-                width = struct.unpack('>I', f.read(4))[0]
-                height = struct.unpack('>I', f.read(4))[0]
-                return f"{width}x{height}"
-    except:
-        pass
-    return None
-
-def obtener_duracion_video_ffprobe(video_path: str) -> Optional[int]:
-    """Obtiene duración del video usando ffprobe"""
-    try:
-        cmd = [
-            'ffprobe', '-v', 'error', '-show_entries', 'format=duration',
-            '-of', 'default=noprint_wrappers=1:nokey=1', video_path
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
-        if result.returncode == 0:
-            duration = float(result.stdout.strip())
-            return int(duration)
-    except:
-        pass
-    return None
-
-def generar_miniatura_ffmpeg(video_path: str, output_path: str) -> bool:
-    """Genera miniatura para video usando ffmpeg"""
-    try:
-        cmd = [
-            'ffmpeg', '-i', video_path, '-ss', '00:00:01', '-vframes', '1',
-            '-vf', 'scale=300:-1', '-y', output_path
-        ]
-        result = subprocess.run(cmd, capture_output=True, timeout=30)
-        return result.returncode == 0 and os.path.exists(output_path)
-    except:
-        return False
-
 @app.get("/galeria/estadisticas")
 def obtener_estadisticas_galeria(
     db: Session = Depends(get_db),
@@ -3999,8 +3889,10 @@ def eliminar_carpeta(
             models.GaleriaArchivo.id_carpeta == id_carpeta
         ).all()
         
-        # Eliminar archivos físicos
+        # Eliminar archivos físicos (los blobs se liberan por referencias)
         for archivo in archivos:
+            if es_blob(archivo.ruta):
+                continue
             file_path = archivo.ruta.replace("/", "", 1) if archivo.ruta.startswith("/") else archivo.ruta
             if os.path.exists(file_path):
                 os.remove(file_path)
@@ -4022,6 +3914,113 @@ def eliminar_carpeta(
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error eliminando carpeta: {str(e)}")
 
+def obtener_carpeta_usuario(db: Session, id_carpeta: int, user_id: int) -> models.GaleriaCarpeta:
+    carpeta = db.query(models.GaleriaCarpeta).filter(
+        models.GaleriaCarpeta.id_carpeta == id_carpeta,
+        models.GaleriaCarpeta.id_usuario == user_id
+    ).first()
+    if not carpeta:
+        raise HTTPException(status_code=404, detail="Carpeta no encontrada")
+    return carpeta
+
+def extension_y_tipo(nombre_archivo: str):
+    """(extensión, tipo) del archivo; 400 si el tipo no está permitido"""
+    if not nombre_archivo:
+        raise HTTPException(status_code=400, detail="Archivo no válido")
+    file_extension = nombre_archivo.split('.')[-1].lower() if '.' in nombre_archivo else ''
+    tipo_archivo = determinar_tipo_archivo(file_extension)
+    if tipo_archivo not in ALLOWED_GALERIA_EXTENSIONS:
+        raise HTTPException(status_code=400, detail="Tipo de archivo no permitido")
+    return file_extension, tipo_archivo
+
+def procesar_etiquetas(etiquetas: Optional[str]) -> List[str]:
+    lista_etiquetas = []
+    if etiquetas:
+        try:
+            lista_etiquetas = json.loads(etiquetas)
+            if not isinstance(lista_etiquetas, list):
+                lista_etiquetas = [lista_etiquetas]
+        except:
+            lista_etiquetas = [etiquetas] if etiquetas else []
+    return lista_etiquetas
+
+async def registrar_archivo_galeria(
+    db: Session,
+    carpeta: models.GaleriaCarpeta,
+    user_id: int,
+    nombre_original: str,
+    guardado,
+    descripcion: Optional[str],
+    etiquetas: Optional[str],
+    es_publico: bool
+) -> models.GaleriaArchivo:
+    """Agrega el GaleriaArchivo de un archivo ya guardado en el almacén de blobs (sin commit)"""
+    file_extension, tipo_archivo = extension_y_tipo(nombre_original)
+    
+    # IMPORTANTE: Usar ruta relativa para el frontend
+    ruta_url = f"/{guardado.ruta}"
+    
+    # Para imágenes y videos, usar la ruta directa como miniatura
+    miniatura_url = ruta_url if tipo_archivo in ["imagen", "video"] else None
+    
+    lista_etiquetas = procesar_etiquetas(etiquetas)
+    
+    # Lectura de la cabecera en un hilo: no bloquea el event loop
+    resolucion = await run_in_threadpool(resolucion_imagen, guardado.ruta) if tipo_archivo == "imagen" else None
+    
+    nuevo_archivo = models.GaleriaArchivo(
+        id_carpeta=carpeta.id_carpeta,
+        id_usuario=user_id,
+        nombre_original=nombre_original,
+        nombre_archivo=os.path.basename(guardado.ruta),
+        tipo=tipo_archivo,
+        extension=file_extension,
+        tamano=guardado.tamano,
+        ruta=ruta_url,  # Usar ruta relativa
+        miniatura=miniatura_url,  # Para imágenes/videos, usar el mismo archivo como miniatura
+        duracion=None,
+        resolucion=resolucion,
+        descripcion=descripcion,
+        etiquetas=json.dumps(lista_etiquetas) if lista_etiquetas else None,
+        es_publico=es_publico,
+        hash_contenido=guardado.hash_contenido
+    )
+    
+    db.add(nuevo_archivo)
+    
+    # Actualizar fecha de modificación de la carpeta
+    carpeta.fecha_actualizacion = datetime.utcnow()
+    return nuevo_archivo
+
+def procesar_medio_galeria(db: Session, archivo: models.GaleriaArchivo, guardado) -> Optional[int]:
+    """Encola las variantes de una imagen o el análisis de un video; devuelve el id del trabajo de video"""
+    if archivo.tipo == "imagen":
+        if not reutilizar_variantes(db, archivo.ruta):
+            encolar_variantes(guardado.ruta, archivo.ruta)
+    elif archivo.tipo == "video":
+        return encolar_video(db, archivo.id_usuario, archivo.ruta, archivo.id_archivo).id_trabajo
+    return None
+
+def respuesta_archivo_galeria(
+    archivo: models.GaleriaArchivo,
+    carpeta: models.GaleriaCarpeta,
+    variantes: Optional[dict] = None
+) -> schemas.ArchivoResponse:
+    """ArchivoResponse con URLs absolutas para el frontend"""
+    base_url = "http://localhost:8000"
+    response = schemas.ArchivoResponse.from_orm(archivo)
+    response.carpeta_nombre = carpeta.nombre
+    response.variantes = variantes
+    
+    # Asegurar que las URLs sean absolutas
+    if response.ruta and not response.ruta.startswith('http'):
+        response.ruta = f"{base_url}{response.ruta}"
+    
+    if response.miniatura and not response.miniatura.startswith('http'):
+        response.miniatura = f"{base_url}{response.miniatura}"
+    
+    return response
+
 @app.post("/galeria/archivos/subir")
 async def subir_archivo_galeria(
     id_carpeta: int = Form(...),
@@ -4035,123 +4034,197 @@ async def subir_archivo_galeria(
     """Subir un archivo a la galería - VERSIÓN SIMPLIFICADA"""
     try:
         # Verificar que la carpeta existe y pertenece al usuario
-        carpeta = db.query(models.GaleriaCarpeta).filter(
-            models.GaleriaCarpeta.id_carpeta == id_carpeta,
-            models.GaleriaCarpeta.id_usuario == user_id
-        ).first()
-        
-        if not carpeta:
-            raise HTTPException(status_code=404, detail="Carpeta no encontrada")
-        
-        # Validar archivo
-        if not archivo.filename:
-            raise HTTPException(status_code=400, detail="Archivo no válido")
+        carpeta = obtener_carpeta_usuario(db, id_carpeta, user_id)
         
-        # Obtener extensión
-        file_extension = archivo.filename.split('.')[-1].lower() if '.' in archivo.filename else ''
+        # Validar archivo y tipo permitido
+        file_extension, _ = extension_y_tipo(archivo.filename)
         
-        # Determinar tipo
-        tipo_archivo = determinar_tipo_archivo(file_extension)
-        
-        # Validar tipo permitido
-        if tipo_archivo not in ALLOWED_GALERIA_EXTENSIONS:
-            raise HTTPException(status_code=400, detail="Tipo de archivo no permitido")
-        
-        # Validar tamaño
-        contenido = await archivo.read()
-        tamano = len(contenido)
+        # Guardar archivo por bloques (valida el tamaño mientras copia; si el contenido ya estaba, se reutiliza)
+        guardado = await guardar_blob(
+            db, archivo, file_extension, MAX_GALERIA_FILE_SIZE, "Archivo demasiado grande. Máximo 100MB"
+        )
         
-        if tamano > MAX_GALERIA_FILE_SIZE:
-            raise HTTPException(status_code=400, detail="Archivo demasiado grande. Máximo 100MB")
+        # Crear registro en la base de datos
+        nuevo_archivo = await registrar_archivo_galeria(
+            db, carpeta, user_id, archivo.filename, guardado,
+            descripcion, etiquetas, es_publico
+        )
         
-        # Reiniciar posición del archivo
-        await archivo.seek(0)
+        db.commit()
+        db.refresh(nuevo_archivo)
         
-        # Generar nombre único
-        unique_filename = f"{user_id}_{uuid.uuid4()}_{archivo.filename.replace(' ', '_')}"
+        response = respuesta_archivo_galeria(nuevo_archivo, carpeta)
+        response.id_trabajo = procesar_medio_galeria(db, nuevo_archivo, guardado)
+        return response
         
-        # Determinar carpeta de destino
-        if tipo_archivo == "imagen":
-            folder = os.path.join(GALERIA_BASE_DIR, "imagenes")
-        elif tipo_archivo == "video":
-            folder = os.path.join(GALERIA_BASE_DIR, "videos")
-        elif tipo_archivo == "audio":
-            folder = os.path.join(GALERIA_BASE_DIR, "audios")
-        else:
-            folder = os.path.join(GALERIA_BASE_DIR, "documentos")
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        print(f"Error subiendo archivo: {str(e)}")  # Para debugging
+        raise HTTPException(status_code=500, detail=f"Error subiendo archivo: {str(e)}")
+
+# ------------------ SUBIDAS REANUDABLES ------------------
+@app.post("/galeria/subidas", response_model=schemas.SubidaResponse)
+async def iniciar_subida_galeria(
+    datos: schemas.SubidaCreate,
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    """Abre una subida por partes; el archivo se manda con PUT /galeria/subidas/{id}"""
+    try:
+        obtener_carpeta_usuario(db, datos.id_carpeta, user_id)
+        extension_y_tipo(datos.nombre_original)
+        if datos.tamano_total <= 0:
+            raise HTTPException(status_code=400, detail="Tamaño de archivo no válido")
+        if datos.tamano_total > MAX_GALERIA_FILE_SIZE:
+            raise HTTPException(status_code=413, detail="Archivo demasiado grande. Máximo 100MB")
         
-        os.makedirs(folder, exist_ok=True)
+        await limpiar_vencidas(db)
         
-        # Ruta completa del archivo
-        file_path = os.path.join(folder, unique_filename)
+        subida = await crear_subida(db, models.GaleriaSubida(
+            id_subida=str(uuid.uuid4()),
+            id_usuario=user_id,
+            id_carpeta=datos.id_carpeta,
+            nombre_original=datos.nombre_original,
+            tamano_total=datos.tamano_total,
+            recibidos=0,
+            descripcion=datos.descripcion,
+            etiquetas=datos.etiquetas,
+            es_publico=datos.es_publico
+        ))
+        return respuesta_subida(subida)
         
-        # Guardar archivo
-        with open(file_path, "wb") as f:
-            f.write(contenido)
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error iniciando subida: {str(e)}")
+
+@app.get("/galeria/subidas/{id_subida}", response_model=schemas.SubidaResponse)
+def estado_subida_galeria(
+    id_subida: str,
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    """Bytes recibidos hasta ahora: desde ahí se reanuda"""
+    return respuesta_subida(obtener_subida(db, id_subida, user_id))
+
+@app.put("/galeria/subidas/{id_subida}", response_model=schemas.SubidaResponse)
+async def subir_parte_galeria(
+    id_subida: str,
+    offset: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    """Agrega una parte (bytes crudos en el cuerpo) empezando en offset"""
+    try:
+        subida = obtener_subida(db, id_subida, user_id)
         
-        # IMPORTANTE: Usar ruta relativa para el frontend
-        ruta_url = f"/static/galeria/{tipo_archivo}s/{unique_filename}"
+        try:
+            largo = int(request.headers.get("content-length", "0"))
+        except ValueError:
+            largo = 0
+        if largo > TAMANO_MAXIMO_PARTE:
+            raise HTTPException(status_code=413, detail="Parte demasiado grande. Máximo 64MB")
         
-        # Para imágenes y videos, usar la ruta directa como miniatura
-        miniatura_url = ruta_url if tipo_archivo in ["imagen", "video"] else None
+        await escribir_parte(db, subida, offset, request.stream())
+        return respuesta_subida(subida)
         
-        # Procesar etiquetas
-        lista_etiquetas = []
-        if etiquetas:
-            try:
-                lista_etiquetas = json.loads(etiquetas)
-                if not isinstance(lista_etiquetas, list):
-                    lista_etiquetas = [lista_etiquetas]
-            except:
-                lista_etiquetas = [etiquetas] if etiquetas else []
+    except HTTPException:
+        raise
+    except ClientDisconnect:
+        # Lo recibido ya quedó registrado; el cliente reanuda con GET /galeria/subidas/{id}
+        raise HTTPException(status_code=400, detail="Conexión interrumpida")
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error subiendo parte: {str(e)}")
+
+@app.post("/galeria/subidas/{id_subida}/completar", response_model=schemas.ArchivoResponse)
+async def completar_subida_galeria(
+    id_subida: str,
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    """Arma el archivo en la galería y crea su registro"""
+    try:
+        subida = obtener_subida(db, id_subida, user_id)
+        carpeta = obtener_carpeta_usuario(db, subida.id_carpeta, user_id)
+        file_extension, _ = extension_y_tipo(subida.nombre_original)
         
-        # Crear registro en la base de datos
-        nuevo_archivo = models.GaleriaArchivo(
-            id_carpeta=id_carpeta,
-            id_usuario=user_id,
-            nombre_original=archivo.filename,
-            nombre_archivo=unique_filename,
-            tipo=tipo_archivo,
-            extension=file_extension,
-            tamano=tamano,
-            ruta=ruta_url,  # Usar ruta relativa
-            miniatura=miniatura_url,  # Para imágenes/videos, usar el mismo archivo como miniatura
-            duracion=None,
-            resolucion=None,
-            descripcion=descripcion,
-            etiquetas=json.dumps(lista_etiquetas) if lista_etiquetas else None,
-            es_publico=es_publico
+        armado = await completar_subida(
+            subida, os.path.join(DIRECTORIO_TEMPORAL, f"{uuid.uuid4()}.blob")
+        )
+        guardado = await adoptar_archivo(
+            db, armado.ruta, file_extension, armado.tamano, armado.hash_contenido
         )
         
-        db.add(nuevo_archivo)
-        
-        # Actualizar fecha de modificación de la carpeta
-        carpeta.fecha_actualizacion = datetime.utcnow()
+        nuevo_archivo = await registrar_archivo_galeria(
+            db, carpeta, user_id, subida.nombre_original, guardado,
+            subida.descripcion, subida.etiquetas, subida.es_publico
+        )
+        db.delete(subida)
         
         db.commit()
         db.refresh(nuevo_archivo)
         
-        # Preparar respuesta con URL absoluta para el frontend
-        base_url = "http://localhost:8000"
-        response = schemas.ArchivoResponse.from_orm(nuevo_archivo)
-        response.carpeta_nombre = carpeta.nombre
-        
-        # Asegurar que las URLs sean absolutas
-        if response.ruta and not response.ruta.startswith('http'):
-            response.ruta = f"{base_url}{response.ruta}"
-        
-        if response.miniatura and not response.miniatura.startswith('http'):
-            response.miniatura = f"{base_url}{response.miniatura}"
-        
+        response = respuesta_archivo_galeria(nuevo_archivo, carpeta)
+        response.id_trabajo = procesar_medio_galeria(db, nuevo_archivo, guardado)
         return response
         
     except HTTPException:
         raise
     except Exception as e:
         db.rollback()
-        print(f"Error subiendo archivo: {str(e)}")  # Para debugging
-        raise HTTPException(status_code=500, detail=f"Error subiendo archivo: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error completando subida: {str(e)}")
+
+@app.delete("/galeria/subidas/{id_subida}")
+async def cancelar_subida_galeria(
+    id_subida: str,
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    """Cancela la subida y borra lo recibido"""
+    try:
+        await descartar_subida(db, obtener_subida(db, id_subida, user_id))
+        return {"mensaje": "Subida cancelada"}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error cancelando subida: {str(e)}")
     
+# ------------------ TRABAJOS DE VIDEO ------------------
+@app.get("/medios/trabajos", response_model=List[schemas.TrabajoVideoResponse])
+def listar_trabajos_video(
+    estado: Optional[str] = None,
+    limite: Optional[int] = None,
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    """Trabajos de video del usuario, los más recientes primero"""
+    query = db.query(models.TrabajoVideo).filter(models.TrabajoVideo.id_usuario == user_id)
+    if estado:
+        query = query.filter(models.TrabajoVideo.estado == estado)
+    return query.order_by(models.TrabajoVideo.id_trabajo.desc()).limit(normalizar_limite(limite)).all()
+
+@app.get("/medios/trabajos/{id_trabajo}", response_model=schemas.TrabajoVideoResponse)
+def obtener_trabajo_video(
+    id_trabajo: int,
+    db: Session = Depends(get_db),
+    user_id: int = Depends(get_current_user_id)
+):
+    """Estado del análisis de un video (pendiente, procesando, terminado o error)"""
+    trabajo = db.query(models.TrabajoVideo).filter(
+        models.TrabajoVideo.id_trabajo == id_trabajo,
+        models.TrabajoVideo.id_usuario == user_id
+    ).first()
+    if not trabajo:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return trabajo
+
 @app.get("/galeria/archivos", response_model=List[schemas.ArchivoResponse])
 def obtener_archivos_galeria(
     id_carpeta: Optional[int] = None,
@@ -4187,11 +4260,13 @@ def obtener_archivos_galeria(
             )
         
         archivos = query.order_by(models.GaleriaArchivo.fecha_subida.desc()).all()
+        variantes = variantes_por_original(db, [a.ruta for a in archivos if a.tipo == "imagen"])
         
         resultado = []
         for archivo in archivos:
             archivo_dict = schemas.ArchivoResponse.from_orm(archivo)
             archivo_dict.carpeta_nombre = archivo.carpeta.nombre
+            archivo_dict.variantes = variantes.get(archivo.ruta)
             resultado.append(archivo_dict)
         
         return resultado
@@ -4220,6 +4295,7 @@ def obtener_archivo_detalle(
         
         archivo_dict = schemas.ArchivoResponse.from_orm(archivo)
         archivo_dict.carpeta_nombre = archivo.carpeta.nombre
+        archivo_dict.variantes = variantes_por_original(db, [archivo.ruta]).get(archivo.ruta)
         
         return archivo_dict
         
@@ -4306,13 +4382,13 @@ def eliminar_archivo(
         if not archivo:
             raise HTTPException(status_code=404, detail="Archivo no encontrado")
         
-        # Eliminar archivo físico
+        # Eliminar archivo físico (los blobs se liberan por referencias)
         file_path = archivo.ruta.replace("/", "", 1) if archivo.ruta.startswith("/") else archivo.ruta
-        if os.path.exists(file_path):
+        if not es_blob(archivo.ruta) and os.path.exists(file_path):
             os.remove(file_path)
         
         # Eliminar miniatura si existe
-        if archivo.miniatura:
+        if archivo.miniatura and not es_blob(archivo.ruta):
             miniatura_path = archivo.miniatura.replace("/", "", 1) if archivo.miniatura.startswith("/") else archivo.miniatura
             if os.path.exists(miniatura_path):
                 os.remove(miniatura_path)
@@ -4356,6 +4432,8 @@ def publicar_desde_galeria(
         )
         
         db.add(nueva_publicacion)
+        db.flush()
+        registrar_etiquetas(db, nueva_publicacion)
         db.commit()
         db.refresh(nueva_publicacion)
         
@@ -4383,7 +4461,7 @@ def publicar_desde_galeria(
 @app.get("/galeria/public/{id_usuario}")
 def obtener_galeria_publica(
     id_usuario: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db_lectura)
 ):
     """Obtener archivos públicos de la galería de un usuario"""
     try:
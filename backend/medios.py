@@ -0,0 +1,94 @@
+# backend/medios.py
+"""
+Servido de /static con caché de larga duración.
+
+ArchivosMedia reemplaza al StaticFiles plano:
+
+- Los archivos con un hash de contenido o un uuid en el nombre (blobs, sus variantes
+  y pósters, subidas anteriores al almacén) nunca cambian: se envían con
+  Cache-Control "immutable" por un año y el cliente no vuelve a pedirlos.
+- Los blobs llevan como ETag fuerte su propio hash; el resto, el de Starlette
+  (fecha de modificación y tamaño). If-None-Match responde 304 sin cuerpo y, si
+  está presente, manda sobre If-Modified-Since.
+- Range / If-Range (saltar en un video) los resuelve FileResponse con 206.
+- Con MEDIOS_X_ACCEL_REDIRECT (p. ej. "/_medios") el cuerpo lo envía nginx con
+  sendfile: la respuesta sólo lleva las cabeceras y X-Accel-Redirect. Sin proxy,
+  los servidores ASGI con "http.response.pathsend" también envían el archivo sin
+  copiarlo; el resto lo lee en bloques de TAMANO_BLOQUE_ENVIO.
+"""
+import os
+import re
+from typing import Dict
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+from backend.config import settings
+
+TAMANO_BLOQUE_ENVIO = 256 * 1024
+CACHE_INMUTABLE = "public, max-age=31536000, immutable"
+CACHE_REVALIDAR = "public, no-cache"
+
+_HASH = re.compile(r"^([0-9a-f]{32})\.\w+$")
+_NOMBRE_UNICO = re.compile(
+    r"[0-9a-f]{32}|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"
+)
+
+
+class RespuestaMedio(FileResponse):
+    chunk_size = TAMANO_BLOQUE_ENVIO
+
+
+def cabeceras_cache(ruta: str) -> Dict[str, str]:
+    """Cache-Control (y ETag, para los blobs) según el nombre del archivo servido"""
+    partes = ruta.replace(os.sep, "/").split("/")
+    nombre = partes[-1]
+    if not _NOMBRE_UNICO.search(nombre):
+        return {"cache-control": CACHE_REVALIDAR}
+    cabeceras = {"cache-control": CACHE_INMUTABLE}
+    coincide = _HASH.match(nombre)
+    if coincide and partes[0] == "blobs":
+        cabeceras["etag"] = f'"{coincide.group(1)}"'
+    return cabeceras
+
+
+def _etags(valor: str):
+    for etag in valor.split(","):
+        etag = etag.strip()
+        yield etag[2:] if etag.startswith("W/") else etag
+
+
+class ArchivosMedia(StaticFiles):
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        ruta = self.get_path(scope)
+        response = RespuestaMedio(
+            full_path, status_code=status_code, headers=cabeceras_cache(ruta), stat_result=stat_result
+        )
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+
+        prefijo = settings.MEDIOS_X_ACCEL_REDIRECT
+        if prefijo:
+            cabeceras = {
+                nombre: response.headers[nombre]
+                for nombre in ("cache-control", "etag", "last-modified", "accept-ranges")
+            }
+            cabeceras["x-accel-redirect"] = f"{prefijo.rstrip('/')}/{ruta.replace(os.sep, '/')}"
+            return Response(status_code=status_code, headers=cabeceras, media_type=response.media_type)
+        return response
+
+    def is_not_modified(self, response_headers: Headers, request_headers: Headers) -> bool:
+        """Como en StaticFiles, pero If-Modified-Since se ignora si hay If-None-Match (RFC 9110)"""
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            etag = response_headers.get("etag")
+            return any(tag == "*" or tag == etag for tag in _etags(if_none_match))
+        return super().is_not_modified(response_headers, request_headers)
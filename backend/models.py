@@ -1,5 +1,5 @@
 # backend/models.py
-from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, Boolean, Text, UniqueConstraint, BigInteger
+from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, Boolean, Text, UniqueConstraint, BigInteger, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime, timedelta
 from .database import Base
@@ -20,6 +20,8 @@ class Usuario(Base):
     tipo_arte_preferido = Column(String)
     telefono = Column(String)
     nombre_usuario = Column(String, unique=True)
+    # Contador de notificaciones sin leer (ver backend/notificaciones.py)
+    notificaciones_no_leidas = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Relaciones
     perfil = relationship("Perfil", back_populates="usuario", uselist=False)
@@ -82,12 +84,24 @@ class Publicacion(Base):
     tipo_medio = Column(String(20), default="imagen")
     fecha_creacion = Column(DateTime, default=datetime.utcnow)
 
+    # Contadores desnormalizados (se actualizan en la misma transacción; ver backend/contadores.py)
+    total_me_gusta = Column(Integer, nullable=False, default=0, server_default="0")
+    total_comentarios = Column(Integer, nullable=False, default=0, server_default="0")
+    total_guardados = Column(Integer, nullable=False, default=0, server_default="0")
+    total_compartidos = Column(Integer, nullable=False, default=0, server_default="0")
+
     usuario = relationship("Usuario", back_populates="publicaciones")
     no_me_interesa = relationship("NoMeInteresa", back_populates="publicacion", cascade="all, delete-orphan")
     me_gusta = relationship("MeGusta", back_populates="publicacion", cascade="all, delete-orphan")
     guardados = relationship("Guardado", back_populates="publicacion", cascade="all, delete-orphan")
     comentarios = relationship("Comentario", back_populates="publicacion", cascade="all, delete-orphan")
     compartidos = relationship("Compartido", back_populates="publicacion", cascade="all, delete-orphan")
+    etiquetas_normalizadas = relationship("PublicacionEtiqueta", back_populates="publicacion", cascade="all, delete-orphan")
+
+    # Índice compuesto para la paginación por cursor del feed (fecha_creacion, id_publicacion)
+    __table_args__ = (
+        Index("ix_publicaciones_fecha_id", "fecha_creacion", "id_publicacion"),
+    )
 
     @property
     def medios(self):
@@ -112,6 +126,59 @@ class Publicacion(Base):
             except:
                 return [self.etiquetas] if self.etiquetas else []
         return []
+# ------------------ ETIQUETAS DE PUBLICACIÓN (ÍNDICE NORMALIZADO) ------------------
+class PublicacionEtiqueta(Base):
+    __tablename__ = "publicacion_etiquetas"
+
+    id = Column(Integer, primary_key=True, index=True)
+    id_publicacion = Column(Integer, ForeignKey("publicaciones.id_publicacion", ondelete="CASCADE"), nullable=False)
+    etiqueta = Column(String(100), nullable=False)  # en minúsculas y sin espacios extremos
+    fecha_creacion = Column(DateTime, nullable=False)  # copia de publicaciones.fecha_creacion para paginar por índice
+
+    publicacion = relationship("Publicacion", back_populates="etiquetas_normalizadas")
+
+    __table_args__ = (
+        UniqueConstraint("id_publicacion", "etiqueta", name="uq_publicacion_etiqueta"),
+        Index("ix_publicacion_etiquetas_etiqueta_fecha", "etiqueta", "fecha_creacion", "id_publicacion"),
+    )
+
+# ------------------ CONTEO DE ETIQUETAS (POPULARES) ------------------
+class ConteoEtiqueta(Base):
+    __tablename__ = "conteo_etiquetas"
+
+    etiqueta = Column(String(100), primary_key=True)
+    cantidad = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_conteo_etiquetas_cantidad", "cantidad"),
+    )
+
+class ConteoEtiquetaHora(Base):
+    __tablename__ = "conteo_etiquetas_hora"
+
+    etiqueta = Column(String(100), primary_key=True)
+    hora = Column(DateTime, primary_key=True)  # fecha_creacion truncada a la hora (UTC)
+    cantidad = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_conteo_etiquetas_hora_hora", "hora"),
+    )
+
+# ------------------ PUNTUACIÓN DE USUARIOS (SUGERENCIAS) ------------------
+class PuntuacionUsuario(Base):
+    """Tabla materializada que se refresca periódicamente desde backend/sugerencias.py"""
+    __tablename__ = "puntuaciones_usuario"
+
+    id_usuario = Column(Integer, ForeignKey("usuarios.id_usuario", ondelete="CASCADE"), primary_key=True)
+    likes_totales = Column(Integer, nullable=False, default=0)
+    publicaciones = Column(Integer, nullable=False, default=0)
+    seguidores = Column(Integer, nullable=False, default=0)
+    actualizado = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_puntuaciones_usuario_likes", "likes_totales", "id_usuario"),
+    )
+
 # ------------------ SEGUIR USUARIO ------------------
 class SeguirUsuario(Base):
     __tablename__ = "seguir_usuario"
@@ -162,8 +229,25 @@ class Notificacion(Base):
     leido = Column(Boolean, default=False)
     fecha = Column(DateTime, default=datetime.utcnow)
     id_referencia = Column(Integer, nullable=True)
+    # Cantidad de actores en una notificación agrupada (ver backend/cola_notificaciones.py)
+    total_actores = Column(Integer, nullable=False, default=1, server_default="1")
 
     usuario = relationship("Usuario", back_populates="notificaciones")
+    actores = relationship("NotificacionActor", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        # Listado paginado por (fecha, id) y marcado de no leídas hasta un cursor
+        Index("ix_notificaciones_usuario_fecha", "id_usuario", "fecha", "id_notificacion"),
+        Index("ix_notificaciones_usuario_leido_fecha", "id_usuario", "leido", "fecha"),
+        Index("ix_notificaciones_agrupacion", "id_usuario", "tipo", "id_referencia"),
+    )
+
+class NotificacionActor(Base):
+    """Actores distintos de una notificación agrupada; total_actores es cuántos hay"""
+    __tablename__ = "notificaciones_actores"
+
+    id_notificacion = Column(Integer, ForeignKey("notificaciones.id_notificacion", ondelete="CASCADE"), primary_key=True)
+    id_actor = Column(Integer, ForeignKey("usuarios.id_usuario", ondelete="CASCADE"), primary_key=True)
 
 # ------------------ BLOQUEO DE USUARIO ------------------
 class BloqueoUsuario(Base):
@@ -177,6 +261,12 @@ class BloqueoUsuario(Base):
     bloqueador = relationship("Usuario", foreign_keys=[id_bloqueador], back_populates="bloqueos_realizados")
     bloqueado = relationship("Usuario", foreign_keys=[id_bloqueado], back_populates="bloqueos_recibidos")
 
+    # Anti-joins de backend/exclusiones.py, en ambos sentidos
+    __table_args__ = (
+        Index("ix_bloqueos_bloqueador_bloqueado", "id_bloqueador", "id_bloqueado"),
+        Index("ix_bloqueos_bloqueado_bloqueador", "id_bloqueado", "id_bloqueador"),
+    )
+
 # ------------------ NO ME INTERESA ------------------
 class NoMeInteresa(Base):
     __tablename__ = "no_me_interesa"
@@ -189,6 +279,10 @@ class NoMeInteresa(Base):
     usuario = relationship("Usuario", back_populates="no_me_interesa")
     publicacion = relationship("Publicacion", back_populates="no_me_interesa")
 
+    __table_args__ = (
+        Index("ix_no_me_interesa_usuario_publicacion", "id_usuario", "id_publicacion"),
+    )
+
 # ------------------ ME GUSTA PUBLICACIÓN ------------------
 class MeGusta(Base):
     __tablename__ = "me_gusta"
@@ -223,6 +317,7 @@ class Comentario(Base):
     id_comentario_padre = Column(Integer, ForeignKey("comentarios.id_comentario"), nullable=True)
     contenido = Column(String(500), nullable=False)
     fecha = Column(DateTime, default=datetime.utcnow)
+    total_me_gusta = Column(Integer, nullable=False, default=0, server_default="0")
 
     usuario = relationship("Usuario", back_populates="comentarios")
     publicacion = relationship("Publicacion", back_populates="comentarios")
@@ -304,6 +399,12 @@ class Mensaje(Base):
     chat = relationship("Chat", back_populates="mensajes")
     emisor = relationship("Usuario")
 
+    __table_args__ = (
+        # Último mensaje en la bandeja, conteo de no leídos y páginas del historial
+        Index("ix_mensajes_chat_fecha", "id_chat", "fecha_envio", "id_mensaje"),
+        Index("ix_mensajes_chat_leido", "id_chat", "leido", "id_emisor"),
+    )
+
     # backend/models.py - AGREGAR ESTE MODELO
 
 class MensajeEliminado(Base):
@@ -318,6 +419,11 @@ class MensajeEliminado(Base):
     mensaje = relationship("Mensaje")
     usuario = relationship("Usuario")
 
+    # Anti-join del historial: "¿este usuario eliminó este mensaje?"
+    __table_args__ = (
+        Index("ix_mensajes_eliminados_usuario_mensaje", "id_usuario", "id_mensaje"),
+    )
+
 
     # backend/models.py - MODELO ConfiguracionChat
 
@@ -412,12 +518,68 @@ class GaleriaArchivo(Base):
     es_publico = Column(Boolean, default=False)
     fecha_subida = Column(DateTime, default=datetime.utcnow)
     fecha_actualizacion = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    hash_contenido = Column(String(64), nullable=True, index=True)  # xxh3-128 calculado al subir
     
     # Relaciones
     carpeta = relationship("GaleriaCarpeta", back_populates="archivos")
     usuario = relationship("Usuario")
 
 
+class GaleriaSubida(Base):
+    """Subida reanudable en curso: al completarse se borra y queda el GaleriaArchivo"""
+    __tablename__ = "galeria_subidas"
+
+    id_subida = Column(String(36), primary_key=True)
+    id_usuario = Column(Integer, ForeignKey("usuarios.id_usuario", ondelete="CASCADE"), index=True)
+    id_carpeta = Column(Integer, ForeignKey("galeria_carpetas.id_carpeta", ondelete="CASCADE"))
+    nombre_original = Column(String(255), nullable=False)
+    tamano_total = Column(BigInteger, nullable=False)
+    recibidos = Column(BigInteger, nullable=False, default=0, server_default="0")
+    descripcion = Column(String(500), nullable=True)
+    etiquetas = Column(Text, nullable=True)  # tal como llegaron; se procesan al completar
+    es_publico = Column(Boolean, default=False)
+    fecha_creacion = Column(DateTime, default=datetime.utcnow)
+    fecha_actualizacion = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+
+class VarianteImagen(Base):
+    """Versión redimensionada de una imagen subida (galería o publicación)"""
+    __tablename__ = "variantes_imagen"
+
+    id_variante = Column(Integer, primary_key=True, index=True)
+    ruta_original = Column(String(500), nullable=False)  # ruta /static/... del original
+    tamano = Column(String(20), nullable=False)  # miniatura, media, completa
+    formato = Column(String(10), nullable=False)  # webp, jpeg
+    ruta = Column(String(500), nullable=False)
+    ancho = Column(Integer, nullable=False)
+    alto = Column(Integer, nullable=False)
+    bytes = Column(Integer, nullable=False)
+    fecha_creacion = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("ruta_original", "tamano", "formato", name="uq_variante_original_tamano_formato"),
+    )
+
+
+class TrabajoVideo(Base):
+    """Análisis de un video subido (duración, resolución y póster) hecho fuera de la petición"""
+    __tablename__ = "trabajos_video"
+
+    id_trabajo = Column(Integer, primary_key=True, index=True)
+    id_usuario = Column(Integer, ForeignKey("usuarios.id_usuario", ondelete="CASCADE"), index=True)
+    ruta_original = Column(String(500), nullable=False, index=True)  # ruta /static/... del video
+    id_archivo = Column(Integer, ForeignKey("galeria_archivos.id_archivo", ondelete="CASCADE"), nullable=True)
+    estado = Column(String(20), nullable=False, default="pendiente", index=True)  # pendiente, procesando, terminado, error
+    duracion = Column(Integer, nullable=True)
+    resolucion = Column(String(20), nullable=True)
+    poster = Column(String(500), nullable=True)
+    error = Column(String(500), nullable=True)
+    tomado_por = Column(String(100), nullable=True)  # host:pid:hilo que lo está procesando
+    fecha_toma = Column(DateTime, nullable=True)
+    fecha_creacion = Column(DateTime, default=datetime.utcnow)
+    fecha_actualizacion = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 class GaleriaPublicacion(Base):
     __tablename__ = "galeria_publicaciones"
     
@@ -430,4 +592,18 @@ class GaleriaPublicacion(Base):
     # Relaciones
     archivo = relationship("GaleriaArchivo")
     publicacion = relationship("Publicacion")
-    usuario = relationship("Usuario")
\ No newline at end of file
+    usuario = relationship("Usuario")
+
+# ------------------ ALMACÉN DE CONTENIDO ------------------
+class Blob(Base):
+    """Archivo subido guardado una sola vez por contenido (ver backend/blobs.py)"""
+    __tablename__ = "blobs"
+
+    id_blob = Column(Integer, primary_key=True, index=True)
+    ruta = Column(String(255), unique=True, nullable=False)  # static/blobs/ab/<hash>.<ext>
+    hash_contenido = Column(String(64), nullable=False, index=True)
+    tamano = Column(BigInteger, nullable=False)
+    # Filas que apuntan a la ruta (publicaciones, mensajes, fondos, reportes, galería)
+    referencias = Column(Integer, nullable=False, default=0, server_default="0")
+    fecha_creacion = Column(DateTime, default=datetime.utcnow)
+    fecha_ultimo_uso = Column(DateTime, default=datetime.utcnow, index=True)
@@ -0,0 +1,184 @@
+# backend/notificaciones.py
+"""
+Notificaciones en tiempo real y contador de no leídas.
+
+Cada Notificacion que se inserta (me gusta, comentario, compartido, seguidor,
+amistad, mensaje) se cuenta en usuarios.notificaciones_no_leidas dentro de la misma
+transacción y, al hacer commit, se empuja a las conexiones abiertas del destinatario
+(stream SSE /notificaciones/stream). Así no hace falta tocar cada endpoint que crea
+notificaciones ni que el cliente haga polling.
+
+El listado se pagina por cursor sobre (fecha, id_notificacion), con las notificaciones
+sin fecha al final (fecha_orden), y el marcado como
+leídas es un único UPDATE (todas o hasta un cursor), sin cargar filas en la sesión.
+
+Si el contador se desvía (borrados fuera de la API) se recalcula con:
+    python -m backend.notificaciones
+"""
+from typing import Optional
+
+from sqlalchemy import and_, event, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from backend import models
+from backend.paginacion import (
+    FECHA_SIN_FECHA,
+    codificar_cursor,
+    cortar_pagina,
+    decodificar_cursor,
+    fecha_orden,
+    filtro_anteriores,
+)
+from backend.tiempo_real import crear_evento, publicar_desde_hilo
+
+CLAVE_PENDIENTES = "notificaciones_nuevas"
+
+
+def formatear_notificacion(n: models.Notificacion) -> dict:
+    """Misma forma que NotificacionResponse"""
+    return {
+        "id_notificacion": n.id_notificacion,
+        "tipo": n.tipo,
+        "mensaje": n.mensaje,
+        "fecha_creacion": n.fecha,
+        "leida": bool(n.leido),
+        "id_referencia": n.id_referencia,
+        "total_actores": n.total_actores or 1,
+    }
+
+
+def _fecha_de(n: models.Notificacion):
+    return n.fecha or FECHA_SIN_FECHA
+
+
+def _cursor_de(n: models.Notificacion) -> str:
+    return codificar_cursor(_fecha_de(n), n.id_notificacion)
+
+
+def _ajustar_no_leidas(connection, id_usuario: int, delta: int) -> None:
+    connection.execute(
+        update(models.Usuario)
+        .where(models.Usuario.id_usuario == id_usuario)
+        .values(notificaciones_no_leidas=models.Usuario.notificaciones_no_leidas + delta)
+    )
+
+
+def publicar_al_confirmar(session: Session, n: models.Notificacion) -> None:
+    """Empuja la notificación a su destinatario cuando la sesión haga commit"""
+    session.info.setdefault(CLAVE_PENDIENTES, []).append((n.id_usuario, formatear_notificacion(n)))
+
+
+@event.listens_for(models.Notificacion, "after_insert")
+def _al_insertar(mapper, connection, target: models.Notificacion) -> None:
+    if target.leido or target.id_usuario is None:
+        return
+    _ajustar_no_leidas(connection, target.id_usuario, 1)
+    session = Session.object_session(target)
+    if session is not None:
+        publicar_al_confirmar(session, target)
+
+
+@event.listens_for(models.Notificacion, "after_delete")
+def _al_borrar(mapper, connection, target: models.Notificacion) -> None:
+    if not target.leido and target.id_usuario is not None:
+        _ajustar_no_leidas(connection, target.id_usuario, -1)
+
+
+@event.listens_for(Session, "after_commit")
+def _publicar_pendientes(session: Session) -> None:
+    for id_usuario, datos in session.info.pop(CLAVE_PENDIENTES, ()):
+        publicar_desde_hilo([id_usuario], crear_evento("notificacion", notificacion=datos))
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_pendientes(session: Session) -> None:
+    session.info.pop(CLAVE_PENDIENTES, None)
+
+
+def _consulta_no_leidas(id_usuario: int):
+    return select(models.Usuario.notificaciones_no_leidas).where(models.Usuario.id_usuario == id_usuario)
+
+
+def contar_no_leidas(db: Session, id_usuario: int) -> int:
+    return db.scalar(_consulta_no_leidas(id_usuario)) or 0
+
+
+async def contar_no_leidas_async(db: AsyncSession, id_usuario: int) -> int:
+    return await db.scalar(_consulta_no_leidas(id_usuario)) or 0
+
+
+def cargar_notificaciones(db: Session, id_usuario: int, cursor: Optional[str], limite: int) -> dict:
+    """Página de notificaciones, de la más reciente a la más antigua"""
+    fecha, id_notificacion = fecha_orden(models.Notificacion.fecha), models.Notificacion.id_notificacion
+    query = db.query(models.Notificacion).filter(models.Notificacion.id_usuario == id_usuario)
+    if cursor:
+        query = query.filter(filtro_anteriores(fecha, id_notificacion, cursor))
+    filas = query.order_by(fecha.desc(), id_notificacion.desc()).limit(limite + 1).all()
+    pagina, next_cursor = cortar_pagina(filas, limite, _fecha_de, lambda n: n.id_notificacion)
+    return {
+        "notificaciones": [formatear_notificacion(n) for n in pagina],
+        "next_cursor": next_cursor,
+        "cursor_reciente": _cursor_de(pagina[0]) if pagina else None,
+    }
+
+
+def marcar_leidas(db: Session, id_usuario: int, hasta: Optional[str] = None) -> int:
+    """
+    Marca como leídas con un solo UPDATE todas las notificaciones del usuario o, con
+    hasta, sólo las que no son más recientes que ese cursor (lo que el cliente ya vio).
+    Devuelve cuántas cambiaron.
+    """
+    filtros = [models.Notificacion.id_usuario == id_usuario, models.Notificacion.leido == False]
+    if hasta:
+        fecha, id_notificacion = decodificar_cursor(hasta)
+        fecha_notificacion = fecha_orden(models.Notificacion.fecha)
+        filtros.append(or_(
+            fecha_notificacion < fecha,
+            and_(fecha_notificacion == fecha, models.Notificacion.id_notificacion <= id_notificacion)
+        ))
+    actualizadas = db.query(models.Notificacion).filter(*filtros).update(
+        {"leido": True}, synchronize_session=False
+    )
+
+    usuario = db.query(models.Usuario).filter(models.Usuario.id_usuario == id_usuario)
+    if hasta:
+        usuario.update(
+            {"notificaciones_no_leidas": models.Usuario.notificaciones_no_leidas - actualizadas},
+            synchronize_session=False
+        )
+    else:
+        usuario.update({"notificaciones_no_leidas": 0}, synchronize_session=False)
+    db.commit()
+
+    publicar_desde_hilo(
+        [id_usuario], crear_evento("notificaciones_leidas", no_leidas=contar_no_leidas(db, id_usuario))
+    )
+    return actualizadas
+
+
+def reconciliar_no_leidas(db: Session) -> None:
+    """Recalcula el contador de todos los usuarios desde la tabla notificaciones"""
+    db.execute(
+        update(models.Usuario).values(
+            notificaciones_no_leidas=select(func.count())
+            .select_from(models.Notificacion)
+            .where(
+                models.Notificacion.id_usuario == models.Usuario.id_usuario,
+                models.Notificacion.leido == False
+            )
+            .scalar_subquery()
+        )
+    )
+    db.commit()
+
+
+if __name__ == "__main__":
+    from backend.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        reconciliar_no_leidas(db)
+        print(">>> Contador de notificaciones no leídas reconciliado.")
+    finally:
+        db.close()
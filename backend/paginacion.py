@@ -0,0 +1,80 @@
+# backend/paginacion.py
+"""Paginación por cursor (keyset) sobre columnas (fecha, id)."""
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, func, or_
+
+LIMITE_POR_DEFECTO = 20
+LIMITE_MAXIMO = 100
+# Fecha de orden (y del cursor) de los registros sin fecha: quedan al final del orden descendente
+FECHA_SIN_FECHA = datetime(1970, 1, 1)
+
+
+def normalizar_limite(limite: Optional[int], por_defecto: int = LIMITE_POR_DEFECTO, maximo: int = LIMITE_MAXIMO) -> int:
+    """Acota el tamaño de página pedido por el cliente"""
+    if not limite:
+        return por_defecto
+    return max(1, min(int(limite), maximo))
+
+
+def fecha_orden(*columnas_fecha):
+    """
+    COALESCE(columnas..., FECHA_SIN_FECHA): clave de orden y de cursor para columnas de
+    fecha que pueden ser NULL. Sin esto las filas NULL nunca cumplen el filtro keyset.
+    """
+    return func.coalesce(*columnas_fecha, FECHA_SIN_FECHA)
+
+
+def fecha_o_none(fecha: Optional[datetime]) -> Optional[datetime]:
+    """Vuelve a None la fecha de orden de un registro que no tenía fecha"""
+    return None if fecha == FECHA_SIN_FECHA else fecha
+
+
+def codificar_cursor(fecha: datetime, id_registro: int) -> str:
+    """Genera un cursor opaco a partir de la fecha y el id del último registro"""
+    datos = json.dumps({"f": fecha.isoformat(), "id": id_registro}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(datos.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Devuelve (fecha, id) de un cursor; lanza 400 si el cursor no es válido"""
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        datos = json.loads(base64.urlsafe_b64decode(cursor + relleno).decode("utf-8"))
+        return datetime.fromisoformat(datos["f"]), int(datos["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def filtro_anteriores(columna_fecha, columna_id, cursor: str):
+    """Condición keyset para registros más antiguos que el cursor (orden descendente)"""
+    fecha, id_registro = decodificar_cursor(cursor)
+    return or_(
+        columna_fecha < fecha,
+        and_(columna_fecha == fecha, columna_id < id_registro)
+    )
+
+
+def filtro_posteriores(columna_fecha, columna_id, cursor: str):
+    """Condición keyset para registros más recientes que el cursor (orden ascendente)"""
+    fecha, id_registro = decodificar_cursor(cursor)
+    return or_(
+        columna_fecha > fecha,
+        and_(columna_fecha == fecha, columna_id > id_registro)
+    )
+
+
+def cortar_pagina(filas: list, limite: int, fecha_de, id_de):
+    """
+    Recibe hasta limite + 1 filas y devuelve (pagina, next_cursor).
+    next_cursor es None cuando no hay más resultados.
+    """
+    if len(filas) <= limite:
+        return filas, None
+    pagina = filas[:limite]
+    ultima = pagina[-1]
+    return pagina, codificar_cursor(fecha_de(ultima), id_de(ultima))
@@ -0,0 +1,159 @@
+# backend/replicas.py
+"""
+Enrutamiento de lecturas a réplicas de MySQL.
+
+Los endpoints de sólo lectura (feed, perfiles públicos, búsqueda, estadísticas,
+/public) usan get_db_lectura en lugar de get_db: la sesión se abre contra una
+réplica sana (round robin) y todo lo demás sigue yendo al primario.
+
+- Salud: un hilo de fondo revisa cada réplica cada REPLICA_INTERVALO_REVISION
+  segundos; si no responde o su retraso (Seconds_Behind_Source) supera
+  REPLICA_RETRASO_MAXIMO deja de recibir lecturas hasta la siguiente revisión.
+  Sin réplicas sanas se lee del primario.
+- Leer lo propio: después de una escritura exitosa (POST/PUT/PATCH/DELETE) las
+  lecturas de ese usuario van al primario durante REPLICA_RETRASO_MAXIMO segundos,
+  que es lo más atrasada que puede estar una réplica en uso. Se registra por
+  proceso; con varios workers el desfase queda acotado por el mismo máximo.
+
+Sin DATABASE_REPLICA_URLS todo funciona igual que con get_db.
+"""
+import itertools
+import threading
+import time
+from typing import Dict, List, Optional
+
+from fastapi import Header, HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.exc import DBAPIError
+
+from backend.autenticacion import verificar_token
+from backend.config import settings
+from backend.database import SessionLocal, opciones_pool
+
+# (consulta, columna) según la versión de MySQL
+CONSULTAS_ESTADO_REPLICA = (
+    ("SHOW REPLICA STATUS", "Seconds_Behind_Source"),
+    ("SHOW SLAVE STATUS", "Seconds_Behind_Master"),
+)
+
+
+def medir_retraso(conn) -> Optional[float]:
+    """Segundos de retraso de la réplica; None si la replicación está detenida"""
+    if conn.dialect.name != "mysql":
+        conn.exec_driver_sql("SELECT 1")
+        return 0
+    for consulta, columna in CONSULTAS_ESTADO_REPLICA:
+        try:
+            fila = conn.exec_driver_sql(consulta).mappings().first()
+        except DBAPIError:
+            continue
+        # Sin fila: el servidor no es réplica (o el proveedor no expone el estado)
+        return 0 if fila is None else fila.get(columna)
+    # Sin permiso REPLICATION CLIENT: sólo se sabe que responde
+    return 0
+
+
+class Replica:
+    def __init__(self, engine):
+        self.engine = engine
+        self.sana = True
+        self.retraso: Optional[float] = 0
+
+
+class EnrutadorLecturas:
+    def __init__(self, replicas: List[Replica], retraso_maximo: float):
+        self.replicas = replicas
+        self.retraso_maximo = retraso_maximo
+        self._turno = itertools.count()
+        self._escrituras: Dict[int, float] = {}
+        self._lock = threading.Lock()
+
+    def revisar(self) -> None:
+        for replica in self.replicas:
+            try:
+                with replica.engine.connect() as conn:
+                    replica.retraso = medir_retraso(conn)
+                replica.sana = replica.retraso is not None and replica.retraso <= self.retraso_maximo
+            except Exception as e:
+                if replica.sana:
+                    print(f"⚠️ Réplica {replica.engine.url.host} fuera de servicio: {e}")
+                replica.sana = False
+                replica.retraso = None
+
+    def registrar_escritura(self, id_usuario: int) -> None:
+        with self._lock:
+            self._escrituras[id_usuario] = time.monotonic() + self.retraso_maximo
+
+    def _escribio_hace_poco(self, id_usuario: int) -> bool:
+        with self._lock:
+            vence = self._escrituras.get(id_usuario)
+            if vence is None:
+                return False
+            if vence <= time.monotonic():
+                del self._escrituras[id_usuario]
+                return False
+            return True
+
+    def motor_lectura(self, id_usuario: Optional[int] = None):
+        """Engine de una réplica sana, o None para usar el primario"""
+        if not self.replicas:
+            return None
+        if id_usuario is not None and self._escribio_hace_poco(id_usuario):
+            return None
+        sanas = [r for r in self.replicas if r.sana]
+        if not sanas:
+            return None
+        return sanas[next(self._turno) % len(sanas)].engine
+
+
+def _urls_replicas() -> List[str]:
+    return [url.strip() for url in settings.DATABASE_REPLICA_URLS.split(",") if url.strip()]
+
+
+enrutador = EnrutadorLecturas(
+    [Replica(create_engine(url, **opciones_pool(url))) for url in _urls_replicas()],
+    settings.REPLICA_RETRASO_MAXIMO,
+)
+
+_hilo: Optional[threading.Thread] = None
+_detener = threading.Event()
+
+
+def _revisar_periodicamente() -> None:
+    while not _detener.is_set():
+        enrutador.revisar()
+        _detener.wait(settings.REPLICA_INTERVALO_REVISION)
+
+
+def iniciar() -> None:
+    global _hilo
+    if enrutador.replicas and _hilo is None:
+        _detener.clear()
+        _hilo = threading.Thread(target=_revisar_periodicamente, name="salud-replicas", daemon=True)
+        _hilo.start()
+
+
+def detener() -> None:
+    global _hilo
+    if _hilo is not None:
+        _detener.set()
+        _hilo.join(5)
+        _hilo = None
+
+
+def id_de_token(token: Optional[str]) -> Optional[int]:
+    try:
+        return verificar_token(token)
+    except HTTPException:
+        return None
+
+
+# Dependency
+def get_db_lectura(token: Optional[str] = Header(None, alias="token")):
+    """Como get_db, pero contra una réplica cuando es seguro leer de ella"""
+    engine = enrutador.motor_lectura(id_de_token(token))
+    db = SessionLocal(bind=engine) if engine is not None else SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,161 @@
+# backend/resolucion_imagen.py
+"""
+Resolución de imágenes leyendo sólo la cabecera (JPEG, PNG, GIF, WebP y BMP).
+
+resolucion_imagen lee los primeros PREFIJO bytes con una sola lectura y los analiza
+en memoria. Los JPEG con metadatos grandes (EXIF con miniatura, perfiles ICC) pueden
+tener el SOF más adelante: en ese caso se recorre el archivo con mmap, saltando los
+segmentos sin leerlos, hasta LIMITE_JPEG.
+
+Las subidas a la galería la usan para llenar GaleriaArchivo.resolucion. Para los
+archivos ya subidos:
+
+    python -m backend.resolucion_imagen
+
+analiza las imágenes sin resolución en lotes de LOTE, con HILOS hilos, y guarda
+cada lote con un UPDATE por lotes (executemany).
+"""
+import mmap
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+from urllib.parse import urlparse
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from backend import models
+
+PREFIJO = 64 * 1024
+LIMITE_JPEG = 16 * 1024 * 1024
+LOTE = 500
+HILOS = 8
+
+# SOF0..SOF15 salvo DHT (C4), JPG (C8) y DAC (CC)
+_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# Marcadores sin longitud: TEM y RST0..RST7
+_SIN_LONGITUD = {0x01, *range(0xD0, 0xD8)}
+
+
+def _jpeg(datos) -> Optional[Tuple[int, int]]:
+    i, fin = 2, min(len(datos), LIMITE_JPEG)
+    while i + 4 <= fin:
+        if datos[i] != 0xFF:
+            return None
+        marcador = datos[i + 1]
+        if marcador == 0xFF:  # relleno
+            i += 1
+            continue
+        if marcador in _SIN_LONGITUD:
+            i += 2
+            continue
+        if marcador in (0xD9, 0xDA):  # fin de imagen o inicio de los datos: no hay SOF
+            return None
+        if marcador in _SOF:
+            if i + 9 > fin:
+                return None
+            alto, ancho = struct.unpack_from(">HH", datos, i + 5)
+            return ancho, alto
+        i += 2 + struct.unpack_from(">H", datos, i + 2)[0]
+    return None
+
+
+def _webp(datos) -> Optional[Tuple[int, int]]:
+    bloque = bytes(datos[12:16])
+    if bloque == b"VP8 " and len(datos) >= 30:
+        ancho, alto = struct.unpack_from("<HH", datos, 26)
+        return ancho & 0x3FFF, alto & 0x3FFF
+    if bloque == b"VP8L" and len(datos) >= 25:
+        bits = struct.unpack_from("<I", datos, 21)[0]
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if bloque == b"VP8X" and len(datos) >= 30:
+        ancho = int.from_bytes(datos[24:27], "little") + 1
+        alto = int.from_bytes(datos[27:30], "little") + 1
+        return ancho, alto
+    return None
+
+
+def _bmp(datos) -> Optional[Tuple[int, int]]:
+    if len(datos) < 26:
+        return None
+    cabecera = struct.unpack_from("<I", datos, 14)[0]
+    if cabecera == 12:  # BITMAPCOREHEADER
+        return struct.unpack_from("<HH", datos, 18)
+    ancho, alto = struct.unpack_from("<ii", datos, 18)
+    return ancho, abs(alto)  # alto negativo: filas de arriba hacia abajo
+
+
+def dimensiones(datos) -> Optional[Tuple[int, int]]:
+    """(ancho, alto) a partir del comienzo del archivo (bytes o mmap); None si no se reconoce"""
+    try:
+        if datos[:2] == b"\xff\xd8":
+            return _jpeg(datos)
+        if datos[:8] == b"\x89PNG\r\n\x1a\n" and datos[12:16] == b"IHDR":
+            return struct.unpack_from(">II", datos, 16)
+        if datos[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack_from("<HH", datos, 6)
+        if datos[:4] == b"RIFF" and datos[8:12] == b"WEBP":
+            return _webp(datos)
+        if datos[:2] == b"BM":
+            return _bmp(datos)
+    except (struct.error, IndexError):
+        pass
+    return None
+
+
+def resolucion_imagen(ruta: str) -> Optional[str]:
+    """"anchoxalto" de la imagen en disco; None si no existe o no se reconoce el formato"""
+    try:
+        with open(ruta, "rb") as f:
+            datos = f.read(PREFIJO)
+            medidas = dimensiones(datos)
+            if medidas is None and datos[:2] == b"\xff\xd8" and len(datos) == PREFIJO:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+                    medidas = dimensiones(mapa)
+    except (OSError, ValueError):
+        return None
+    if not medidas or min(medidas) <= 0:
+        return None
+    return f"{medidas[0]}x{medidas[1]}"
+
+
+def ruta_en_disco(ruta: str) -> str:
+    return urlparse(ruta).path.lstrip("/")
+
+
+def rellenar_resoluciones(db: Session, lote: int = LOTE, hilos: int = HILOS) -> int:
+    """Completa resolucion en las imágenes de galería que no la tienen. Devuelve cuántas. Hace commit."""
+    actualizadas = 0
+    ultimo = 0
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        while True:
+            filas = db.query(models.GaleriaArchivo.id_archivo, models.GaleriaArchivo.ruta).filter(
+                models.GaleriaArchivo.tipo == "imagen",
+                models.GaleriaArchivo.resolucion.is_(None),
+                models.GaleriaArchivo.id_archivo > ultimo
+            ).order_by(models.GaleriaArchivo.id_archivo).limit(lote).all()
+            if not filas:
+                break
+            ultimo = filas[-1].id_archivo
+
+            resoluciones = pool.map(resolucion_imagen, [ruta_en_disco(f.ruta) for f in filas])
+            cambios = [
+                {"id_archivo": fila.id_archivo, "resolucion": resolucion}
+                for fila, resolucion in zip(filas, resoluciones) if resolucion
+            ]
+            if cambios:
+                db.execute(update(models.GaleriaArchivo), cambios)
+                db.commit()
+                actualizadas += len(cambios)
+    return actualizadas
+
+
+if __name__ == "__main__":
+    from backend.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        print(f"Resoluciones completadas: {rellenar_resoluciones(db)}")
+    finally:
+        db.close()
@@ -62,9 +62,12 @@ class PublicacionCreate(PublicacionBase):
 class PublicacionResponse(PublicacionBase):
     id_publicacion: int
     id_usuario: int
-    fecha_creacion: datetime
+    fecha_creacion: Optional[datetime] = None
     usuario: UsuarioPerfil
     imagen: Optional[str] = None
+    estadisticas: Optional['EstadisticasPublicacionResponse'] = None  # sólo con incluir_estadisticas=true
+    variantes: Optional[Dict[str, Dict[str, str]]] = None  # de la imagen principal, {tamano: {formato: url}}
+    poster: Optional[str] = None  # del video principal, cuando ya se procesó
 
     @validator('imagen', pre=True, always=True)
     def set_imagen(cls, v, values):
@@ -98,6 +101,11 @@ class PublicacionResponse(PublicacionBase):
 
     class Config:
         from_attributes = True
+
+class PublicacionesPaginadasResponse(BaseModel):
+    publicaciones: List[PublicacionResponse]
+    next_cursor: Optional[str] = None
+
 # ------------------ SEGUIDORES / SIGUIENDO ------------------
 class SeguidorResponse(BaseModel):
     id_seguimiento: int
@@ -170,6 +178,7 @@ class ComentarioResponse(BaseModel):
     fecha: datetime
     usuario: UsuarioPerfil
     respuestas: List['ComentarioResponse'] = []
+    total_respuestas: int = 0
     total_me_gusta: int = 0
     me_gusta_dado: bool = False
 
@@ -182,6 +191,7 @@ ComentarioResponse.update_forward_refs()
 class ComentarioConRespuestasResponse(BaseModel):
     comentarios: List[ComentarioResponse]
     total: int
+    next_cursor: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -204,12 +214,22 @@ class EstadisticasPublicacionResponse(BaseModel):
     total_me_gusta: int
     total_comentarios: int
     total_guardados: int
+    total_compartidos: int = 0
     me_gusta_dado: bool
     guardado: bool
 
     class Config:
         from_attributes = True
 
+class EstadisticasPublicacionLoteResponse(EstadisticasPublicacionResponse):
+    id_publicacion: int
+
+class EstadisticasLoteRequest(BaseModel):
+    ids_publicaciones: List[int]
+
+PublicacionResponse.update_forward_refs()
+PublicacionesPaginadasResponse.update_forward_refs()
+
 # ------------------ ESTADÍSTICAS ME GUSTAS ------------------
 class EstadisticasMeGustasResponse(BaseModel):
     me_gustas_recibidos: int
@@ -240,12 +260,19 @@ class NotificacionResponse(BaseModel):
     id_notificacion: int
     tipo: str
     mensaje: str
-    fecha_creacion: datetime
+    fecha_creacion: Optional[datetime] = None
     leida: bool
+    total_actores: int = 1
 
     class Config:
         from_attributes = True
 
+class NotificacionesPaginadasResponse(BaseModel):
+    notificaciones: List[NotificacionResponse]
+    next_cursor: Optional[str] = None
+    # Cursor de la notificación más reciente de la página, para PUT /notificaciones/leidas?hasta=
+    cursor_reciente: Optional[str] = None
+
 # ------------------ CONFIGURACIÓN CHAT ------------------
 
 class ConfiguracionChatBase(BaseModel):
@@ -367,6 +394,9 @@ class ArchivoResponse(ArchivoBase):
     fecha_subida: datetime
     fecha_actualizacion: datetime
     carpeta_nombre: Optional[str] = None
+    # {tamano: {formato: url}} para imágenes (ver backend/variantes_imagen.py)
+    variantes: Optional[Dict[str, Dict[str, str]]] = None
+    id_trabajo: Optional[int] = None  # análisis del video en curso, al subirlo
 
     @validator('etiquetas', pre=True)
     def parse_etiquetas(cls, v):
@@ -381,6 +411,41 @@ class ArchivoResponse(ArchivoBase):
         from_attributes = True
 
 
+class SubidaCreate(BaseModel):
+    id_carpeta: int
+    nombre_original: str
+    tamano_total: int
+    descripcion: Optional[str] = None
+    etiquetas: Optional[str] = None
+    es_publico: Optional[bool] = False
+
+class SubidaResponse(BaseModel):
+    id_subida: str
+    nombre_original: str
+    tamano_total: int
+    recibidos: int
+    tamano_parte: int  # tamaño sugerido para cada PUT
+
+    class Config:
+        from_attributes = True
+
+
+class TrabajoVideoResponse(BaseModel):
+    id_trabajo: int
+    ruta_original: str
+    id_archivo: Optional[int] = None
+    estado: str
+    duracion: Optional[int] = None
+    resolucion: Optional[str] = None
+    poster: Optional[str] = None
+    error: Optional[str] = None
+    fecha_creacion: datetime
+    fecha_actualizacion: datetime
+
+    class Config:
+        from_attributes = True
+
+
 class PublicarDesdeGaleria(BaseModel):
     id_archivo: int
     contenido: Optional[str] = None
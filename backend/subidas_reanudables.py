@@ -0,0 +1,168 @@
+# backend/subidas_reanudables.py
+"""
+Subidas reanudables para la galería (videos grandes sobre conexiones inestables).
+
+El cliente abre una subida (POST /galeria/subidas) y manda el archivo en partes con
+PUT /galeria/subidas/{id}?offset=N, con los bytes crudos en el cuerpo. Cada parte se
+escribe directo en DIRECTORIO_SUBIDAS (fuera de static/) a partir de offset, sin
+pasar por el parser de formularios; si la conexión se corta a mitad de una parte se
+conserva lo recibido. Para reanudar, GET /galeria/subidas/{id} devuelve recibidos y
+el cliente sigue desde ahí. Al completar, el archivo se mueve a la galería y se crea
+el GaleriaArchivo.
+
+Las partes de una misma subida se escriben de a una (lock por subida, por proceso);
+un offset distinto de recibidos responde 409 con el valor correcto. Las subidas sin
+actividad durante VIGENCIA_SUBIDA se descartan.
+"""
+import asyncio
+import os
+import weakref
+from datetime import datetime, timedelta
+from typing import AsyncIterator
+
+import aiofiles
+import aiofiles.os
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from backend import models, schemas
+from backend.almacenamiento import ArchivoGuardado, borrar_archivo, hash_de_archivo
+
+DIRECTORIO_SUBIDAS = "subidas_pendientes"
+TAMANO_PARTE = 8 * 1024 * 1024  # sugerido al cliente
+TAMANO_MAXIMO_PARTE = 64 * 1024 * 1024
+VIGENCIA_SUBIDA = timedelta(hours=24)
+
+_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def _lock(id_subida: str) -> asyncio.Lock:
+    lock = _locks.get(id_subida)
+    if lock is None:
+        lock = _locks[id_subida] = asyncio.Lock()
+    return lock
+
+
+def ruta_parcial(id_subida: str) -> str:
+    return os.path.join(DIRECTORIO_SUBIDAS, f"{id_subida}.parcial")
+
+
+def respuesta_subida(subida: models.GaleriaSubida) -> schemas.SubidaResponse:
+    return schemas.SubidaResponse(
+        id_subida=subida.id_subida,
+        nombre_original=subida.nombre_original,
+        tamano_total=subida.tamano_total,
+        recibidos=subida.recibidos,
+        tamano_parte=TAMANO_PARTE,
+    )
+
+
+async def crear_subida(db: Session, subida: models.GaleriaSubida) -> models.GaleriaSubida:
+    """Guarda la subida y crea su archivo parcial vacío. Hace commit."""
+    await aiofiles.os.makedirs(DIRECTORIO_SUBIDAS, exist_ok=True)
+    async with aiofiles.open(ruta_parcial(subida.id_subida), "wb"):
+        pass
+    db.add(subida)
+    db.commit()
+    db.refresh(subida)
+    return subida
+
+
+def obtener_subida(db: Session, id_subida: str, id_usuario: int) -> models.GaleriaSubida:
+    subida = db.query(models.GaleriaSubida).filter(
+        models.GaleriaSubida.id_subida == id_subida,
+        models.GaleriaSubida.id_usuario == id_usuario
+    ).first()
+    if not subida:
+        raise HTTPException(status_code=404, detail="Subida no encontrada")
+    return subida
+
+
+async def escribir_parte(
+    db: Session,
+    subida: models.GaleriaSubida,
+    offset: int,
+    cuerpo: AsyncIterator[bytes],
+) -> int:
+    """Escribe los bytes de cuerpo desde offset y devuelve el total recibido. Hace commit."""
+    async with _lock(subida.id_subida):
+        # Otra parte pudo avanzar la subida mientras se esperaba el lock
+        db.refresh(subida)
+        if offset != subida.recibidos:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Offset incorrecto: se recibieron {subida.recibidos} bytes"
+            )
+
+        restante = subida.tamano_total - offset
+        escritos = 0
+        excedido = False
+        try:
+            async with aiofiles.open(ruta_parcial(subida.id_subida), "r+b") as salida:
+                # Descarta lo que haya quedado de una parte anterior sin registrar
+                await salida.seek(offset)
+                await salida.truncate()
+                async for bloque in cuerpo:
+                    if escritos + len(bloque) > restante:
+                        excedido = True
+                        break
+                    await salida.write(bloque)
+                    escritos += len(bloque)
+                if excedido:
+                    await salida.seek(offset)
+                    await salida.truncate()
+                    escritos = 0
+        except FileNotFoundError:
+            raise HTTPException(status_code=410, detail="La subida ya no está disponible")
+        finally:
+            # También si el cliente se desconectó: lo escrito sirve para reanudar
+            if escritos:
+                subida.recibidos = offset + escritos
+                db.commit()
+
+        if excedido:
+            raise HTTPException(status_code=400, detail="La parte supera el tamaño declarado del archivo")
+        return subida.recibidos
+
+
+async def completar_subida(subida: models.GaleriaSubida, destino: str) -> ArchivoGuardado:
+    """Mueve el archivo armado a destino; 409 si todavía faltan bytes"""
+    async with _lock(subida.id_subida):
+        ruta = ruta_parcial(subida.id_subida)
+        if subida.recibidos != subida.tamano_total:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Subida incompleta: {subida.recibidos} de {subida.tamano_total} bytes"
+            )
+        try:
+            tamano = (await aiofiles.os.stat(ruta)).st_size
+        except FileNotFoundError:
+            raise HTTPException(status_code=410, detail="La subida ya no está disponible")
+        if tamano != subida.tamano_total:
+            raise HTTPException(status_code=409, detail="El archivo recibido no coincide con el tamaño declarado")
+
+        hash_contenido = await hash_de_archivo(ruta)
+        await aiofiles.os.makedirs(os.path.dirname(destino), exist_ok=True)
+        await aiofiles.os.replace(ruta, destino)
+        return ArchivoGuardado(destino, tamano, hash_contenido)
+
+
+async def descartar_subida(db: Session, subida: models.GaleriaSubida) -> None:
+    """Borra la subida y su archivo parcial. Hace commit."""
+    await borrar_archivo(ruta_parcial(subida.id_subida))
+    db.delete(subida)
+    db.commit()
+
+
+async def limpiar_vencidas(db: Session) -> int:
+    """Descarta las subidas sin actividad durante VIGENCIA_SUBIDA"""
+    limite = datetime.utcnow() - VIGENCIA_SUBIDA
+    vencidas = db.query(models.GaleriaSubida).filter(
+        models.GaleriaSubida.fecha_actualizacion < limite
+    ).all()
+    for subida in vencidas:
+        await borrar_archivo(ruta_parcial(subida.id_subida))
+        db.delete(subida)
+    if vencidas:
+        db.commit()
+    return len(vencidas)
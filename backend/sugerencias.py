@@ -0,0 +1,254 @@
+# backend/sugerencias.py
+"""
+Motor de sugerencias de usuarios para /sugerencias-usuarios.
+
+- Populares: se leen de puntuaciones_usuario, una tabla materializada (likes
+  recibidos, publicaciones y seguidores por usuario) que se recalcula con un único
+  INSERT ... SELECT agregado cada INTERVALO_REFRESCO segundos en un hilo de fondo
+  (uno por proceso, ver iniciar). Con varios workers reconstruye sólo el que toma
+  el lock NOMBRE_LOCK (GET_LOCK de MySQL) y encuentra la tabla vencida; los demás
+  saltean ese ciclo. Si el refresco falla se registra y las peticiones siguen
+  leyendo los últimos datos materializados.
+- Amigos de amigos: una consulta agrupada sobre seguir_usuario restringida a los
+  seguidos por mis amigos, ordenada por cuántos amigos los siguen.
+
+Ambas consultas aplican las exclusiones (yo, ya seguidos, bloqueos) como anti-joins.
+
+Refresco manual (p. ej. desde cron):
+    python -m backend.sugerencias
+"""
+import threading
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import exists, func, insert, literal, select, text, union
+from sqlalchemy.orm import Session, aliased
+
+from backend import models
+from backend.exclusiones import filtrar_usuarios
+
+INTERVALO_REFRESCO = 600
+NOMBRE_LOCK = "artenity.puntuaciones_usuario"
+
+_hilo: Optional[threading.Thread] = None
+_detener = threading.Event()
+
+
+def refrescar_puntuaciones(db: Session) -> None:
+    """Recalcula puntuaciones_usuario con agregados (sólo usuarios con publicaciones). Hace commit."""
+    por_usuario = (
+        select(
+            models.Publicacion.id_usuario.label("id_usuario"),
+            func.sum(models.Publicacion.total_me_gusta).label("likes"),
+            func.count(models.Publicacion.id_publicacion).label("publicaciones"),
+        )
+        .group_by(models.Publicacion.id_usuario)
+        .subquery()
+    )
+    seguidores = (
+        select(
+            models.SeguirUsuario.id_seguido.label("id_usuario"),
+            func.count(models.SeguirUsuario.id_seguimiento).label("seguidores"),
+        )
+        .group_by(models.SeguirUsuario.id_seguido)
+        .subquery()
+    )
+    origen = (
+        select(
+            por_usuario.c.id_usuario,
+            func.coalesce(por_usuario.c.likes, 0),
+            por_usuario.c.publicaciones,
+            func.coalesce(seguidores.c.seguidores, 0),
+            literal(datetime.utcnow()),
+        )
+        .join(models.Usuario, models.Usuario.id_usuario == por_usuario.c.id_usuario)
+        .outerjoin(seguidores, seguidores.c.id_usuario == por_usuario.c.id_usuario)
+    )
+
+    db.query(models.PuntuacionUsuario).delete(synchronize_session=False)
+    db.execute(
+        insert(models.PuntuacionUsuario).from_select(
+            ["id_usuario", "likes_totales", "publicaciones", "seguidores", "actualizado"],
+            origen
+        )
+    )
+    db.commit()
+
+
+def _tomar_lock(conexion) -> bool:
+    """GET_LOCK sin espera en MySQL; los demás motores no lo necesitan"""
+    if conexion.dialect.name != "mysql":
+        return True
+    tomado = conexion.execute(text("SELECT GET_LOCK(:nombre, 0)"), {"nombre": NOMBRE_LOCK}).scalar() == 1
+    conexion.commit()
+    return tomado
+
+
+def _soltar_lock(conexion) -> None:
+    if conexion.dialect.name == "mysql":
+        conexion.execute(text("SELECT RELEASE_LOCK(:nombre)"), {"nombre": NOMBRE_LOCK})
+        conexion.commit()
+
+
+def _puntuaciones_vigentes(db: Session) -> bool:
+    actualizado = db.query(func.max(models.PuntuacionUsuario.actualizado)).scalar()
+    return actualizado is not None and datetime.utcnow() - actualizado < timedelta(seconds=INTERVALO_REFRESCO)
+
+
+def refrescar_si_vencido(conexion) -> bool:
+    """
+    Refresca puntuaciones_usuario si nadie lo hizo en los últimos INTERVALO_REFRESCO
+    segundos, con el lock tomado en conexion (el lock de MySQL es por conexión).
+    Devuelve si refrescó.
+    """
+    if not _tomar_lock(conexion):
+        return False
+    try:
+        db = Session(bind=conexion, autoflush=False)
+        try:
+            if _puntuaciones_vigentes(db):
+                return False
+            refrescar_puntuaciones(db)
+            return True
+        finally:
+            db.close()
+    finally:
+        _soltar_lock(conexion)
+
+
+def _refrescar() -> None:
+    from backend.database import engine
+
+    try:
+        with engine.connect() as conexion:
+            refrescar_si_vencido(conexion)
+    except Exception as e:
+        print(f"⚠️ No se recalcularon las puntuaciones de usuarios: {e}")
+
+
+def _refrescar_periodicamente() -> None:
+    while not _detener.is_set():
+        _refrescar()
+        _detener.wait(INTERVALO_REFRESCO)
+
+
+def iniciar() -> None:
+    global _hilo
+    if _hilo is None:
+        _detener.clear()
+        _hilo = threading.Thread(target=_refrescar_periodicamente, name="puntuaciones-usuario", daemon=True)
+        _hilo.start()
+
+
+def detener() -> None:
+    global _hilo
+    if _hilo is not None:
+        _detener.set()
+        _hilo.join(5)
+        _hilo = None
+
+
+def _candidatos(query, columna_id_usuario, id_usuario: int):
+    """Excluye al propio usuario, a quienes ya sigue y a los bloqueados en ambos sentidos"""
+    # Alias para que el anti-join no se correlacione con un seguir_usuario de la consulta externa
+    ya_sigue = aliased(models.SeguirUsuario)
+    query = query.filter(
+        columna_id_usuario != id_usuario,
+        ~exists().where(
+            ya_sigue.id_seguidor == id_usuario,
+            ya_sigue.id_seguido == columna_id_usuario
+        )
+    )
+    return filtrar_usuarios(query, columna_id_usuario, id_usuario)
+
+
+def sugerir_populares(db: Session, id_usuario: int, limite: int) -> List[dict]:
+    """Candidatos con más likes recibidos, leyendo la tabla materializada"""
+    filas = (
+        _candidatos(
+            db.query(models.PuntuacionUsuario, models.Usuario, models.Perfil.foto_perfil)
+            .join(models.Usuario, models.Usuario.id_usuario == models.PuntuacionUsuario.id_usuario)
+            .outerjoin(models.Perfil, models.Perfil.id_usuario == models.Usuario.id_usuario),
+            models.PuntuacionUsuario.id_usuario, id_usuario
+        )
+        .order_by(models.PuntuacionUsuario.likes_totales.desc(), models.PuntuacionUsuario.id_usuario)
+        .limit(limite)
+        .all()
+    )
+
+    return [
+        {
+            "id_usuario": usuario.id_usuario,
+            "nombre_usuario": usuario.nombre_usuario,
+            "nombre": usuario.nombre,
+            "foto_perfil": foto_perfil,
+            "puntuacion": puntuacion.likes_totales,
+            "estadisticas": {
+                "likes_totales": puntuacion.likes_totales,
+                "seguidores": puntuacion.seguidores,
+                "publicaciones": puntuacion.publicaciones
+            }
+        }
+        for puntuacion, usuario, foto_perfil in filas
+    ]
+
+
+def _ids_amigos(id_usuario: int):
+    return union(
+        select(models.Amistad.id_usuario2).where(
+            models.Amistad.id_usuario1 == id_usuario, models.Amistad.estado == "aceptada"
+        ),
+        select(models.Amistad.id_usuario1).where(
+            models.Amistad.id_usuario2 == id_usuario, models.Amistad.estado == "aceptada"
+        ),
+    )
+
+
+def sugerir_por_amigos(db: Session, id_usuario: int, limite: int) -> List[dict]:
+    """Usuarios que siguen mis amigos, ordenados por cuántos amigos los siguen"""
+    amigos_en_comun = func.count(func.distinct(models.SeguirUsuario.id_seguidor)).label("amigos_en_comun")
+    ultima_fecha = func.max(models.SeguirUsuario.fecha_seguimiento).label("fecha_seguimiento")
+
+    filas = (
+        _candidatos(
+            db.query(models.SeguirUsuario.id_seguido, amigos_en_comun, ultima_fecha)
+            .filter(models.SeguirUsuario.id_seguidor.in_(_ids_amigos(id_usuario))),
+            models.SeguirUsuario.id_seguido, id_usuario
+        )
+        .group_by(models.SeguirUsuario.id_seguido)
+        .order_by(amigos_en_comun.desc(), ultima_fecha.desc())
+        .limit(limite)
+        .subquery()
+    )
+
+    resultado = (
+        db.query(models.Usuario, models.Perfil.foto_perfil, filas.c.amigos_en_comun, filas.c.fecha_seguimiento)
+        .join(filas, filas.c.id_seguido == models.Usuario.id_usuario)
+        .outerjoin(models.Perfil, models.Perfil.id_usuario == models.Usuario.id_usuario)
+        .order_by(filas.c.amigos_en_comun.desc(), filas.c.fecha_seguimiento.desc())
+        .all()
+    )
+
+    return [
+        {
+            "id_usuario": usuario.id_usuario,
+            "nombre_usuario": usuario.nombre_usuario,
+            "nombre": usuario.nombre,
+            "foto_perfil": foto_perfil,
+            "recomendado_por": "amigos",
+            "amigos_en_comun": en_comun,
+            "fecha_seguimiento": fecha
+        }
+        for usuario, foto_perfil, en_comun, fecha in resultado
+    ]
+
+
+if __name__ == "__main__":
+    from backend.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        refrescar_puntuaciones(db)
+        print(">>> Puntuaciones de usuarios recalculadas.")
+    finally:
+        db.close()
@@ -0,0 +1,34 @@
+import os
+
+# Antes de importar backend: settings se lee una sola vez
+os.environ.setdefault("SECRET_KEY", "clave-de-pruebas")
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend import models
+
+
+@pytest.fixture
+def db():
+    """Sesión sobre una base sqlite en memoria con todas las tablas"""
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def usuarios(db):
+    """usuarios(1, 2, ...) crea los usuarios u1, u2, ... con esos ids y hace commit"""
+    def crear(*ids):
+        for i in ids:
+            db.add(models.Usuario(
+                id_usuario=i, nombre=f"u{i}", nombre_usuario=f"u{i}", apellido="x",
+                correo_electronico=f"u{i}@x.com", contrasena="x"
+            ))
+        db.commit()
+    return crear
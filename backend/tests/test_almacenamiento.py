@@ -0,0 +1,33 @@
+import asyncio
+import io
+
+import pytest
+import xxhash
+from fastapi import HTTPException, UploadFile
+
+from backend.almacenamiento import TAMANO_BLOQUE, borrar_con_prefijo, guardar_upload
+
+
+def test_guardar_por_bloques(tmp_path):
+    datos = b"a" * (TAMANO_BLOQUE * 2 + 10)
+    destino = str(tmp_path / "archivo.bin")
+    guardado = asyncio.run(guardar_upload(UploadFile(io.BytesIO(datos), filename="archivo.bin"), destino, len(datos)))
+
+    assert guardado.tamano == len(datos)
+    assert guardado.hash_contenido == xxhash.xxh3_128(datos).hexdigest()
+    assert open(destino, "rb").read() == datos
+
+def test_corta_al_superar_el_maximo(tmp_path):
+    destino = tmp_path / "archivo.bin"
+    subida = UploadFile(io.BytesIO(b"a" * (TAMANO_BLOQUE * 3)), filename="archivo.bin")
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(guardar_upload(subida, str(destino), TAMANO_BLOQUE))
+
+    assert error.value.status_code == 400
+    assert list(tmp_path.iterdir()) == []
+
+def test_borrar_con_prefijo(tmp_path):
+    for nombre in ("perfil_1_a.jpg", "perfil_1_b.jpg", "perfil_10_a.jpg"):
+        (tmp_path / nombre).write_bytes(b"x")
+    asyncio.run(borrar_con_prefijo(str(tmp_path), "perfil_1_", excepto="perfil_1_b.jpg"))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["perfil_10_a.jpg", "perfil_1_b.jpg"]
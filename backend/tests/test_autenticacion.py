@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from jose import jwt
+
+from backend import autenticacion, models
+from backend.autenticacion import (
+    ALGORITHM,
+    SECRET_KEY,
+    create_access_token,
+    exigir_clave_secreta,
+    olvidar_usuario,
+    renovar_token,
+    usuario_existe,
+    verificar_token,
+)
+
+
+def test_verificar_token():
+    assert verificar_token(create_access_token({"id_usuario": 7})) == 7
+
+    vencido = jwt.encode({"id_usuario": 7, "exp": datetime.utcnow() - timedelta(minutes=1)}, SECRET_KEY, algorithm=ALGORITHM)
+    otra_firma = jwt.encode({"id_usuario": 7}, "otra-clave", algorithm=ALGORITHM)
+    for token in (vencido, otra_firma, "basura", "null"):
+        with pytest.raises(HTTPException) as error:
+            verificar_token(token)
+        assert error.value.status_code == 401
+
+def test_renovar_token():
+    vence_pronto = jwt.encode(
+        {"id_usuario": 7, "correo": "u7@x.com", "exp": datetime.utcnow() + timedelta(seconds=30)},
+        SECRET_KEY, algorithm=ALGORITHM
+    )
+    claims = jwt.decode(renovar_token(vence_pronto), SECRET_KEY, algorithms=[ALGORITHM])
+    assert (claims["id_usuario"], claims["correo"]) == (7, "u7@x.com")
+    assert datetime.utcfromtimestamp(claims["exp"]) > datetime.utcnow() + timedelta(minutes=1)
+
+    vencido = jwt.encode({"id_usuario": 7, "exp": datetime.utcnow() - timedelta(minutes=1)}, SECRET_KEY, algorithm=ALGORITHM)
+    with pytest.raises(HTTPException):
+        renovar_token(vencido)
+
+def test_sin_clave_secreta_no_arranca(monkeypatch):
+    exigir_clave_secreta()
+    monkeypatch.setattr(autenticacion, "SECRET_KEY", None)
+    with pytest.raises(RuntimeError):
+        exigir_clave_secreta()
+
+def test_usuario_existe_en_cache_hasta_olvidarlo(db, usuarios):
+    usuarios(1)
+    olvidar_usuario(1)
+
+    assert usuario_existe(db, 1)
+    db.query(models.Usuario).delete()
+    db.commit()
+    # Sigue en caché hasta que vence el TTL o se olvida
+    assert usuario_existe(db, 1)
+    olvidar_usuario(1)
+    assert not usuario_existe(db, 1)
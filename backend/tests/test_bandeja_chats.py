@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend import models
+from backend.bandeja_chats import cargar_bandeja
+
+
+@pytest.fixture
+def db(db, usuarios):
+    usuarios(1, 2, 3)
+    base = datetime(2025, 1, 1)
+    db.add_all([
+        models.Chat(id_chat=1, id_usuario1=1, id_usuario2=2, ultima_actividad=base),
+        models.Chat(id_chat=2, id_usuario1=3, id_usuario2=1, ultima_actividad=base + timedelta(hours=1),
+                    color_burbuja_usuario2="#000000"),
+        models.Mensaje(id_chat=1, id_emisor=2, contenido="a", fecha_envio=base),
+        models.Mensaje(id_chat=1, id_emisor=2, contenido="b", fecha_envio=base + timedelta(minutes=1)),
+        models.Mensaje(id_chat=1, id_emisor=1, contenido="c", fecha_envio=base + timedelta(minutes=2)),
+    ])
+    db.commit()
+    return db
+
+def test_bandeja_en_orden_con_ultimo_mensaje_y_no_leidos(db):
+    chats, siguiente = cargar_bandeja(db, 1)
+    assert siguiente is None
+    assert [(c["id"], c["username"], c["lastMessage"], c["no_leidos"]) for c in chats] == [
+        (2, "u3", "Iniciar conversación", 0),
+        (1, "u2", "c", 2),
+    ]
+    assert chats[0]["color"] == "#000000"
+
+def test_bandeja_paginada(db):
+    pagina, siguiente = cargar_bandeja(db, 1, limite=1)
+    assert [c["id"] for c in pagina] == [2]
+    pagina, siguiente = cargar_bandeja(db, 1, cursor=siguiente, limite=1)
+    assert [c["id"] for c in pagina] == [1] and siguiente is None
+
+def test_chats_sin_fechas_paginan_al_final(db):
+    db.add_all([models.Chat(id_chat=3, id_usuario1=1, id_usuario2=2), models.Chat(id_chat=4, id_usuario1=1, id_usuario2=3)])
+    db.commit()
+    db.query(models.Chat).filter(models.Chat.id_chat.in_([3, 4])).update(
+        {models.Chat.ultima_actividad: None, models.Chat.fecha_creacion: None}, synchronize_session=False
+    )
+    db.commit()
+
+    ids, siguiente = [], None
+    while True:
+        pagina, siguiente = cargar_bandeja(db, 1, cursor=siguiente, limite=1)
+        ids += [c["id"] for c in pagina]
+        if siguiente is None:
+            break
+    assert ids == [2, 1, 4, 3]
+    assert cargar_bandeja(db, 1)[0][-1]["ultima_actividad"] is None
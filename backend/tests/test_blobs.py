@@ -0,0 +1,90 @@
+import asyncio
+import io
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import UploadFile
+
+from backend import blobs, models
+from backend.blobs import _ruta_final, guardar_blob, limpiar_blobs, reconciliar_referencias
+
+
+@pytest.fixture
+def db(db, usuarios):
+    usuarios(1)
+    return db
+
+def _guardar(db, contenido):
+    archivo = UploadFile(io.BytesIO(contenido), filename="foto.jpg")
+    return asyncio.run(guardar_blob(db, archivo, "jpg", 1024))
+
+def _archivo(db, ruta):
+    archivo = models.GaleriaArchivo(
+        id_usuario=1, nombre_original="foto.jpg", nombre_archivo=os.path.basename(ruta), tipo="imagen",
+        extension="jpg", tamano=1, ruta=f"/{ruta}"
+    )
+    db.add(archivo)
+    db.commit()
+    return archivo
+
+def _referencias(db):
+    return {b.ruta: b.referencias for b in db.query(models.Blob)}
+
+def test_deduplica_y_cuenta_referencias(db, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    primero = _guardar(db, b"contenido")
+    segundo = _guardar(db, b"contenido")
+    assert (primero.nuevo, segundo.nuevo) == (True, False)
+    assert primero.ruta == segundo.ruta
+    assert os.listdir(os.path.dirname(primero.ruta)) == [os.path.basename(primero.ruta)]
+    assert os.listdir(blobs.DIRECTORIO_TEMPORAL) == []
+
+    a = _archivo(db, primero.ruta)
+    b = _archivo(db, segundo.ruta)
+    db.add(models.Publicacion(id_usuario=1, contenido="", imagen=f'["http://localhost:8000/{primero.ruta}"]'))
+    db.commit()
+    assert _referencias(db) == {primero.ruta: 3}
+
+    otro = _guardar(db, b"otro contenido")
+    a.ruta = f"/{otro.ruta}"
+    db.delete(b)
+    db.commit()
+    assert _referencias(db) == {primero.ruta: 1, otro.ruta: 1}
+
+    # Un cambio que no pasa por el ORM se corrige al reconciliar
+    db.query(models.Publicacion).delete()
+    db.commit()
+    assert reconciliar_referencias(db) == 1
+    assert _referencias(db) == {primero.ruta: 0, otro.ruta: 1}
+
+def test_colision_de_hash_no_reutiliza_otro_contenido(db, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    original = _guardar(db, b"contenido")
+    # Otro archivo con el mismo nombre (mismo hash) pero distintos bytes
+    with open(original.ruta, "wb") as f:
+        f.write(b"CONTENIDO")
+
+    otro = _guardar(db, b"contenido")
+    assert otro.nuevo
+    assert otro.ruta != original.ruta
+    assert otro.ruta.startswith(_ruta_final(original.hash_contenido, "jpg")[:-4] + "-")
+    with open(otro.ruta, "rb") as f:
+        assert f.read() == b"contenido"
+
+def test_limpiar_respeta_la_gracia(db, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    sin_uso = _guardar(db, b"sin uso")
+    usado = _guardar(db, b"usado")
+    _archivo(db, usado.ruta)
+
+    assert limpiar_blobs(db) == 0
+    assert os.path.exists(sin_uso.ruta)
+
+    hace_rato = datetime.utcnow() - blobs.GRACIA - timedelta(minutes=1)
+    db.query(models.Blob).update({models.Blob.fecha_ultimo_uso: hace_rato})
+    db.commit()
+    assert limpiar_blobs(db) == 1
+    assert not os.path.exists(sin_uso.ruta)
+    assert os.path.exists(usado.ruta)
+    assert list(_referencias(db)) == [usado.ruta]
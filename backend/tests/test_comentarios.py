@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend import models
+from backend.comentarios import cargar_arbol_comentarios
+
+
+@pytest.fixture
+def db(db, usuarios):
+    usuarios(1, 2)
+    db.add(models.Publicacion(id_publicacion=1, id_usuario=1, contenido="p"))
+    base = datetime(2025, 1, 1)
+    # 1 -> 2 -> 3, y 4 como segundo comentario principal
+    for id_c, padre in ((1, None), (2, 1), (3, 2), (4, None)):
+        db.add(models.Comentario(id_comentario=id_c, id_usuario=1, id_publicacion=1, id_comentario_padre=padre,
+                                 contenido=f"c{id_c}", fecha=base + timedelta(minutes=id_c),
+                                 total_me_gusta=1 if id_c == 3 else 0))
+    db.add(models.MeGustaComentario(id_usuario=2, id_comentario=3))
+    db.commit()
+    return db
+
+def test_arbol_completo_con_me_gusta(db):
+    arbol = cargar_arbol_comentarios(db, 1, 2)
+    assert arbol.total == 4
+    assert [c.id_comentario for c in arbol.comentarios] == [1, 4]
+    nieto = arbol.comentarios[0].respuestas[0].respuestas[0]
+    assert (nieto.id_comentario, nieto.total_me_gusta, nieto.me_gusta_dado) == (3, 1, True)
+
+def test_paginacion_y_profundidad(db):
+    pagina = cargar_arbol_comentarios(db, 1, 1, limite=1, profundidad_maxima=1)
+    respuesta = pagina.comentarios[0].respuestas[0]
+    assert respuesta.respuestas == [] and respuesta.total_respuestas == 1
+    assert pagina.next_cursor
+
+    siguiente = cargar_arbol_comentarios(db, 1, 1, cursor=pagina.next_cursor, limite=1)
+    assert [c.id_comentario for c in siguiente.comentarios] == [4]
+    assert siguiente.next_cursor is None
@@ -0,0 +1,44 @@
+import pytest
+
+from backend import models
+from backend.contadores import (
+    ajustar_publicacion,
+    descontar_usuario,
+    estadisticas_publicaciones,
+    reconciliar_contadores,
+)
+
+
+@pytest.fixture
+def db(db, usuarios):
+    usuarios(1, 2)
+    db.add(models.Publicacion(id_publicacion=1, id_usuario=1, contenido="p"))
+    db.add(models.Comentario(id_comentario=1, id_usuario=2, id_publicacion=1, contenido="c"))
+    db.add(models.MeGusta(id_usuario=2, id_publicacion=1))
+    db.add(models.Guardado(id_usuario=2, id_publicacion=1))
+    db.add(models.MeGustaComentario(id_usuario=1, id_comentario=1))
+    db.commit()
+    return db
+
+def test_reconciliar_desde_tablas_de_origen(db):
+    ajustar_publicacion(db, 1, "total_me_gusta", 5)
+    reconciliar_contadores(db)
+    pub = db.get(models.Publicacion, 1)
+    assert (pub.total_me_gusta, pub.total_comentarios, pub.total_guardados, pub.total_compartidos) == (1, 1, 1, 0)
+    assert db.get(models.Comentario, 1).total_me_gusta == 1
+
+def test_descontar_usuario(db):
+    reconciliar_contadores(db)
+    descontar_usuario(db, 2)
+    db.commit()
+    db.expire_all()
+    pub = db.get(models.Publicacion, 1)
+    assert (pub.total_me_gusta, pub.total_comentarios, pub.total_guardados) == (0, 0, 0)
+
+def test_estadisticas_publicaciones_en_lote(db):
+    reconciliar_contadores(db)
+    estadisticas = estadisticas_publicaciones(db, [1, 99], 2)
+    assert list(estadisticas) == [1]
+    assert estadisticas[1]["total_me_gusta"] == 1
+    assert estadisticas[1]["me_gusta_dado"] and estadisticas[1]["guardado"]
+    assert estadisticas_publicaciones(db, [1], 1)[1]["me_gusta_dado"] is False
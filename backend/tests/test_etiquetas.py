@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+from backend import models
+from backend.etiquetas import (
+    backfill_etiquetas,
+    etiquetas_populares,
+    filtro_categorias,
+    indexar_etiquetas,
+    normalizar_etiqueta,
+    parsear_etiquetas,
+    restar_conteos,
+    sumar_conteos,
+)
+from backend.paginacion import FECHA_SIN_FECHA, codificar_cursor
+
+
+def test_normalizar_etiqueta():
+    assert normalizar_etiqueta("  Danza ") == "danza"
+    assert len(normalizar_etiqueta("x" * 300)) == 100
+
+def test_parsear_etiquetas_json():
+    assert parsear_etiquetas('["Danza", "música", "danza "]') == ["danza", "música"]
+
+def test_parsear_etiquetas_texto_plano_y_vacio():
+    assert parsear_etiquetas("Cine") == ["cine"]
+    assert parsear_etiquetas('"Cine"') == ["cine"]
+    assert parsear_etiquetas(None) == []
+    assert parsear_etiquetas("[]") == []
+
+def test_contadores_por_ventana(db):
+    ahora = datetime.utcnow()
+    sumar_conteos(db, ["danza", "cine"], ahora)
+    sumar_conteos(db, ["danza"], ahora - timedelta(days=3))
+    sumar_conteos(db, ["cine"], ahora - timedelta(days=3))
+    restar_conteos(db, ["cine"], ahora)
+    db.commit()
+
+    assert etiquetas_populares(db, "all") == [{"nombre": "Danza", "cantidad": 2}, {"nombre": "Cine", "cantidad": 1}]
+    assert etiquetas_populares(db, "24h") == [{"nombre": "Danza", "cantidad": 1}]
+    assert etiquetas_populares(db, "7d", limite=1) == [{"nombre": "Danza", "cantidad": 2}]
+
+def test_filtro_categorias_con_cursor(db):
+    base = datetime(2025, 1, 1)
+    for i in range(1, 5):
+        publicacion = models.Publicacion(
+            id_publicacion=i, contenido="p", etiquetas='["Tango danza"]' if i != 3 else '["Cine"]',
+            fecha_creacion=base + timedelta(hours=i)
+        )
+        db.add(publicacion)
+        db.flush()
+        indexar_etiquetas(db, publicacion)
+    db.commit()
+
+    cursor = codificar_cursor(base + timedelta(hours=4), 4)
+    ids = db.query(models.Publicacion.id_publicacion).filter(filtro_categorias(["danza"], cursor))
+    assert sorted(i for (i,) in ids) == [1, 2]
+
+def test_backfill_con_publicaciones_sin_fecha(db):
+    db.add_all([
+        models.Publicacion(id_publicacion=1, contenido="p", etiquetas='["Danza"]'),
+        models.Publicacion(id_publicacion=2, contenido="p", etiquetas='["Cine"]'),
+    ])
+    db.commit()
+    db.query(models.Publicacion).filter_by(id_publicacion=1).update({"fecha_creacion": None})
+    db.commit()
+
+    assert backfill_etiquetas(db) == 2
+    fechas = dict(db.query(models.PublicacionEtiqueta.etiqueta, models.PublicacionEtiqueta.fecha_creacion))
+    assert fechas["danza"] == FECHA_SIN_FECHA
+    assert fechas["cine"] != FECHA_SIN_FECHA
@@ -0,0 +1,30 @@
+import pytest
+
+from backend import models
+from backend.exclusiones import filtrar_publicaciones, filtrar_usuarios
+
+
+@pytest.fixture
+def db(db, usuarios):
+    usuarios(1, 2, 3)
+    for i in (1, 2, 3):
+        db.add(models.Publicacion(id_publicacion=i, id_usuario=i, contenido=f"p{i}"))
+    db.commit()
+    return db
+
+def test_bloqueo_rige_en_la_siguiente_consulta(db):
+    usuarios = lambda: [u.id_usuario for u in filtrar_usuarios(db.query(models.Usuario), models.Usuario.id_usuario, 1)]
+    assert usuarios() == [1, 2, 3]
+
+    db.add(models.BloqueoUsuario(id_bloqueador=1, id_bloqueado=2))
+    db.add(models.BloqueoUsuario(id_bloqueador=3, id_bloqueado=1))
+    db.commit()
+    assert usuarios() == [1]
+
+def test_filtrar_publicaciones(db):
+    db.add(models.BloqueoUsuario(id_bloqueador=2, id_bloqueado=1))
+    db.add(models.NoMeInteresa(id_usuario=1, id_publicacion=3))
+    db.commit()
+
+    visibles = filtrar_publicaciones(db.query(models.Publicacion), 1).all()
+    assert [p.id_publicacion for p in visibles] == [1]
@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend import models
+from backend.historial_chat import cargar_pagina_mensajes
+
+
+@pytest.fixture
+def db(db, usuarios):
+    usuarios(1, 2)
+    db.add(models.Chat(id_chat=1, id_usuario1=1, id_usuario2=2))
+    base = datetime(2025, 1, 1)
+    for i in range(1, 6):
+        # Los mensajes 2 y 3 comparten fecha: el desempate es id_mensaje
+        db.add(models.Mensaje(id_mensaje=i, id_chat=1, id_emisor=1 + i % 2, contenido=f"m{i}",
+                              fecha_envio=base + timedelta(minutes=min(i, 3) if i <= 3 else i)))
+    db.add(models.MensajeEliminado(id_mensaje=4, id_usuario=1))
+    db.commit()
+    return db
+
+def test_paginas_hacia_atras_y_adelante(db):
+    ultimos = cargar_pagina_mensajes(db, 1, 1, limite=2)
+    assert [m["id"] for m in ultimos["mensajes"]] == [3, 5]
+
+    anteriores = cargar_pagina_mensajes(db, 1, 1, limite=2, before=ultimos["before"])
+    assert [m["id"] for m in anteriores["mensajes"]] == [1, 2]
+    assert anteriores["before"] is None
+
+    nuevos = cargar_pagina_mensajes(db, 1, 1, limite=5, after=anteriores["after"])
+    assert [m["id"] for m in nuevos["mensajes"]] == [3, 5]
+    assert nuevos["hay_mas_recientes"] is False
+    assert nuevos["mensajes"][0]["sender_username"] == "u2"
@@ -0,0 +1,53 @@
+# FileResponse importa anyio._core._fileio la primera vez que envía un archivo, desde el
+# hilo del TestClient; en ese hilo la reescritura de asserts de pytest puede fallar en 3.11
+import anyio._core._fileio  # noqa: F401
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.testclient import TestClient
+
+from backend import medios
+from backend.medios import CACHE_INMUTABLE, CACHE_REVALIDAR, ArchivosMedia
+
+HASH = "f5a9499a9182764d823711f9c1ec3d17"
+
+
+def _client(tmp_path):
+    (tmp_path / "blobs" / "f5").mkdir(parents=True)
+    (tmp_path / "blobs" / "f5" / f"{HASH}.mp4").write_bytes(bytes(range(256)) * 4)
+    (tmp_path / "perfiles").mkdir()
+    (tmp_path / "perfiles" / "logo.png").write_bytes(b"png")
+    app = Starlette(routes=[Mount("/static", ArchivosMedia(directory=str(tmp_path)))])
+    return TestClient(app)
+
+def test_blob_inmutable_con_etag_y_rangos(tmp_path):
+    client = _client(tmp_path)
+    url = f"/static/blobs/f5/{HASH}.mp4"
+
+    r = client.get(url)
+    assert r.status_code == 200
+    assert r.headers["cache-control"] == CACHE_INMUTABLE
+    assert r.headers["etag"] == f'"{HASH}"'
+
+    r = client.get(url, headers={"If-None-Match": f'W/"otro", "{HASH}"'})
+    assert (r.status_code, r.content) == (304, b"")
+
+    # If-None-Match que no coincide manda sobre If-Modified-Since
+    r = client.get(url, headers={"If-None-Match": '"otro"', "If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"})
+    assert r.status_code == 200
+
+    r = client.get(url, headers={"Range": "bytes=10-19"})
+    assert r.status_code == 206
+    assert r.headers["content-range"] == "bytes 10-19/1024"
+    assert r.content == bytes(range(10, 20))
+
+def test_nombres_no_unicos_se_revalidan(tmp_path):
+    r = _client(tmp_path).get("/static/perfiles/logo.png")
+    assert r.headers["cache-control"] == CACHE_REVALIDAR
+    assert r.headers["etag"] != f'"{HASH}"'
+
+def test_x_accel_redirect(tmp_path, monkeypatch):
+    monkeypatch.setattr(medios.settings, "MEDIOS_X_ACCEL_REDIRECT", "/_medios/")
+    r = _client(tmp_path).get(f"/static/blobs/f5/{HASH}.mp4")
+    assert r.headers["x-accel-redirect"] == f"/_medios/blobs/f5/{HASH}.mp4"
+    assert r.headers["cache-control"] == CACHE_INMUTABLE
+    assert r.content == b""
@@ -0,0 +1,86 @@
+import pytest
+
+from backend import models
+from backend.cola_notificaciones import NotificacionPendiente, procesar_lote
+from backend.notificaciones import cargar_notificaciones, contar_no_leidas, marcar_leidas, reconciliar_no_leidas
+
+
+@pytest.fixture
+def db(db, usuarios):
+    usuarios(1, 2, 3)
+    return db
+
+def _notificar(db, leido=False):
+    n = models.Notificacion(id_usuario=1, tipo="me_gusta", mensaje="m", leido=leido)
+    db.add(n)
+    db.commit()
+    return n
+
+def test_contador_sigue_inserciones_y_borrados(db):
+    primera = _notificar(db)
+    _notificar(db)
+    _notificar(db, leido=True)
+    assert contar_no_leidas(db, 1) == 2
+
+    db.delete(primera)
+    db.commit()
+    assert contar_no_leidas(db, 1) == 1
+
+def test_marcar_leidas_y_reconciliar(db):
+    _notificar(db)
+    _notificar(db)
+    assert marcar_leidas(db, 1) == 2
+    assert contar_no_leidas(db, 1) == 0
+
+    _notificar(db)
+    db.query(models.Usuario).update({"notificaciones_no_leidas": 7})
+    reconciliar_no_leidas(db)
+    assert contar_no_leidas(db, 1) == 1
+
+def test_paginar_y_marcar_hasta_cursor(db):
+    for _ in range(5):
+        _notificar(db)
+    primera = cargar_notificaciones(db, 1, None, 2)
+    segunda = cargar_notificaciones(db, 1, primera["next_cursor"], 2)
+    ids = [n["id_notificacion"] for n in primera["notificaciones"] + segunda["notificaciones"]]
+    assert ids == [5, 4, 3, 2]
+
+    # Sólo lo que el cliente vio en la segunda página y anteriores
+    assert marcar_leidas(db, 1, hasta=segunda["cursor_reciente"]) == 3
+    assert contar_no_leidas(db, 1) == 2
+
+def test_lote_agrupa_me_gusta_repetidos(db):
+    me_gusta = lambda actor: NotificacionPendiente(1, "me_gusta", "A {actor} le gusta tu publicación", actor, 10)
+    procesar_lote(db, [me_gusta(2)])
+    assert db.query(models.Notificacion).one().mensaje == "A u2 le gusta tu publicación"
+
+    procesar_lote(db, [
+        me_gusta(3),
+        NotificacionPendiente(1, "comentario", "{actor} comentó tu publicación", 3, 99),
+    ])
+    agrupada = db.query(models.Notificacion).filter_by(tipo="me_gusta").one()
+    assert (agrupada.mensaje, agrupada.total_actores) == ("A u3 y 1 persona más les gusta tu publicación", 2)
+    assert contar_no_leidas(db, 1) == 2
+
+    # El mismo usuario otra vez (quitó y volvió a dar me gusta), en este lote o en otro: no es otra persona
+    procesar_lote(db, [me_gusta(2), me_gusta(2)])
+    procesar_lote(db, [me_gusta(3)])
+    db.refresh(agrupada)
+    assert (agrupada.mensaje, agrupada.total_actores) == ("A u3 y 1 persona más les gusta tu publicación", 2)
+
+def test_notificaciones_sin_fecha_paginan_al_final(db):
+    for _ in range(4):
+        _notificar(db)
+    db.query(models.Notificacion).filter(models.Notificacion.id_notificacion.in_([1, 3])).update({"fecha": None})
+    db.commit()
+
+    ids, cursor = [], None
+    while True:
+        pagina = cargar_notificaciones(db, 1, cursor, 1)
+        ids += [n["id_notificacion"] for n in pagina["notificaciones"]]
+        cursor = pagina["next_cursor"]
+        if cursor is None:
+            break
+    assert ids == [4, 2, 3, 1]
+
+    assert marcar_leidas(db, 1, hasta=pagina["cursor_reciente"]) == 1
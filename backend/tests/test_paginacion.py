@@ -0,0 +1,70 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from backend import models
+from backend.paginacion import (
+    FECHA_SIN_FECHA,
+    codificar_cursor,
+    decodificar_cursor,
+    cortar_pagina,
+    fecha_orden,
+    filtro_anteriores,
+    normalizar_limite,
+)
+
+
+def test_cursor_ida_y_vuelta():
+    fecha = datetime(2025, 3, 1, 12, 30, 15, 123456)
+    cursor = codificar_cursor(fecha, 42)
+    assert "=" not in cursor
+    assert decodificar_cursor(cursor) == (fecha, 42)
+
+def test_cursor_invalido():
+    with pytest.raises(HTTPException) as exc:
+        decodificar_cursor("no-es-un-cursor")
+    assert exc.value.status_code == 400
+
+def test_normalizar_limite():
+    assert normalizar_limite(None) == 20
+    assert normalizar_limite(0) == 20
+    assert normalizar_limite(-5) == 1
+    assert normalizar_limite(500) == 100
+    assert normalizar_limite(10, maximo=5) == 5
+
+def test_cortar_pagina():
+    filas = [(datetime(2025, 1, d), d) for d in (5, 4, 3)]
+    pagina, siguiente = cortar_pagina(filas, 2, lambda f: f[0], lambda f: f[1])
+    assert pagina == filas[:2]
+    assert decodificar_cursor(siguiente) == (datetime(2025, 1, 4), 4)
+
+    pagina, siguiente = cortar_pagina(filas, 3, lambda f: f[0], lambda f: f[1])
+    assert pagina == filas
+    assert siguiente is None
+
+def test_fechas_nulas_paginan_al_final(db, usuarios):
+    usuarios(1)
+    for i, fecha in enumerate([datetime(2025, 1, 2), None, datetime(2025, 1, 1), None], start=1):
+        db.add(models.Publicacion(id_publicacion=i, id_usuario=1, contenido="", fecha_creacion=fecha))
+    db.commit()
+    # El modelo completa la fecha al insertar; las filas antiguas sin fecha se simulan con un UPDATE
+    db.query(models.Publicacion).filter(models.Publicacion.id_publicacion.in_([2, 4])).update(
+        {models.Publicacion.fecha_creacion: None}
+    )
+    db.commit()
+
+    fecha = fecha_orden(models.Publicacion.fecha_creacion)
+    vistos, cursor = [], None
+    while True:
+        query = db.query(models.Publicacion)
+        if cursor:
+            query = query.filter(filtro_anteriores(fecha, models.Publicacion.id_publicacion, cursor))
+        filas = query.order_by(fecha.desc(), models.Publicacion.id_publicacion.desc()).limit(2).all()
+        pagina, cursor = cortar_pagina(
+            filas, 1, lambda p: p.fecha_creacion or FECHA_SIN_FECHA, lambda p: p.id_publicacion
+        )
+        vistos += [p.id_publicacion for p in pagina]
+        if cursor is None:
+            break
+    assert vistos == [1, 3, 4, 2]
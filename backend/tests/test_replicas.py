@@ -0,0 +1,33 @@
+from sqlalchemy import create_engine
+
+from backend.replicas import EnrutadorLecturas, Replica
+
+
+class MotorCaido:
+    url = create_engine("sqlite://").url
+
+    def connect(self):
+        raise OSError("conexión rechazada")
+
+
+def test_round_robin_entre_replicas_sanas():
+    a, b = create_engine("sqlite://"), create_engine("sqlite://")
+    enrutador = EnrutadorLecturas([Replica(a), Replica(b)], retraso_maximo=5)
+    enrutador.revisar()
+    assert {enrutador.motor_lectura(), enrutador.motor_lectura()} == {a, b}
+
+def test_replica_caida_y_leer_lo_propio():
+    sana = create_engine("sqlite://")
+    enrutador = EnrutadorLecturas([Replica(MotorCaido()), Replica(sana)], retraso_maximo=5)
+    enrutador.revisar()
+    assert [enrutador.motor_lectura(1) for _ in range(3)] == [sana] * 3
+
+    # Tras escribir, el usuario lee del primario (None); los demás siguen en la réplica
+    enrutador.registrar_escritura(1)
+    assert enrutador.motor_lectura(1) is None
+    assert enrutador.motor_lectura(2) is sana
+
+def test_sin_replicas_sanas_usa_el_primario():
+    enrutador = EnrutadorLecturas([Replica(MotorCaido())], retraso_maximo=5)
+    enrutador.revisar()
+    assert enrutador.motor_lectura() is None
@@ -0,0 +1,45 @@
+import os
+
+from PIL import Image
+
+from backend import models
+from backend.resolucion_imagen import PREFIJO, rellenar_resoluciones, resolucion_imagen
+
+
+def test_formatos(tmp_path):
+    for formato, extension in [("JPEG", "jpg"), ("PNG", "png"), ("GIF", "gif"), ("BMP", "bmp")]:
+        ruta = tmp_path / f"foto.{extension}"
+        Image.new("RGB", (321, 123)).save(ruta, formato)
+        assert resolucion_imagen(str(ruta)) == "321x123", formato
+
+    for opciones in ({"lossless": False}, {"lossless": True}):
+        ruta = tmp_path / "foto.webp"
+        Image.new("RGB", (321, 123)).save(ruta, "WEBP", **opciones)
+        assert resolucion_imagen(str(ruta)) == "321x123"
+    Image.new("RGBA", (321, 123)).save(ruta, "WEBP", exif=b"Exif\x00\x00")
+    assert resolucion_imagen(str(ruta)) == "321x123"
+
+    (tmp_path / "nota.txt").write_bytes(b"hola")
+    assert resolucion_imagen(str(tmp_path / "nota.txt")) is None
+    assert resolucion_imagen(str(tmp_path / "no_existe.jpg")) is None
+
+def test_jpeg_con_metadatos_mas_alla_del_prefijo(tmp_path):
+    ruta = tmp_path / "foto.jpg"
+    Image.new("RGB", (50, 40)).save(ruta, "JPEG", icc_profile=os.urandom(3 * PREFIJO))
+    assert resolucion_imagen(str(ruta)) == "50x40"
+
+def test_rellenar_resoluciones(db, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("static/blobs")
+    Image.new("RGB", (10, 20)).save("static/blobs/a.png")
+
+    for ruta in ["/static/blobs/a.png", "/static/blobs/falta.png", "/static/blobs/a.png"]:
+        db.add(models.GaleriaArchivo(
+            nombre_original="a.png", nombre_archivo="a.png", tipo="imagen", extension="png", tamano=1, ruta=ruta
+        ))
+    db.commit()
+
+    assert rellenar_resoluciones(db, lote=2, hilos=2) == 2
+    assert [a.resolucion for a in db.query(models.GaleriaArchivo).order_by(models.GaleriaArchivo.id_archivo)] == [
+        "10x20", None, "10x20"
+    ]
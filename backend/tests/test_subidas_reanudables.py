@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+import xxhash
+from fastapi import HTTPException
+from starlette.requests import ClientDisconnect
+
+from backend import models, subidas_reanudables
+from backend.subidas_reanudables import completar_subida, crear_subida, escribir_parte
+
+
+@pytest.fixture
+def db(db, usuarios, tmp_path, monkeypatch):
+    monkeypatch.setattr(subidas_reanudables, "DIRECTORIO_SUBIDAS", str(tmp_path / "pendientes"))
+    usuarios(1)
+    db.add(models.GaleriaCarpeta(id_carpeta=1, id_usuario=1, nombre="c"))
+    db.commit()
+    return db
+
+def _subida(db, tamano):
+    return asyncio.run(crear_subida(db, models.GaleriaSubida(
+        id_subida="s1", id_usuario=1, id_carpeta=1, nombre_original="v.mp4", tamano_total=tamano, recibidos=0
+    )))
+
+async def _partes(*bloques, cortar=False):
+    for bloque in bloques:
+        yield bloque
+    if cortar:
+        raise ClientDisconnect()
+
+def test_reanuda_despues_de_un_corte(db, tmp_path):
+    datos = b"abcdefghij" * 10
+    subida = _subida(db, len(datos))
+
+    with pytest.raises(ClientDisconnect):
+        asyncio.run(escribir_parte(db, subida, 0, _partes(datos[:30], datos[30:45], cortar=True)))
+    assert subida.recibidos == 45
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(escribir_parte(db, subida, 0, _partes(datos)))
+    assert error.value.status_code == 409
+
+    assert asyncio.run(escribir_parte(db, subida, 45, _partes(datos[45:]))) == len(datos)
+    guardado = asyncio.run(completar_subida(subida, str(tmp_path / "final.mp4")))
+    assert open(guardado.ruta, "rb").read() == datos
+    assert guardado.hash_contenido == xxhash.xxh3_128(datos).hexdigest()
+
+def test_rechaza_bytes_de_mas_y_completar_antes_de_tiempo(db, tmp_path):
+    subida = _subida(db, 10)
+    asyncio.run(escribir_parte(db, subida, 0, _partes(b"12345")))
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(escribir_parte(db, subida, 5, _partes(b"678901")))
+    assert error.value.status_code == 400
+    assert subida.recibidos == 5
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(completar_subida(subida, str(tmp_path / "final.mp4")))
+    assert error.value.status_code == 409
@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend import models
+from backend.sugerencias import refrescar_puntuaciones, refrescar_si_vencido, sugerir_por_amigos, sugerir_populares
+
+
+@pytest.fixture
+def db(db, usuarios):
+    usuarios(1, 2, 3, 4, 5, 6)
+    # 1 es el usuario actual; 2 y 3 son sus amigos; 4 ya lo sigue; 6 está bloqueado
+    db.add_all([
+        models.Publicacion(id_usuario=4, contenido="p", total_me_gusta=9),
+        models.Publicacion(id_usuario=5, contenido="p", total_me_gusta=3),
+        models.Publicacion(id_usuario=5, contenido="p", total_me_gusta=2),
+        models.Publicacion(id_usuario=6, contenido="p", total_me_gusta=50),
+        models.Amistad(id_usuario1=1, id_usuario2=2, estado="aceptada"),
+        models.Amistad(id_usuario1=3, id_usuario2=1, estado="aceptada"),
+        models.SeguirUsuario(id_seguidor=1, id_seguido=4),
+        models.SeguirUsuario(id_seguidor=2, id_seguido=5),
+        models.SeguirUsuario(id_seguidor=3, id_seguido=5),
+        models.SeguirUsuario(id_seguidor=2, id_seguido=4),
+        models.BloqueoUsuario(id_bloqueador=1, id_bloqueado=6),
+    ])
+    db.commit()
+    return db
+
+def test_populares_desde_tabla_materializada(db):
+    refrescar_puntuaciones(db)
+    populares = sugerir_populares(db, 1, 5)
+    assert [p["id_usuario"] for p in populares] == [5]
+    assert populares[0]["estadisticas"] == {"likes_totales": 5, "seguidores": 2, "publicaciones": 2}
+
+def test_amigos_de_amigos_excluye_seguidos(db):
+    sugeridos = sugerir_por_amigos(db, 1, 5)
+    assert [(s["id_usuario"], s["amigos_en_comun"]) for s in sugeridos] == [(5, 2)]
+
+def test_refresca_solo_si_la_tabla_vencio(db):
+    with db.get_bind().connect() as conexion:
+        assert refrescar_si_vencido(conexion)
+        assert not refrescar_si_vencido(conexion)
+
+    db.query(models.PuntuacionUsuario).update({"actualizado": datetime.utcnow() - timedelta(hours=1)})
+    db.commit()
+    with db.get_bind().connect() as conexion:
+        assert refrescar_si_vencido(conexion)
+    assert db.query(models.PuntuacionUsuario).filter(
+        models.PuntuacionUsuario.actualizado < datetime.utcnow() - timedelta(minutes=1)
+    ).count() == 0
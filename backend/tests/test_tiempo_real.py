@@ -0,0 +1,84 @@
+import asyncio
+
+import fakeredis
+
+from backend import tiempo_real
+from backend.tiempo_real import DifusionMemoria, DifusionRedis, RegistroConexiones, crear_evento
+
+
+class ReceptorPrueba:
+    def __init__(self):
+        self.eventos = []
+
+    async def enviar(self, evento):
+        self.eventos.append(evento)
+
+
+class ReceptorCerrado:
+    async def enviar(self, evento):
+        raise RuntimeError("conexión cerrada")
+
+
+def test_difusion_memoria_descarta_conexiones_cerradas():
+    async def escenario():
+        registro = RegistroConexiones()
+        receptor = ReceptorPrueba()
+        registro.agregar(1, receptor)
+        registro.agregar(1, ReceptorCerrado())
+        await DifusionMemoria(registro).publicar([1, 2], crear_evento("ping"))
+        return receptor.eventos, registro.conectados(1)
+
+    eventos, conectados = asyncio.run(escenario())
+    assert eventos == [{"tipo": "ping"}]
+    assert conectados == 1
+
+def test_difusion_redis_entre_workers():
+    async def escenario():
+        servidor = fakeredis.FakeServer()
+        # Dos "workers": cada uno con su registro y su cliente, mismo Redis
+        registro_a, registro_b = RegistroConexiones(), RegistroConexiones()
+        worker_a = DifusionRedis(registro_a, fakeredis.FakeAsyncRedis(server=servidor, decode_responses=True))
+        worker_b = DifusionRedis(registro_b, fakeredis.FakeAsyncRedis(server=servidor, decode_responses=True))
+        receptor = ReceptorPrueba()
+        registro_b.agregar(7, receptor)
+        await worker_a.iniciar()
+        await worker_b.iniciar()
+
+        await worker_a.publicar([7], crear_evento("mensaje_nuevo", id_chat=3))
+        for _ in range(50):
+            if receptor.eventos:
+                break
+            await asyncio.sleep(0.02)
+
+        await worker_a.detener()
+        await worker_b.detener()
+        return receptor.eventos
+
+    assert asyncio.run(escenario()) == [{"tipo": "mensaje_nuevo", "id_chat": 3}]
+
+def test_difusion_redis_se_resuscribe(monkeypatch):
+    monkeypatch.setattr(tiempo_real, "ESPERA_RECONEXION", 0.01)
+
+    async def escenario():
+        servidor = fakeredis.FakeServer()
+        registro = RegistroConexiones()
+        worker = DifusionRedis(registro, fakeredis.FakeAsyncRedis(server=servidor, decode_responses=True))
+        receptor = ReceptorPrueba()
+        registro.agregar(7, receptor)
+        await worker.iniciar()
+
+        # Se cae la conexión: la tarea de escucha no muere, reintenta
+        servidor.connected = False
+        await asyncio.sleep(0.1)
+        assert not worker._tarea.done()
+        servidor.connected = True
+
+        for _ in range(100):
+            await worker.publicar([7], crear_evento("ping"))
+            if receptor.eventos:
+                break
+            await asyncio.sleep(0.02)
+        await worker.detener()
+        return receptor.eventos[:1]
+
+    assert asyncio.run(escenario()) == [{"tipo": "ping"}]
@@ -0,0 +1,74 @@
+from datetime import datetime
+
+import pytest
+
+from backend import models, trabajos_video
+from backend.trabajos_video import (
+    TIEMPO_MAXIMO_TRABAJO, ErrorVideo, crear_trabajos_faltantes, devolver_huerfanos, encolar_video, procesar_trabajo
+)
+
+
+@pytest.fixture
+def db(db, usuarios):
+    usuarios(1)
+    return db
+
+def _video(db, nombre):
+    ruta = f"/static/galeria/videos/{nombre}"
+    archivo = models.GaleriaArchivo(
+        id_usuario=1, nombre_original=nombre, nombre_archivo=nombre, tipo="video", extension="mp4",
+        tamano=1, ruta=ruta, miniatura=ruta
+    )
+    db.add(archivo)
+    db.commit()
+    return archivo
+
+def test_completa_el_archivo_de_galeria(db, monkeypatch):
+    monkeypatch.setattr(trabajos_video, "analizar_video", lambda ruta: (12, "1920x1080"))
+    monkeypatch.setattr(trabajos_video, "generar_poster", lambda ruta, destino, duracion: None)
+    archivo = _video(db, "a.mp4")
+    trabajo = encolar_video(db, 1, archivo.ruta, archivo.id_archivo)
+    assert trabajo.estado == "pendiente"
+
+    assert procesar_trabajo(db, trabajo.id_trabajo).estado == "terminado"
+    db.refresh(archivo)
+    assert (archivo.duracion, archivo.resolucion) == (12, "1920x1080")
+    assert archivo.miniatura == "/static/galeria/miniaturas/a.jpg"
+
+    # Ya tomado: no se procesa de nuevo
+    assert procesar_trabajo(db, trabajo.id_trabajo) is None
+
+def test_error_queda_registrado(db, monkeypatch):
+    def fallar(ruta):
+        raise ErrorVideo("ffprobe no está instalado")
+    monkeypatch.setattr(trabajos_video, "analizar_video", fallar)
+    trabajo = encolar_video(db, 1, "/static/videos/b.mp4")
+
+    procesado = procesar_trabajo(db, trabajo.id_trabajo)
+    assert (procesado.estado, procesado.error) == ("error", "ffprobe no está instalado")
+
+def test_crear_trabajos_faltantes(db):
+    con_trabajo = _video(db, "a.mp4")
+    _video(db, "b.mp4")
+    encolar_video(db, 1, con_trabajo.ruta, con_trabajo.id_archivo)
+    db.add(models.Publicacion(id_usuario=1, contenido="", imagen="http://localhost:8000/static/videos/c.mp4", tipo_medio="video"))
+    db.commit()
+
+    assert crear_trabajos_faltantes(db) == 2
+    assert crear_trabajos_faltantes(db) == 0
+    assert {t.ruta_original for t in db.query(models.TrabajoVideo)} == {
+        "/static/galeria/videos/a.mp4", "/static/galeria/videos/b.mp4", "/static/videos/c.mp4"
+    }
+
+def test_solo_devuelve_trabajos_huerfanos(db):
+    en_curso = encolar_video(db, 1, "/static/videos/a.mp4")
+    huerfano = encolar_video(db, 1, "/static/videos/b.mp4")
+    for trabajo in (en_curso, huerfano):
+        assert trabajos_video._tomar(db, trabajo.id_trabajo).tomado_por
+    huerfano.fecha_toma = datetime.utcnow() - TIEMPO_MAXIMO_TRABAJO
+    db.commit()
+
+    assert devolver_huerfanos(db) == 1
+    db.refresh(en_curso)
+    db.refresh(huerfano)
+    assert (en_curso.estado, huerfano.estado) == ("procesando", "pendiente")
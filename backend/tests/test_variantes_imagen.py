@@ -0,0 +1,50 @@
+from PIL import Image
+
+from backend import models, variantes_imagen
+from backend.variantes_imagen import generar_variantes, registrar_variantes, variantes_por_original
+
+
+def test_no_agranda_mas_alla_del_original(tmp_path):
+    origen = tmp_path / "foto.png"
+    Image.new("RGBA", (1500, 600), (10, 20, 30, 128)).save(origen)
+
+    variantes = generar_variantes(str(origen), str(tmp_path / "variantes"))
+
+    assert [(v.tamano, v.formato) for v in variantes] == [
+        ("miniatura", "webp"), ("miniatura", "jpeg"),
+        ("media", "webp"), ("media", "jpeg"),
+        ("completa", "webp"), ("completa", "jpeg"),
+    ]
+    assert {(v.ancho, v.alto) for v in variantes if v.tamano == "completa"} == {(1500, 600)}
+    assert {(v.ancho, v.alto) for v in variantes if v.tamano == "miniatura"} == {(320, 128)}
+
+def test_registrar_actualiza_miniatura_de_galeria(db, tmp_path):
+    origen = tmp_path / "foto.jpg"
+    Image.new("RGB", (200, 100)).save(origen)
+    variantes = generar_variantes(str(origen), str(tmp_path / "variantes"))
+    assert {v.tamano for v in variantes} == {"miniatura"}
+
+    ruta = "/static/galeria/imagenes/foto.jpg"
+    db.add(models.GaleriaArchivo(
+        nombre_original="foto.jpg", nombre_archivo="foto.jpg", tipo="imagen", extension="jpg",
+        tamano=1, ruta=ruta, miniatura=ruta
+    ))
+    db.commit()
+
+    registrar_variantes(db, f"http://localhost:8000{ruta}", variantes)
+
+    assert db.query(models.GaleriaArchivo).one().miniatura.endswith("foto_miniatura.webp")
+    encontradas = variantes_por_original(db, [ruta, None])
+    assert set(encontradas[ruta]["miniatura"]) == {"webp", "jpeg"}
+
+def test_iniciar_levanta_el_pool():
+    variantes_imagen.iniciar()
+    try:
+        assert variantes_imagen._pool.submit(abs, -3).result(timeout=60) == 3
+    finally:
+        variantes_imagen.detener()
+    assert variantes_imagen._pool is None
+
+def test_windows_usa_spawn(monkeypatch):
+    monkeypatch.setattr(variantes_imagen.sys, "platform", "win32")
+    assert variantes_imagen._contexto_procesos().get_start_method() == "spawn"
@@ -0,0 +1,227 @@
+# backend/tiempo_real.py
+"""
+Entrega de eventos en tiempo real a usuarios conectados.
+
+- RegistroConexiones: conexiones abiertas en este proceso, por id de usuario.
+- Difusión: cómo llega un evento al proceso que tiene la conexión del destinatario.
+  DifusionMemoria entrega directo (un solo proceso); DifusionRedis publica en un
+  canal de Redis pub/sub y cada worker entrega a sus propias conexiones.
+
+Se usa Redis si está configurado REDIS_URL; si no, la difusión en memoria.
+Los endpoints publican con BackgroundTasks:
+    background_tasks.add_task(difusion.publicar, [id_1, id_2], crear_evento("mensaje_nuevo", ...))
+y el código que corre fuera del event loop (p. ej. hooks de SQLAlchemy) con
+publicar_desde_hilo.
+"""
+import asyncio
+import json
+from collections import defaultdict
+from typing import Dict, FrozenSet, Iterable, Optional, Set
+
+from fastapi import WebSocket
+from fastapi.encoders import jsonable_encoder
+
+from backend.config import settings
+
+CANAL_EVENTOS = "artenity:eventos"
+# Espera entre reintentos de suscripción si se cae la conexión a Redis (se duplica hasta el máximo)
+ESPERA_RECONEXION = 1.0
+ESPERA_RECONEXION_MAXIMA = 30.0
+
+# Tipos de evento que recibe cada canal
+TIPOS_CHAT = frozenset({"mensaje_nuevo", "mensajes_leidos", "mensaje_eliminado"})
+TIPOS_NOTIFICACION = frozenset({"notificacion", "notificaciones_leidas"})
+
+# Eventos pendientes por conexión SSE antes de empezar a descartar
+MAXIMO_EN_COLA = 100
+
+
+def crear_evento(tipo: str, **datos) -> dict:
+    """Evento listo para serializar a JSON (fechas como ISO 8601)"""
+    return jsonable_encoder({"tipo": tipo, **datos})
+
+
+class ReceptorWebSocket:
+    def __init__(self, websocket: WebSocket, tipos: Optional[FrozenSet[str]] = None):
+        self.websocket = websocket
+        self.tipos = tipos
+
+    async def enviar(self, evento: dict) -> None:
+        await self.websocket.send_json(evento)
+
+
+class ReceptorCola:
+    """Receptor para respuestas en streaming (SSE): los eventos se leen de self.cola"""
+
+    def __init__(self, tipos: Optional[FrozenSet[str]] = None):
+        self.cola: asyncio.Queue = asyncio.Queue(maxsize=MAXIMO_EN_COLA)
+        self.tipos = tipos
+
+    async def enviar(self, evento: dict) -> None:
+        try:
+            self.cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            # Cliente lento: se pierde el evento, no la conexión
+            pass
+
+
+class RegistroConexiones:
+    """Receptores abiertos en este proceso; un usuario puede tener varios (pestañas, dispositivos)"""
+
+    def __init__(self):
+        self._receptores: Dict[int, Set] = defaultdict(set)
+
+    def agregar(self, id_usuario: int, receptor) -> None:
+        self._receptores[id_usuario].add(receptor)
+
+    def quitar(self, id_usuario: int, receptor) -> None:
+        receptores = self._receptores.get(id_usuario)
+        if receptores is None:
+            return
+        receptores.discard(receptor)
+        if not receptores:
+            del self._receptores[id_usuario]
+
+    def conectados(self, id_usuario: int) -> int:
+        return len(self._receptores.get(id_usuario, ()))
+
+    async def entregar(self, ids_usuarios: Iterable[int], evento: dict) -> None:
+        for id_usuario in set(ids_usuarios):
+            for receptor in list(self._receptores.get(id_usuario, ())):
+                # Un receptor puede limitar los tipos de evento que recibe (chat / notificaciones)
+                tipos = getattr(receptor, "tipos", None)
+                if tipos is not None and evento.get("tipo") not in tipos:
+                    continue
+                try:
+                    await receptor.enviar(evento)
+                except Exception:
+                    # Conexión cerrada sin aviso: se descarta
+                    self.quitar(id_usuario, receptor)
+
+
+class DifusionMemoria:
+    """Entrega directa al registro local (un solo proceso)"""
+
+    def __init__(self, registro: RegistroConexiones):
+        self.registro = registro
+
+    async def iniciar(self) -> None:
+        pass
+
+    async def detener(self) -> None:
+        pass
+
+    async def publicar(self, ids_usuarios: Iterable[int], evento: dict) -> None:
+        await self.registro.entregar(ids_usuarios, evento)
+
+
+class DifusionRedis:
+    """Publica en Redis pub/sub; cada worker escucha el canal y entrega a sus conexiones"""
+
+    def __init__(self, registro: RegistroConexiones, cliente, canal: str = CANAL_EVENTOS):
+        self.registro = registro
+        self.cliente = cliente
+        self.canal = canal
+        self._pubsub = None
+        self._tarea: Optional[asyncio.Task] = None
+
+    async def _suscribir(self) -> None:
+        self._pubsub = self.cliente.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self.canal)
+
+    async def _cerrar_pubsub(self) -> None:
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.aclose()
+            except Exception:
+                pass
+            self._pubsub = None
+
+    async def iniciar(self) -> None:
+        await self._suscribir()
+        self._tarea = asyncio.create_task(self._escuchar())
+
+    async def _entregar(self) -> None:
+        async for mensaje in self._pubsub.listen():
+            if mensaje.get("type") != "message":
+                continue
+            try:
+                datos = json.loads(mensaje["data"])
+                await self.registro.entregar(datos["usuarios"], datos["evento"])
+            except Exception as e:
+                print(f"⚠️ Evento de tiempo real descartado: {e}")
+
+    async def _escuchar(self) -> None:
+        """Escucha el canal; si se cae la conexión se vuelve a suscribir con espera creciente"""
+        espera = ESPERA_RECONEXION
+        while True:
+            try:
+                if self._pubsub is None:
+                    await self._suscribir()
+                    print("✅ Suscripción a Redis restablecida")
+                    espera = ESPERA_RECONEXION
+                await self._entregar()
+                raise ConnectionError("la suscripción terminó")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Se perdió la suscripción a Redis ({e}); reintentando en {espera:g}s")
+                await self._cerrar_pubsub()
+                await asyncio.sleep(espera)
+                espera = min(espera * 2, ESPERA_RECONEXION_MAXIMA)
+
+    async def detener(self) -> None:
+        if self._tarea:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+        if self._pubsub:
+            try:
+                await self._pubsub.unsubscribe(self.canal)
+            except Exception:
+                pass
+            await self._cerrar_pubsub()
+
+    async def publicar(self, ids_usuarios: Iterable[int], evento: dict) -> None:
+        await self.cliente.publish(self.canal, json.dumps({"usuarios": list(set(ids_usuarios)), "evento": evento}))
+
+
+def crear_difusion(registro: RegistroConexiones, redis_url: Optional[str] = None):
+    if not redis_url:
+        return DifusionMemoria(registro)
+    import redis.asyncio as redis_asyncio
+    return DifusionRedis(registro, redis_asyncio.from_url(redis_url, decode_responses=True))
+
+
+registro = RegistroConexiones()
+difusion = crear_difusion(registro, settings.REDIS_URL)
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+async def iniciar() -> None:
+    """Al arrancar la app: guarda el event loop y conecta la difusión"""
+    global _loop
+    _loop = asyncio.get_running_loop()
+    await difusion.iniciar()
+
+
+async def detener() -> None:
+    await difusion.detener()
+
+
+def publicar_desde_hilo(ids_usuarios: Iterable[int], evento: dict) -> None:
+    """Publica desde cualquier hilo sin esperar; no hace nada si la app no arrancó el loop"""
+    if _loop is None or _loop.is_closed():
+        return
+    ids = list(ids_usuarios)
+    try:
+        en_loop = asyncio.get_running_loop() is _loop
+    except RuntimeError:
+        en_loop = False
+    if en_loop:
+        _loop.create_task(difusion.publicar(ids, evento))
+    else:
+        asyncio.run_coroutine_threadsafe(difusion.publicar(ids, evento), _loop)
@@ -0,0 +1,338 @@
+# backend/trabajos_video.py
+"""
+Análisis de videos fuera de la petición (galería, publicaciones y chat).
+
+Al subir un video, el endpoint llama a encolar_video: se guarda un TrabajoVideo
+pendiente y TRABAJADORES_VIDEO hilos de fondo corren ffprobe (duración y resolución)
+y ffmpeg (póster JPEG en DIRECTORIO_POSTERS), cada uno con su tiempo máximo. Al
+terminar se completa el GaleriaArchivo asociado (duracion, resolucion y miniatura,
+si seguía apuntando al video). El estado se consulta en GET /medios/trabajos/{id}.
+
+Los trabajos se toman con un UPDATE condicional (pendiente -> procesando) que anota
+quién lo tomó y cuándo, así un mismo trabajo no se procesa dos veces aunque varios
+workers compartan la base. Al iniciar se encolan los pendientes y se devuelven a
+pendiente sólo los "procesando" tomados hace más de TIEMPO_MAXIMO_TRABAJO (su
+proceso murió: ffprobe y ffmpeg ya habrían terminado por tiempo). Sin hilos
+corriendo (scripts, pruebas) quedan pendientes.
+
+    python -m backend.trabajos_video
+
+crea trabajos para los videos ya subidos que no tienen uno y los procesa.
+"""
+import json
+import os
+import queue
+import socket
+import subprocess
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from sqlalchemy.orm import Session
+
+from backend import models
+from backend.config import settings
+
+DIRECTORIO_POSTERS = "static/galeria/miniaturas"
+ANCHO_POSTER = 640
+SEGUNDO_POSTER = 1
+TIEMPO_MAXIMO_FFPROBE = 30
+TIEMPO_MAXIMO_FFMPEG = 120
+# Un trabajo "procesando" más viejo que esto quedó huérfano
+TIEMPO_MAXIMO_TRABAJO = timedelta(seconds=2 * (TIEMPO_MAXIMO_FFPROBE + TIEMPO_MAXIMO_FFMPEG))
+
+BASE_URL = "http://localhost:8000"
+
+_cola: "queue.Queue[Optional[int]]" = queue.Queue()
+_hilos: List[threading.Thread] = []
+
+
+class ErrorVideo(Exception):
+    pass
+
+
+def ruta_en_disco(ruta_original: str) -> str:
+    return ruta_original.lstrip("/")
+
+
+def analizar_video(ruta: str) -> Tuple[Optional[int], Optional[str]]:
+    """(duración en segundos, "anchoxalto") con una sola llamada a ffprobe"""
+    cmd = [
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "format=duration:stream=width,height",
+        "-of", "json", ruta
+    ]
+    try:
+        resultado = subprocess.run(cmd, capture_output=True, text=True, timeout=TIEMPO_MAXIMO_FFPROBE)
+    except FileNotFoundError:
+        raise ErrorVideo("ffprobe no está instalado")
+    except subprocess.TimeoutExpired:
+        raise ErrorVideo("ffprobe tardó demasiado")
+    if resultado.returncode != 0:
+        raise ErrorVideo(resultado.stderr.strip()[:500] or "ffprobe falló")
+
+    datos = json.loads(resultado.stdout or "{}")
+    duracion = datos.get("format", {}).get("duration")
+    streams = datos.get("streams") or [{}]
+    ancho, alto = streams[0].get("width"), streams[0].get("height")
+    return (
+        int(float(duracion)) if duracion else None,
+        f"{ancho}x{alto}" if ancho and alto else None,
+    )
+
+
+def generar_poster(ruta: str, destino: str, duracion: Optional[int]) -> None:
+    """Cuadro de SEGUNDO_POSTER (o el primero, si el video es más corto) como JPEG"""
+    segundo = SEGUNDO_POSTER if duracion and duracion > SEGUNDO_POSTER else 0
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    cmd = [
+        "ffmpeg", "-v", "error", "-ss", str(segundo), "-i", ruta,
+        "-frames:v", "1", "-vf", f"scale='min({ANCHO_POSTER},iw)':-2", "-y", destino
+    ]
+    try:
+        resultado = subprocess.run(cmd, capture_output=True, text=True, timeout=TIEMPO_MAXIMO_FFMPEG)
+    except FileNotFoundError:
+        raise ErrorVideo("ffmpeg no está instalado")
+    except subprocess.TimeoutExpired:
+        raise ErrorVideo("ffmpeg tardó demasiado")
+    if resultado.returncode != 0 or not os.path.exists(destino):
+        raise ErrorVideo(resultado.stderr.strip()[:500] or "ffmpeg no generó el póster")
+
+
+def crear_trabajo(
+    db: Session,
+    id_usuario: int,
+    ruta_original: str,
+    id_archivo: Optional[int] = None,
+) -> models.TrabajoVideo:
+    trabajo = models.TrabajoVideo(
+        id_usuario=id_usuario,
+        ruta_original=ruta_original,
+        id_archivo=id_archivo,
+        estado="pendiente"
+    )
+    db.add(trabajo)
+    return trabajo
+
+
+def _completar_archivo(db: Session, trabajo: models.TrabajoVideo) -> None:
+    if trabajo.id_archivo is None:
+        return
+    archivo = db.get(models.GaleriaArchivo, trabajo.id_archivo)
+    if archivo is not None:
+        archivo.duracion = trabajo.duracion
+        archivo.resolucion = trabajo.resolucion
+        if not archivo.miniatura or archivo.miniatura == archivo.ruta:
+            archivo.miniatura = trabajo.poster
+
+
+def encolar_video(
+    db: Session,
+    id_usuario: int,
+    ruta_original: str,
+    id_archivo: Optional[int] = None,
+) -> models.TrabajoVideo:
+    """Registra el trabajo (commit) y lo pasa a los hilos si están corriendo"""
+    trabajo = crear_trabajo(db, id_usuario, ruta_original, id_archivo)
+
+    # Mismo contenido ya analizado (blob deduplicado): se copia el resultado
+    hecho = db.query(models.TrabajoVideo).filter(
+        models.TrabajoVideo.ruta_original == ruta_original,
+        models.TrabajoVideo.estado == "terminado"
+    ).order_by(models.TrabajoVideo.id_trabajo.desc()).first()
+    if hecho is not None:
+        trabajo.estado = "terminado"
+        trabajo.duracion = hecho.duracion
+        trabajo.resolucion = hecho.resolucion
+        trabajo.poster = hecho.poster
+        _completar_archivo(db, trabajo)
+
+    db.commit()
+    if _hilos and hecho is None:
+        _cola.put(trabajo.id_trabajo)
+    return trabajo
+
+
+def _trabajador() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"[:100]
+
+
+def _tomar(db: Session, id_trabajo: int) -> Optional[models.TrabajoVideo]:
+    tomado = db.query(models.TrabajoVideo).filter(
+        models.TrabajoVideo.id_trabajo == id_trabajo,
+        models.TrabajoVideo.estado == "pendiente"
+    ).update({
+        models.TrabajoVideo.estado: "procesando",
+        models.TrabajoVideo.tomado_por: _trabajador(),
+        models.TrabajoVideo.fecha_toma: datetime.utcnow(),
+    }, synchronize_session=False)
+    db.commit()
+    if not tomado:
+        return None
+    return db.get(models.TrabajoVideo, id_trabajo)
+
+
+def procesar_trabajo(db: Session, id_trabajo: int) -> Optional[models.TrabajoVideo]:
+    """Analiza el video y guarda el resultado. None si otro hilo ya lo tomó. Hace commit."""
+    trabajo = _tomar(db, id_trabajo)
+    if trabajo is None:
+        return None
+
+    ruta = ruta_en_disco(trabajo.ruta_original)
+    try:
+        duracion, resolucion = analizar_video(ruta)
+        poster = os.path.join(DIRECTORIO_POSTERS, f"{os.path.splitext(os.path.basename(ruta))[0]}.jpg")
+        generar_poster(ruta, poster, duracion)
+    except (ErrorVideo, ValueError) as e:
+        trabajo.estado = "error"
+        trabajo.error = str(e)[:500]
+        db.commit()
+        return trabajo
+
+    trabajo.duracion = duracion
+    trabajo.resolucion = resolucion
+    trabajo.poster = "/" + poster.replace(os.sep, "/")
+    trabajo.estado = "terminado"
+    trabajo.error = None
+    _completar_archivo(db, trabajo)
+    db.commit()
+    return trabajo
+
+
+def posters_por_original(db: Session, urls: Iterable[Optional[str]]) -> Dict[str, str]:
+    """{url del video: url del póster} de los trabajos terminados, en una consulta"""
+    originales = {urlparse(url).path: url for url in urls if url}
+    if not originales:
+        return {}
+    filas = db.query(models.TrabajoVideo.ruta_original, models.TrabajoVideo.poster).filter(
+        models.TrabajoVideo.ruta_original.in_(list(originales)),
+        models.TrabajoVideo.estado == "terminado"
+    ).all()
+    return {originales[ruta]: f"{BASE_URL}{poster}" for ruta, poster in filas}
+
+
+def crear_trabajos_faltantes(db: Session) -> int:
+    """Trabajos para los videos ya subidos (galería, publicaciones, chat) que no tienen uno. Hace commit."""
+    con_trabajo = {ruta for (ruta,) in db.query(models.TrabajoVideo.ruta_original).all()}
+    nuevos = 0
+
+    archivos = db.query(
+        models.GaleriaArchivo.id_archivo, models.GaleriaArchivo.id_usuario, models.GaleriaArchivo.ruta
+    ).filter(models.GaleriaArchivo.tipo == "video").all()
+    for id_archivo, id_usuario, ruta in archivos:
+        if ruta not in con_trabajo:
+            crear_trabajo(db, id_usuario, ruta, id_archivo)
+            con_trabajo.add(ruta)
+            nuevos += 1
+
+    publicaciones = db.query(models.Publicacion).filter(models.Publicacion.tipo_medio == "video").all()
+    mensajes = db.query(models.Mensaje.id_emisor, models.Mensaje.archivo_url).filter(
+        models.Mensaje.tipo == "video", models.Mensaje.archivo_url.isnot(None)
+    ).all()
+    otros = [(p.id_usuario, p.medios[0]) for p in publicaciones if p.medios] + list(mensajes)
+    for id_usuario, url in otros:
+        ruta = urlparse(url).path
+        if ruta not in con_trabajo:
+            crear_trabajo(db, id_usuario, ruta)
+            con_trabajo.add(ruta)
+            nuevos += 1
+
+    db.commit()
+    return nuevos
+
+
+def _procesar(id_trabajo: int) -> None:
+    from backend.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        procesar_trabajo(db, id_trabajo)
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ Trabajo de video {id_trabajo} falló: {e}")
+    finally:
+        db.close()
+
+
+def _trabajar() -> None:
+    while True:
+        id_trabajo = _cola.get()
+        try:
+            if id_trabajo is None:
+                break
+            _procesar(id_trabajo)
+        finally:
+            _cola.task_done()
+
+
+def devolver_huerfanos(db: Session) -> int:
+    """Vuelve a pendiente los trabajos tomados hace más de TIEMPO_MAXIMO_TRABAJO. Hace commit."""
+    limite = datetime.utcnow() - TIEMPO_MAXIMO_TRABAJO
+    devueltos = db.query(models.TrabajoVideo).filter(
+        models.TrabajoVideo.estado == "procesando",
+        (models.TrabajoVideo.fecha_toma < limite) | models.TrabajoVideo.fecha_toma.is_(None)
+    ).update({
+        models.TrabajoVideo.estado: "pendiente",
+        models.TrabajoVideo.tomado_por: None,
+        models.TrabajoVideo.fecha_toma: None,
+    }, synchronize_session=False)
+    db.commit()
+    return devueltos
+
+
+def _encolar_pendientes() -> int:
+    from backend.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        devolver_huerfanos(db)
+        pendientes = [id_trabajo for (id_trabajo,) in db.query(models.TrabajoVideo.id_trabajo).filter(
+            models.TrabajoVideo.estado == "pendiente"
+        ).order_by(models.TrabajoVideo.id_trabajo).all()]
+    finally:
+        db.close()
+    for id_trabajo in pendientes:
+        _cola.put(id_trabajo)
+    return len(pendientes)
+
+
+def iniciar() -> None:
+    if _hilos:
+        return
+    for i in range(settings.TRABAJADORES_VIDEO):
+        hilo = threading.Thread(target=_trabajar, name=f"trabajos-video-{i}", daemon=True)
+        hilo.start()
+        _hilos.append(hilo)
+    try:
+        _encolar_pendientes()
+    except Exception as e:
+        print(f"⚠️ No se retomaron los trabajos de video pendientes: {e}")
+
+
+def detener(espera: float = 5.0) -> None:
+    """Los hilos terminan el video en curso; lo que quede en cola se retoma al iniciar"""
+    while True:
+        try:
+            _cola.get_nowait()
+            _cola.task_done()
+        except queue.Empty:
+            break
+    for _ in _hilos:
+        _cola.put(None)
+    for hilo in _hilos:
+        hilo.join(espera)
+    _hilos.clear()
+
+
+if __name__ == "__main__":
+    from backend.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        print(f"Trabajos creados: {crear_trabajos_faltantes(db)}")
+    finally:
+        db.close()
+    iniciar()
+    _cola.join()
+    detener()
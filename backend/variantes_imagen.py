@@ -0,0 +1,212 @@
+# backend/variantes_imagen.py
+"""
+Variantes redimensionadas de las imágenes subidas (galería y publicaciones).
+
+Después de guardar el original, los endpoints llaman a encolar_variantes: un pool de
+PROCESOS_IMAGENES procesos genera, para cada tamaño de TAMANOS (lado mayor máximo),
+una versión WebP y otra JPEG (para clientes sin WebP) en DIRECTORIO_VARIANTES y las
+registra en variantes_imagen. Los tamaños que superarían al original no se generan:
+el más chico que ya lo contiene hace de "completa".
+
+Las grillas dejan de bajar originales: al terminar, los GaleriaArchivo que usaban el
+original como miniatura pasan a usar la miniatura WebP, y las respuestas de galería y
+feed llevan "variantes" ({tamano: {formato: url}}) para elegir la más chica que alcance.
+
+Si el pool no está corriendo (scripts, pruebas sin startup) se genera en el momento.
+"""
+import multiprocessing
+import os
+import sys
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from urllib.parse import urlparse
+
+from sqlalchemy.orm import Session
+
+from backend import models
+from backend.config import settings
+
+DIRECTORIO_VARIANTES = "static/variantes"
+
+# tamano -> lado mayor en píxeles, de menor a mayor
+TAMANOS = {
+    "miniatura": 320,
+    "media": 1080,
+    "completa": 2048,
+}
+CALIDAD = {"webp": 80, "jpeg": 85}
+EXTENSIONES = {"webp": "webp", "jpeg": "jpg"}
+
+BASE_URL = "http://localhost:8000"
+
+
+class Variante(NamedTuple):
+    tamano: str
+    formato: str
+    ruta: str  # en disco
+    ancho: int
+    alto: int
+    bytes: int
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def ruta_relativa(url: str) -> str:
+    """/static/... de una URL absoluta o relativa; es la clave de las variantes"""
+    return urlparse(url).path
+
+
+def _url(ruta_disco: str) -> str:
+    return "/" + ruta_disco.replace(os.sep, "/").lstrip("/")
+
+
+def generar_variantes(origen: str, directorio: str) -> List[Variante]:
+    """Redimensiona origen a cada tamaño y formato. Corre en los procesos del pool."""
+    from PIL import Image, ImageOps
+
+    base = os.path.splitext(os.path.basename(origen))[0]
+    os.makedirs(directorio, exist_ok=True)
+    variantes = []
+    with Image.open(origen) as imagen:
+        imagen = ImageOps.exif_transpose(imagen)
+        if imagen.mode not in ("RGB", "RGBA"):
+            imagen = imagen.convert("RGBA" if "transparency" in imagen.info or imagen.mode in ("LA", "PA") else "RGB")
+        lado_original = max(imagen.size)
+
+        for tamano, lado in TAMANOS.items():
+            copia = imagen.copy()
+            copia.thumbnail((lado, lado), Image.LANCZOS)
+            for formato, extension in EXTENSIONES.items():
+                salida = copia
+                if formato == "jpeg" and salida.mode == "RGBA":
+                    fondo = Image.new("RGB", salida.size, (255, 255, 255))
+                    fondo.paste(salida, mask=salida.getchannel("A"))
+                    salida = fondo
+                ruta = os.path.join(directorio, f"{base}_{tamano}.{extension}")
+                salida.save(ruta, formato.upper(), quality=CALIDAD[formato])
+                variantes.append(Variante(tamano, formato, ruta, salida.width, salida.height, os.path.getsize(ruta)))
+            if lado_original <= lado:
+                break  # los tamaños siguientes serían iguales a este
+    return variantes
+
+
+def _usar_miniatura(db: Session, original: str, miniatura: str) -> None:
+    db.query(models.GaleriaArchivo).filter(
+        models.GaleriaArchivo.ruta == original,
+        models.GaleriaArchivo.miniatura == original
+    ).update({models.GaleriaArchivo.miniatura: miniatura}, synchronize_session=False)
+
+
+def registrar_variantes(db: Session, url_original: str, variantes: List[Variante]) -> None:
+    """Guarda las variantes y apunta a la miniatura los archivos de galería que usaban el original. Hace commit."""
+    original = ruta_relativa(url_original)
+    db.query(models.VarianteImagen).filter(models.VarianteImagen.ruta_original == original).delete()
+    for v in variantes:
+        db.add(models.VarianteImagen(
+            ruta_original=original,
+            tamano=v.tamano,
+            formato=v.formato,
+            ruta=_url(v.ruta),
+            ancho=v.ancho,
+            alto=v.alto,
+            bytes=v.bytes
+        ))
+
+    miniatura = next((v for v in variantes if v.tamano == "miniatura" and v.formato == "webp"), None)
+    if miniatura:
+        _usar_miniatura(db, original, _url(miniatura.ruta))
+    db.commit()
+
+
+def reutilizar_variantes(db: Session, url_original: str) -> bool:
+    """
+    Si el original ya tiene variantes (el mismo contenido se subió antes), las usa
+    sin volver a generarlas. Hace commit.
+    """
+    original = ruta_relativa(url_original)
+    miniatura = db.query(models.VarianteImagen.ruta).filter(
+        models.VarianteImagen.ruta_original == original,
+        models.VarianteImagen.tamano == "miniatura",
+        models.VarianteImagen.formato == "webp"
+    ).scalar()
+    if miniatura is None:
+        return False
+    _usar_miniatura(db, original, miniatura)
+    db.commit()
+    return True
+
+
+def _guardar(url_original: str, variantes: List[Variante]) -> None:
+    from backend.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        registrar_variantes(db, url_original, variantes)
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ No se registraron las variantes de {url_original}: {e}")
+    finally:
+        db.close()
+
+
+def _al_terminar(url_original: str):
+    def terminar(futuro: Future) -> None:
+        try:
+            variantes = futuro.result()
+        except Exception as e:
+            print(f"⚠️ No se generaron las variantes de {url_original}: {e}")
+            return
+        _guardar(url_original, variantes)
+    return terminar
+
+
+def encolar_variantes(ruta_disco: str, url_original: str) -> None:
+    """Genera las variantes del original guardado en ruta_disco (servido en url_original)"""
+    if _pool is None:
+        try:
+            variantes = generar_variantes(ruta_disco, DIRECTORIO_VARIANTES)
+        except Exception as e:
+            print(f"⚠️ No se generaron las variantes de {url_original}: {e}")
+            return
+        _guardar(url_original, variantes)
+    else:
+        _pool.submit(generar_variantes, ruta_disco, DIRECTORIO_VARIANTES).add_done_callback(_al_terminar(url_original))
+
+
+def variantes_por_original(db: Session, urls: Iterable[Optional[str]]) -> Dict[str, Dict[str, Dict[str, str]]]:
+    """{url original: {tamano: {formato: url}}} en una consulta"""
+    originales = {ruta_relativa(url): url for url in urls if url}
+    if not originales:
+        return {}
+    filas = db.query(models.VarianteImagen).filter(
+        models.VarianteImagen.ruta_original.in_(list(originales))
+    ).all()
+    resultado: Dict[str, Dict[str, Dict[str, str]]] = {}
+    for fila in filas:
+        (resultado
+            .setdefault(originales[fila.ruta_original], {})
+            .setdefault(fila.tamano, {}))[fila.formato] = f"{BASE_URL}{fila.ruta}"
+    return resultado
+
+
+def _contexto_procesos():
+    """
+    forkserver: no se hace fork del servidor con sus hilos (y locks) en marcha.
+    Windows no tiene fork ni forkserver: ahí se usa spawn.
+    """
+    return multiprocessing.get_context("spawn" if sys.platform == "win32" else "forkserver")
+
+
+def iniciar() -> None:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.PROCESOS_IMAGENES, mp_context=_contexto_procesos())
+
+
+def detener() -> None:
+    """Espera las variantes en curso y cierra el pool"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True)
+        _pool = None